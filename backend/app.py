@@ -7,6 +7,7 @@ from sqlalchemy import text
 from config import Config
 from db import Base, engine, SessionLocal
 from models import Field, User  # ensure models imported before create_all
+from services.lazy import warm_up, warm_up_in_background, warmup_stats
 
 # Optional imports — app should still run if these aren't present
 try:
@@ -85,6 +86,10 @@ def create_app():
     def index():
         return jsonify({"service": "AgriVision API", "health": "/api/healthz"}), 200
 
+    @app.get("/api/warmup")
+    def warmup_status():
+        return jsonify(warmup_stats()), 200
+
     @app.get("/api/healthz")
     def healthz():
         try:
@@ -191,6 +196,12 @@ def create_app():
     except Exception:
         pass
 
+    # ---- Warm-up of lazily loaded models/libraries (see services/lazy.py) ----
+    if Config.BACKEND_WARMUP == "sync":
+        warm_up()
+    elif Config.BACKEND_WARMUP == "background":
+        warm_up_in_background()
+
     return app
 
 
@@ -0,0 +1,120 @@
+# backend/bench_startup.py
+"""
+Benchmark Flask worker boot: the time to `from app import create_app; create_app()`
+in a fresh interpreter. This is the cost every gunicorn worker (and every test
+run) pays before serving anything. Each run uses `-X importtime`, so the report
+also lists the heaviest top-level imports and which heavy libraries were loaded.
+
+    cd backend && python bench_startup.py                         # lazy boot (default)
+    cd backend && python bench_startup.py --warmup sync           # boot + model/library warm-up
+    cd backend && python bench_startup.py --record boot_times.jsonl --max-ms 1500
+    cd backend && python bench_startup.py --no-db                 # no MySQL at hand: skip create_all
+"""
+from pathlib import Path
+import argparse, json, os, statistics, subprocess, sys, time
+
+HERE = Path(__file__).resolve().parent
+HEAVY = ("pandas", "numpy", "joblib", "sklearn", "xgboost", "requests", "kaggle", "PIL")
+
+BOOT = """
+import json, os, sys, time
+if os.environ.get("BENCH_NO_DB"):
+    from sqlalchemy import MetaData
+    MetaData.create_all = lambda self, *a, **k: None  # measure imports, not a DB round trip
+t0 = time.perf_counter()
+from app import create_app
+t1 = time.perf_counter()
+create_app()
+t2 = time.perf_counter()
+print("BOOT " + json.dumps({"import_ms": 1e3 * (t1 - t0), "create_ms": 1e3 * (t2 - t1),
+                            "loaded": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY,)
+
+
+def parse_importtime(stderr: str) -> dict[str, float]:
+    """Cumulative ms per third-party package from `-X importtime` output, counted at
+    the outermost place each was imported (nesting is shown as extra indentation).
+    Our own modules (app, blueprints, services, ...) are left out: they are what
+    imports everything else."""
+    best: dict[str, tuple[int, float]] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # header row
+        depth = len(name) - len(name.lstrip())
+        root = name.strip().split(".")[0]
+        if (HERE / root).is_dir() or (HERE / f"{root}.py").exists():
+            continue
+        d, ms = best.get(root, (depth, 0.0))
+        if depth < d:
+            d, ms = depth, 0.0
+        if depth == d:
+            best[root] = (d, ms + int(cumulative) / 1e3)
+    return {root: ms for root, (_, ms) in best.items()}
+
+
+def boot_once(warmup: str, no_db: bool) -> dict:
+    env = {**os.environ, "BACKEND_WARMUP": warmup}
+    if no_db:
+        env["BENCH_NO_DB"] = "1"
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", BOOT], cwd=HERE, env=env,
+                          capture_output=True, text=True)
+    wall_ms = 1e3 * (time.perf_counter() - t0)
+    line = next((l for l in proc.stdout.splitlines() if l.startswith("BOOT ")), None)
+    if proc.returncode != 0 or line is None:
+        sys.exit(f"[ERROR] boot failed (exit {proc.returncode}):\n{proc.stderr[-2000:]}")
+    return {**json.loads(line[5:]), "wall_ms": wall_ms, "imports": parse_importtime(proc.stderr)}
+
+
+def git_rev() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark Flask worker boot time with -X importtime")
+    p.add_argument("--runs", type=int, default=5, help="Fresh interpreters to boot (median is reported)")
+    p.add_argument("--warmup", choices=["", "sync"], default="", help="BACKEND_WARMUP for the booted app")
+    p.add_argument("--no-db", action="store_true", help="Skip Base.metadata.create_all (no database needed)")
+    p.add_argument("--top", type=int, default=10, help="How many packages to list")
+    p.add_argument("--record", type=Path, help="Append the result as one JSON line (track boot time over commits)")
+    p.add_argument("--max-ms", type=float, help="Exit 1 if median boot (import + create_app) exceeds this")
+    args = p.parse_args()
+
+    runs = [boot_once(args.warmup, args.no_db) for _ in range(max(1, args.runs))]
+    boot = [r["import_ms"] + r["create_ms"] for r in runs]
+    med = statistics.median(boot)
+    names = {n for r in runs for n in r["imports"]}
+    imports = {n: statistics.median(r["imports"].get(n, 0.0) for r in runs) for n in names}
+    top = sorted(imports.items(), key=lambda kv: -kv[1])[: args.top]
+
+    print(f"runs: {len(runs)}  warmup: {args.warmup or 'lazy'}")
+    print(f"boot (import app + create_app): median {med:8.1f} ms   min {min(boot):8.1f} ms")
+    print(f"  import app                    : median {statistics.median(r['import_ms'] for r in runs):8.1f} ms")
+    print(f"  create_app()                  : median {statistics.median(r['create_ms'] for r in runs):8.1f} ms")
+    print(f"interpreter wall (incl. startup): median {statistics.median(r['wall_ms'] for r in runs):8.1f} ms")
+    print(f"heavy modules loaded at boot    : {', '.join(runs[-1]['loaded']) or 'none'}")
+    print("heaviest packages (cumulative import time):")
+    for name, ms in top:
+        print(f"  {ms:8.1f} ms  {name}")
+
+    if args.record:
+        entry = {"at": time.strftime("%Y-%m-%dT%H:%M:%S"), "rev": git_rev(), "warmup": args.warmup or "lazy",
+                 "runs": len(runs), "boot_ms": round(med, 1), "loaded": runs[-1]["loaded"],
+                 "top_imports": {n: round(ms, 1) for n, ms in top}}
+        with args.record.open("a") as f:
+            f.write(json.dumps(entry) + "\n")
+        print(f"recorded -> {args.record}")
+
+    if args.max_ms is not None and med > args.max_ms:
+        sys.exit(f"[FAIL] median boot {med:.1f} ms exceeds budget {args.max_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
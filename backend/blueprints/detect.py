@@ -1,4 +1,7 @@
-from flask import Blueprint, request, jsonify
+import io
+import json
+
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 from services.disease_service import predict as predict_disease
 
 bp = Blueprint("detect", __name__, url_prefix="/api")
@@ -11,3 +14,41 @@ def detect():
     content = file.read()
     out = predict_disease(content)
     return jsonify(out)
+
+
+@bp.post("/detect/batch")
+def detect_batch():
+    """Many `images` in one multipart request; one NDJSON line per image.
+
+    Werkzeug spools large uploads to temp files, and each image is read only
+    when its turn comes, so memory stays at one image regardless of count.
+    """
+    files = request.files.getlist("images")
+    if not files:
+        return jsonify({"error": "images required"}), 400
+
+    # Flask closes request.files when the view returns, before the body is
+    # streamed: take ownership of the spooled streams so the generator can
+    # still read them.
+    uploads = []
+    for f in files:
+        uploads.append((f.filename, f.stream))
+        f.stream = io.BytesIO()
+
+    def generate():
+        try:
+            for i, (filename, stream) in enumerate(uploads):
+                out = {"index": i, "filename": filename}
+                try:
+                    out.update(predict_disease(stream.read()))
+                except Exception:
+                    current_app.logger.exception("disease prediction failed for %r", filename)
+                    out["error"] = "Prediction failed"
+                stream.close()
+                yield json.dumps(out) + "\n"
+        finally:
+            # also runs if the client disconnects mid-stream
+            for _, stream in uploads:
+                stream.close()
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
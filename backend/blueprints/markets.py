@@ -16,13 +16,16 @@ class MarketReq(BaseModel):
 
     commodity: str = "wheat"
     mandi: str = "delhi"
+    state: str | None = None  # series key for materialized forecasts; defaults to `mandi`
     horizon_days: int = Field(default=7, ge=1, le=30)
 
 
 @bp.post("/forecast")
 def markets_forecast():
-    """Return a simple price forecast.
+    """Return a price forecast.
 
+    Served from the forecasts precomputed by the ML training job (with their
+    ``generated_at``/``age_seconds``), or a placeholder series on a miss.
     If the client sends an empty body we fall back to the defaults defined in
     ``MarketReq``.  Any validation errors are reported with a 400 response
     rather than bubbling up as a 500.
@@ -36,5 +39,5 @@ def markets_forecast():
         except ValidationError as e:
             return jsonify({"error": e.errors()}), 400
 
-    out = forecast(body.commodity, body.mandi, body.horizon_days)
+    out = forecast(body.commodity, body.mandi, body.horizon_days, state=body.state)
     return jsonify(out)
@@ -1,24 +1,113 @@
 # backend/blueprints/ml.py
 from flask import Blueprint, request, jsonify
 from pathlib import Path
-import pandas as pd
-import joblib, json
+import threading, time
+import json
+
+from config import Config
+from services.lazy import lazy_import, resolve, warmup
+from services.prediction_cache import PredictionCache, parse_resolutions
+from services.inference_pool import InferencePool, InferenceClient
+
+# imported on first prediction (or by warm_up()), not when the app boots
+pd = lazy_import("pandas")
+joblib = lazy_import("joblib")
 
 ml_bp = Blueprint("ml", __name__, url_prefix="/api/ml")
 
 # --- resolve project root (…/backend/blueprints/ml.py -> go up 2 levels) ---
 ROOT = Path(__file__).resolve().parents[2]
 MODEL_DIR = ROOT / "ml" / "models"
-MODEL_PATH = MODEL_DIR / "crop_reco_v1.joblib"
+MODEL_PATH = Path(Config.ML_MODEL_PATH)
 META_PATH  = MODEL_DIR / "crop_meta.json"
 
-# --- load once on import ---
-_pipe = joblib.load(MODEL_PATH)
-_meta = json.loads(META_PATH.read_text(encoding="utf-8"))
+# --- where predict() runs: shared pool server > local process pool > request thread ---
+INFERENCE_MODE = "remote" if Config.ML_INFERENCE_ADDRESS else ("pool" if Config.ML_POOL_SIZE > 0 else "inline")
+_executor = None
+
+# --- loaded on first use; reloaded (and the cache invalidated) when the artifact is rewritten ---
+_lock = threading.Lock()
+_pipe = _meta = _version = None
+_checked_at = 0.0
+FEATURES_NUM: list = []
+FEATURES_CAT: list = []
+FEATURES_ALL: list = []
+
+
+def _artifact_version() -> str:
+    st = MODEL_PATH.stat()
+    return f"{MODEL_PATH.name}@{st.st_mtime_ns:x}-{st.st_size:x}"
+
+
+def _load():
+    global _pipe, _meta, _version, FEATURES_NUM, FEATURES_CAT, FEATURES_ALL
+    version = _artifact_version()
+    # pool modes keep the model out of the web process entirely
+    _pipe = joblib.load(MODEL_PATH) if INFERENCE_MODE == "inline" else None
+    _meta = json.loads(META_PATH.read_text(encoding="utf-8"))
+    FEATURES_NUM = _meta.get("features_num", [])
+    FEATURES_CAT = _meta.get("features_cat", [])
+    FEATURES_ALL = FEATURES_NUM + FEATURES_CAT
+    _version = version
+
+
+def _current_model():
+    """(pipe, version), loading on first call; stats the artifact at most once a second.
+    version is None while no artifact could be loaded."""
+    global _checked_at
+    now = time.monotonic()
+    if _version is None or now - _checked_at > 1.0:
+        with _lock:
+            _checked_at = now
+            try:
+                if _version is None or _artifact_version() != _version:
+                    _load()
+            except OSError:
+                pass  # artifact mid-rewrite: keep serving the loaded model
+    return _pipe, _version
 
-FEATURES_NUM = _meta.get("features_num", [])
-FEATURES_CAT = _meta.get("features_cat", [])
-FEATURES_ALL = FEATURES_NUM + FEATURES_CAT
+
+def _get_executor():
+    """Created on first use so importing the app (or a preloading master) spawns nothing."""
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                if INFERENCE_MODE == "remote":
+                    _executor = InferenceClient(Config.ML_INFERENCE_ADDRESS, Config.ML_INFERENCE_AUTHKEY.encode())
+                else:
+                    _executor = InferencePool(MODEL_PATH, Config.ML_POOL_SIZE, _version)
+    return _executor
+
+
+def _run_predict(pipe, version, rows: list) -> list:
+    if INFERENCE_MODE != "inline":
+        return _get_executor().predict(rows, FEATURES_ALL, version, timeout=Config.ML_INFERENCE_TIMEOUT_S)
+
+    df = pd.DataFrame(rows)
+
+    # ensure all expected columns exist and in correct order
+    for col in FEATURES_ALL:
+        if col not in df.columns:
+            df[col] = pd.NA
+    df = df[FEATURES_ALL]
+    return [float(v) for v in pipe.predict(df)]
+
+
+@warmup("ml.crop_model")
+def _warm_model():
+    _current_model()
+    if INFERENCE_MODE == "inline":
+        resolve(pd)
+
+
+# --- yield memo cache keyed on quantized features + model version ---
+_cache = PredictionCache(
+    max_entries=Config.CROP_CACHE_SIZE,
+    ttl_s=Config.CROP_CACHE_TTL_S,
+    resolution=Config.CROP_CACHE_RESOLUTION,
+    per_feature=parse_resolutions(Config.CROP_CACHE_RESOLUTIONS),
+)
 
 
 @ml_bp.route("/predict", methods=["POST"])
@@ -31,23 +120,27 @@ def predict():
 
     if isinstance(payload, dict):
         rows = [payload]
-    elif isinstance(payload, list) and payload:
+    elif isinstance(payload, list) and payload and all(isinstance(r, dict) for r in payload):
         rows = payload
     else:
-        return jsonify(error="Body must be an object or non-empty array"), 400
-
-    df = pd.DataFrame(rows)
+        return jsonify(error="Body must be an object or non-empty array of objects"), 400
 
-    # ensure all expected columns exist and in correct order
-    for col in FEATURES_ALL:
-        if col not in df.columns:
-            df[col] = pd.NA
-    df = df[FEATURES_ALL]
+    pipe, version = _current_model()
+    if version is None:
+        return jsonify(error="Crop model not available"), 503
+    keys = [_cache.key(r, FEATURES_ALL) for r in rows] if _cache.enabled else []
+    y = _cache.get_many(keys, version) if keys else [None] * len(rows)
+    miss = [i for i, v in enumerate(y) if v is None]
 
-    try:
-        y = _pipe.predict(df)
-    except Exception as e:
-        return jsonify(error=f"Prediction failed: {e}"), 400
+    if miss:
+        try:
+            fresh = _run_predict(pipe, version, [rows[i] for i in miss])
+        except Exception as e:
+            return jsonify(error=f"Prediction failed: {e}"), 400
+        for i, v in zip(miss, fresh):
+            y[i] = v
+        if keys:
+            _cache.put_many([keys[i] for i in miss], fresh, version)
 
     return jsonify(
         predictions=[float(v) for v in y],
@@ -56,9 +149,17 @@ def predict():
     ), 200
 
 
+@ml_bp.get("/cache")
+def cache_stats():
+    """Hit ratio and size of the prediction cache."""
+    return jsonify({**_cache.stats(), "inference_mode": INFERENCE_MODE}), 200
+
+
 @ml_bp.get("/meta")
 def meta():
     """Expose crops + schema so the frontend can adapt automatically."""
+    if _current_model()[1] is None:
+        return jsonify(error="Crop model not available"), 503
     return jsonify({
         "crops": _meta.get("crops", []),
         "features_num": _meta.get("features_num", []),
@@ -1,4 +1,5 @@
 import os
+from pathlib import Path
 
 class Config:
     _origins = os.getenv("CORS_ORIGINS")
@@ -12,3 +13,30 @@ class Config:
 
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL", "sqlite:///agrivision.db")
     MAX_CONTENT_LENGTH = int(os.getenv("MAX_CONTENT_LENGTH", 8 * 1024 * 1024))
+
+    # /api/ml/predict memo cache (0 entries disables); numeric features bucketed
+    # to CROP_CACHE_RESOLUTION, per-feature overrides like "ph=0.05,rain_sum=5"
+    CROP_CACHE_SIZE = int(os.getenv("CROP_CACHE_SIZE", 20000))
+    CROP_CACHE_TTL_S = float(os.getenv("CROP_CACHE_TTL_S", 3600))
+    CROP_CACHE_RESOLUTION = float(os.getenv("CROP_CACHE_RESOLUTION", 0.01))
+    CROP_CACHE_RESOLUTIONS = os.getenv("CROP_CACHE_RESOLUTIONS", "")
+
+    # Crop model inference: ML_INFERENCE_ADDRESS (unix socket or host:port) sends
+    # work to a shared `python -m services.inference_pool` server; otherwise
+    # ML_POOL_SIZE > 0 starts model-owning processes in each web worker; 0 runs inline.
+    ML_MODEL_PATH = os.getenv(
+        "ML_MODEL_PATH", str(Path(__file__).resolve().parents[1] / "ml" / "models" / "crop_reco_v1.joblib")
+    )
+    ML_POOL_SIZE = int(os.getenv("ML_POOL_SIZE", 0))
+    ML_INFERENCE_ADDRESS = os.getenv("ML_INFERENCE_ADDRESS", "")
+    # Shared secret for the pool socket (pickled payloads): required, no default
+    ML_INFERENCE_AUTHKEY = os.getenv("ML_INFERENCE_AUTHKEY", "")
+    ML_INFERENCE_TIMEOUT_S = float(os.getenv("ML_INFERENCE_TIMEOUT_S", 30))
+
+    # Materialized market forecasts older than this are ignored (same setting as the ML service)
+    FORECAST_MAX_AGE_HOURS = float(os.getenv("FORECAST_MAX_AGE_HOURS", 36))
+
+    # When to run the services.lazy warm-up hooks (crop model, pandas, requests):
+    # "" = on first use, "background" = thread started by create_app(), "sync" = before
+    # create_app() returns. With gunicorn --preload, call warm_up() from post_fork instead
+    BACKEND_WARMUP = os.getenv("BACKEND_WARMUP", "").lower()
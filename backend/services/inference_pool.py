@@ -0,0 +1,182 @@
+# backend/services/inference_pool.py
+"""Model-owning inference processes for the crop yield pipeline.
+
+Request threads never run ``pipe.predict`` themselves. They hand rows to a
+small pool of worker processes that each load the artifact once, with
+``joblib.load(mmap_mode="r")`` so the numpy arrays inside it stay
+memory-mapped and shared through the page cache.
+
+Two ways to use it:
+
+* ``InferencePool``: a pool owned by the current process (``ML_POOL_SIZE``).
+* ``serve()`` + ``InferenceClient``: one pool process serving every web
+  worker over a local socket (``ML_INFERENCE_ADDRESS``). This lets gunicorn
+  workers scale without each one holding its own copy of the model::
+
+      ML_INFERENCE_AUTHKEY=$(python -c "import secrets; print(secrets.token_hex(32))") \
+          python -m services.inference_pool --size 2
+
+Requests travel as pickles, so whoever passes the connection handshake can run
+code in the pool process. Both ends therefore refuse to run without an explicit
+``ML_INFERENCE_AUTHKEY``, and the server binds to loopback unless a host is given.
+"""
+import argparse
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from multiprocessing.connection import Client, Listener
+
+from services.lazy import lazy_import
+
+joblib = lazy_import("joblib")  # only the worker processes need it
+
+# --- worker-process state: (path, version, pipeline) ---
+_model = None
+
+
+def _ensure_model(path: str, version: str | None):
+    global _model
+    if _model is None or _model[0] != path or (version is not None and _model[1] != version):
+        _model = (path, version, joblib.load(path, mmap_mode="r"))
+    return _model[2]
+
+
+def _worker_init(path: str, version: str | None):
+    _ensure_model(path, version)
+
+
+def _worker_predict(path: str, version: str | None, rows: list, features: list) -> list:
+    import pandas as pd
+
+    pipe = _ensure_model(path, version)
+    df = pd.DataFrame(rows)
+    # ensure all expected columns exist and in correct order
+    for col in features:
+        if col not in df.columns:
+            df[col] = pd.NA
+    return [float(v) for v in pipe.predict(df[features])]
+
+
+class InferencePool:
+    """Process pool whose workers each own one loaded copy of the model."""
+
+    def __init__(self, model_path, size: int = 2, version: str | None = None):
+        self.model_path = str(model_path)
+        self.size = max(1, int(size))
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.size,
+            mp_context=get_context("spawn"),  # never fork a threaded web process
+            initializer=_worker_init,
+            initargs=(self.model_path, version),
+        )
+
+    def predict(self, rows: list, features: list, version: str | None = None, timeout: float | None = None) -> list:
+        fut = self._executor.submit(_worker_predict, self.model_path, version, rows, features)
+        return fut.result(timeout=timeout)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# --------------------------------------------------------------------------
+# Shared pool over a local socket
+# --------------------------------------------------------------------------
+def require_authkey(authkey: bytes | str | None) -> bytes:
+    """The shared secret for the pool socket; there is deliberately no default."""
+    if isinstance(authkey, str):
+        authkey = authkey.encode()
+    if not authkey or authkey == b"agrivision":  # the old published default
+        raise ValueError("ML_INFERENCE_AUTHKEY must be set to a private random value to use the inference pool "
+                         "server (e.g. python -c \"import secrets; print(secrets.token_hex(32))\")")
+    return authkey
+
+
+def parse_address(address: str):
+    """'host:port' -> (host, port); anything else is a unix socket path."""
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit():
+        return (host or "127.0.0.1", int(port))
+    return address
+
+
+def _handle(conn, pool: InferencePool):
+    with conn:
+        while True:
+            try:
+                rows, features, version = conn.recv()
+            except EOFError:
+                return
+            try:
+                conn.send(("ok", pool.predict(rows, features, version)))
+            except Exception as e:
+                conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+def serve(model_path, address: str, size: int, authkey: bytes):
+    authkey = require_authkey(authkey)
+    addr = parse_address(address)
+    if isinstance(addr, str) and os.path.exists(addr):
+        os.unlink(addr)
+    pool = InferencePool(model_path, size)
+    with Listener(addr, authkey=authkey) as listener:
+        print(f"[inference-pool] {size} worker(s) serving {model_path} on {address}")
+        while True:
+            conn = listener.accept()
+            threading.Thread(target=_handle, args=(conn, pool), daemon=True).start()
+
+
+class InferenceClient:
+    """Talks to ``serve()``; one connection per request thread."""
+
+    def __init__(self, address: str, authkey: bytes):
+        self.address = parse_address(address)
+        self.authkey = require_authkey(authkey)
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = Client(self.address, authkey=self.authkey)
+        return conn
+
+    def predict(self, rows: list, features: list, version: str | None = None, timeout: float | None = None) -> list:
+        for attempt in (0, 1):
+            conn = self._conn()
+            try:
+                conn.send((rows, features, version))
+                if timeout is not None and not conn.poll(timeout):
+                    raise TimeoutError("inference pool did not answer in time")
+                status, payload = conn.recv()
+                break
+            except TimeoutError:
+                # a slow pool: resending would double its load. Drop the connection
+                # (its late answer must not reach the next request) and fail now.
+                self._local.conn = None
+                conn.close()
+                raise
+            except (EOFError, OSError):
+                # stale connection (server restarted): reconnect and retry once
+                self._local.conn = None
+                conn.close()
+                if attempt:
+                    raise
+        if status != "ok":
+            raise RuntimeError(payload)
+        return payload
+
+
+if __name__ == "__main__":
+    from config import Config
+
+    p = argparse.ArgumentParser(description="Run the shared crop-model inference pool")
+    p.add_argument("--model", default=Config.ML_MODEL_PATH, help="Path to crop_reco_v1.joblib")
+    p.add_argument("--address", default=Config.ML_INFERENCE_ADDRESS or "127.0.0.1:6010",
+                   help="unix socket path or host:port")
+    p.add_argument("--size", type=int, default=Config.ML_POOL_SIZE or 2, help="Number of model processes")
+    args = p.parse_args()
+    try:
+        authkey = require_authkey(Config.ML_INFERENCE_AUTHKEY)
+    except ValueError as e:
+        raise SystemExit(f"[ERROR] {e}")
+    serve(args.model, args.address, args.size, authkey)
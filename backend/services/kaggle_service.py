@@ -1,4 +1,7 @@
-import kaggle
+from services.lazy import lazy_import
+
+# importing the SDK authenticates (and raises without ~/.kaggle/kaggle.json), so only do it when called
+kaggle = lazy_import("kaggle")
 
 def list_datasets(search_term="agriculture"):
     datasets = kaggle.api.dataset_list(search=search_term)
@@ -0,0 +1,110 @@
+# backend/services/lazy.py
+"""Deferred imports and resources, so a worker boots without its heavy deps.
+
+``lazy_import("pandas")`` returns a stand-in module that imports the real
+one on first attribute access. Blueprints keep their usual
+``pd.DataFrame(...)`` code, but a worker that only serves field CRUD never
+pays for pandas, joblib or requests.
+
+Expensive one-time setup (loading a model, importing a client library) is
+registered with ``@warmup("name")``. ``warm_up()`` runs those hooks. By
+default they run on first use. ``BACKEND_WARMUP=background`` runs them on a
+thread right after ``create_app()``, and ``BACKEND_WARMUP=sync`` runs them
+before it returns. Under gunicorn with ``preload_app``, call ``warm_up()``
+from a ``post_fork`` hook instead, so each worker loads its own copy after
+the fork::
+
+    def post_fork(server, worker):
+        from services.lazy import warm_up
+        warm_up()
+
+``python bench_startup.py`` measures worker boot time with ``-X importtime``.
+"""
+import importlib
+import sys
+import threading
+import time
+from types import ModuleType
+from typing import Any, Callable
+
+_import_lock = threading.RLock()
+
+
+class LazyModule(ModuleType):
+    """Placeholder for a module that is imported on first attribute access."""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_lazy_module"] = None
+
+    def _lazy_resolve(self) -> ModuleType:
+        mod = self.__dict__["_lazy_module"]
+        if mod is None:
+            with _import_lock:
+                mod = self.__dict__["_lazy_module"]
+                if mod is None:
+                    mod = importlib.import_module(self.__name__)
+                    self.__dict__["_lazy_module"] = mod
+        return mod
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._lazy_resolve(), attr)
+
+    def __dir__(self):
+        return dir(self._lazy_resolve())
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.__dict__["_lazy_module"] is not None else "not loaded"
+        return f"<lazy module {self.__name__!r} ({state})>"
+
+
+def lazy_import(name: str) -> ModuleType:
+    """The module itself if something already imported it, else a LazyModule."""
+    mod = sys.modules.get(name)
+    return mod if mod is not None else LazyModule(name)
+
+
+def resolve(mod: ModuleType) -> ModuleType:
+    """Force the import behind a lazy_import() handle; returns the real module."""
+    return mod._lazy_resolve() if isinstance(mod, LazyModule) else mod
+
+
+def is_loaded(mod: ModuleType) -> bool:
+    return not isinstance(mod, LazyModule) or mod.__dict__["_lazy_module"] is not None
+
+
+# --- warm-up hooks: name -> callable, run by warm_up() ---
+_warmups: dict[str, Callable[[], Any]] = {}
+_warm_state: dict[str, dict] = {}
+
+
+def warmup(name: str):
+    """Register a zero-arg function that loads something expensive ahead of first use."""
+    def deco(fn: Callable[[], Any]):
+        _warmups[name] = fn
+        return fn
+    return deco
+
+
+def warm_up(names: list[str] | None = None) -> dict[str, dict]:
+    """Run the registered warm-up hooks. A failing hook is recorded, not raised:
+    the request that needs it will fail (and report why) on its own."""
+    for name in (names if names is not None else list(_warmups)):
+        t0 = time.perf_counter()
+        try:
+            _warmups[name]()
+            _warm_state[name] = {"ok": True, "seconds": round(time.perf_counter() - t0, 3)}
+        except Exception as e:
+            _warm_state[name] = {"ok": False, "seconds": round(time.perf_counter() - t0, 3),
+                                 "error": f"{type(e).__name__}: {e}"}
+    return dict(_warm_state)
+
+
+def warm_up_in_background(names: list[str] | None = None) -> threading.Thread:
+    t = threading.Thread(target=warm_up, args=(names,), name="warm-up", daemon=True)
+    t.start()
+    return t
+
+
+def warmup_stats() -> dict[str, dict]:
+    return {name: _warm_state.get(name, {"ok": None}) for name in _warmups}
@@ -1,6 +1,57 @@
-from datetime import date, timedelta
-def forecast(commodity: str, mandi: str, horizon_days: int = 7) -> dict:
+import sqlite3
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+from config import Config
+
+# Written by ml/traning/materialize_forecasts.py after each market retrain
+STORE_PATH = Path(__file__).resolve().parents[2] / "ml" / "models" / "market_forecasts.sqlite"
+
+
+def _materialized(crop: str, state: str, horizon_days: int) -> dict | None:
+    """The next `horizon_days` days of the precomputed series, from today on, if it
+    is fresh (FORECAST_MAX_AGE_HOURS, same cutoff as the ML service) and still
+    covers all of them; an entry from yesterday reaches one day less far."""
+    if not STORE_PATH.exists():
+        return None
+    key = (crop.strip().lower(), state.strip().lower())
+    con = sqlite3.connect(f"file:{STORE_PATH}?mode=ro", uri=True)
+    try:
+        row = con.execute(
+            "SELECT horizon_max, generated_at FROM series WHERE crop_key=? AND state_key=?", key
+        ).fetchone()
+        if row is None or row[0] < horizon_days:
+            return None
+        points = con.execute(
+            "SELECT date, modal_pred FROM forecasts WHERE crop_key=? AND state_key=? AND substr(date, 1, 10)>=? "
+            "ORDER BY day LIMIT ?",
+            (*key, date.today().isoformat(), horizon_days),
+        ).fetchall()
+    except sqlite3.Error:
+        return None
+    finally:
+        con.close()
+    age = (datetime.now(timezone.utc) - datetime.fromisoformat(row[1])).total_seconds()
+    if age > Config.FORECAST_MAX_AGE_HOURS * 3600:
+        return None
+    if len(points) < horizon_days:
+        return None
+    series = [{"date": d[:10], "price": round(p, 2)} for d, p in points]
+    return {
+        "series": series,
+        "source": "materialized",
+        "generated_at": row[1],
+        "age_seconds": round(age, 1),
+    }
+
+
+def forecast(commodity: str, mandi: str, horizon_days: int = 7, state: str | None = None) -> dict:
+    hit = _materialized(commodity, state or mandi, horizon_days)
+    if hit is not None:
+        return hit
+
+    # Miss: placeholder series until the ML service has a model for this series
     today = date.today()
     base = 2100.0
     series = [{"date": str(today + timedelta(days=i)), "price": base + 10*i} for i in range(horizon_days)]
-    return {"series": series}
+    return {"series": series, "source": "fallback", "generated_at": None, "age_seconds": None}
@@ -0,0 +1,27 @@
+# backend/services/prediction_cache.py
+"""
+The LRU + TTL prediction cache shared with the ML service.
+
+There is one implementation: ml/app/prediction_cache.py (stdlib only), loaded here
+by file path. It can't be imported by name because the ML service's package is
+also called `app`, which is this backend's app.py. The backend already expects
+the repo layout (it reads ml/models/), so both services always run the same code.
+"""
+import importlib.util
+import sys
+from pathlib import Path
+
+_SOURCE = Path(__file__).resolve().parents[2] / "ml" / "app" / "prediction_cache.py"
+_NAME = "agrivision_prediction_cache"
+
+_module = sys.modules.get(_NAME)
+if _module is None:
+    _spec = importlib.util.spec_from_file_location(_NAME, _SOURCE)
+    _module = importlib.util.module_from_spec(_spec)
+    sys.modules[_NAME] = _module
+    _spec.loader.exec_module(_module)
+
+PredictionCache = _module.PredictionCache
+parse_resolutions = _module.parse_resolutions
+
+__all__ = ["PredictionCache", "parse_resolutions"]
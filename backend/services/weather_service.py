@@ -1,5 +1,8 @@
 import os
-import requests
+
+from services.lazy import lazy_import, resolve, warmup
+
+requests = lazy_import("requests")
 
 API_KEY = os.getenv("OPENWEATHER_API_KEY")
 API_URL = "https://api.openweathermap.org/data/2.5/forecast"
@@ -50,6 +53,11 @@ def forecast(*, city: str | None = None, lat: float | None = None, lon: float |
     return {"forecast": result}
 
 
+@warmup("weather.requests")
+def _warm_requests():
+    resolve(requests)
+
+
 if __name__ == "__main__":
     # Example: Forecast for Delhi by city and by coordinates
     print(forecast(city="Delhi"))
@@ -0,0 +1,135 @@
+# app/batching.py
+"""
+Dynamic micro-batching for model inference.
+
+Concurrent requests `submit()` one input each. A collector task groups them into
+a batch that is flushed when it reaches `max_batch` items or when the oldest item
+has waited `max_wait_ms`. The batch function runs on a dedicated worker thread
+(so the event loop is never blocked), and each caller gets back its own row of
+the result.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Sequence
+
+
+class MicroBatcher:
+    def __init__(
+        self,
+        fn: Callable[[Sequence[Any]], Sequence[Any]],
+        max_batch: int = 16,
+        max_wait_ms: float = 10.0,
+        name: str = "batcher",
+    ):
+        """
+        fn: takes a list of inputs, returns a sequence of results in the same order.
+        """
+        self.fn = fn
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        self._executor: ThreadPoolExecutor | None = None
+        # the batch being collected or run: off the queue, so stop() fails these itself
+        self._inflight: list[tuple[Any, asyncio.Future]] = []
+        # simple counters for /api/info style introspection
+        self.batches = 0
+        self.items = 0
+
+    # ------------------------------------------------------------------ public
+    async def submit(self, item: Any) -> Any:
+        self._ensure_started()
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, fut))
+        return await fut
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        # fail anything still waiting, including the batch that was cut off
+        pending = self._inflight
+        self._inflight = []
+        while self._queue is not None and not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for _, fut in pending:
+            if not fut.done():
+                fut.set_exception(RuntimeError(f"{self.name} stopped"))
+        self._queue = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch": (self.items / self.batches) if self.batches else 0.0,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000.0,
+        }
+
+    # ---------------------------------------------------------------- internal
+    def _ensure_started(self):
+        if self._task is not None and not self._task.done():
+            return
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=self.name)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _collect(self, batch: list[tuple[Any, asyncio.Future]]) -> list[tuple[Any, asyncio.Future]]:
+        """Fill `batch` in place (so stop() sees what was already taken off the queue)."""
+        batch.append(await self._queue.get())
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            # drain whatever is already queued without waiting
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self._inflight = []
+            batch = await self._collect(self._inflight)
+            # callers that gave up (client disconnect) don't need a slot
+            batch = self._inflight = [(x, f) for x, f in batch if not f.cancelled()]
+            if not batch:
+                continue
+            inputs = [x for x, _ in batch]
+            try:
+                # requests keep queuing while the worker thread runs this batch
+                results = await loop.run_in_executor(self._executor, self.fn, inputs)
+            except Exception as e:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            self.batches += 1
+            self.items += len(batch)
+            for (_, fut), res in zip(batch, results):
+                if not fut.done():
+                    fut.set_result(res)
+            if len(results) != len(batch):
+                err = RuntimeError(f"{self.name}: batch function returned {len(results)} results "
+                                   f"for {len(batch)} inputs")
+                for _, fut in batch[len(results):]:
+                    if not fut.done():
+                        fut.set_exception(err)
@@ -0,0 +1,189 @@
+# app/crop_compiled.py
+"""
+Compiled inference path for the crop yield pipeline.
+
+`train_crop.make_pipeline` produces Pipeline(pre=ColumnTransformer(StandardScaler,
+OneHotEncoder | OrdinalEncoder), reg=XGBRegressor). Running it per request means
+building a DataFrame and dispatching through sklearn transformers. Here the
+fitted `pre` step is frozen into plain arrays (scale vectors + category -> column
+or code maps) and the booster is called directly with `inplace_predict` on a
+NumPy / CSR matrix laid out exactly like the ColumnTransformer output, so
+results match `pipe.predict`.
+"""
+from __future__ import annotations
+
+import math
+import threading
+from typing import Any, Mapping, Sequence
+
+import numpy as np
+from scipy import sparse
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, StandardScaler
+
+
+def _unwrap_scaler(step) -> StandardScaler:
+    if isinstance(step, Pipeline):
+        if len(step.steps) != 1:
+            raise ValueError("numeric branch must be a single StandardScaler")
+        step = step.steps[0][1]
+    if not isinstance(step, StandardScaler):
+        raise ValueError(f"unsupported numeric transformer: {type(step).__name__}")
+    return step
+
+
+def _cat_key(v):
+    return None if v is None or v != v else v
+
+
+class CompiledCropModel:
+    """Array-only replica of a fitted crop Pipeline."""
+
+    def __init__(self, pipe: Pipeline):
+        pre = pipe.named_steps["pre"]
+        reg = pipe.named_steps["reg"]
+
+        num_cols = cat_cols = None
+        scaler = encoder = None
+        for name, trans, cols in pre.transformers_:
+            if name == "remainder":
+                if trans != "drop":
+                    raise ValueError("remainder columns are not supported")
+                continue
+            if name == "num":
+                scaler, num_cols = _unwrap_scaler(trans), list(cols)
+            elif name == "cat":
+                encoder, cat_cols = trans, list(cols)
+            else:
+                raise ValueError(f"unexpected transformer '{name}'")
+        if scaler is None or not isinstance(encoder, (OneHotEncoder, OrdinalEncoder)):
+            raise ValueError("pipeline must have 'num' (StandardScaler) and 'cat' (OneHotEncoder/OrdinalEncoder) branches")
+        if getattr(encoder, "infrequent_categories_", None):
+            raise ValueError("encoders with infrequent categories are not supported")
+        # native: one float code per categorical feature, unknown/missing -> NaN (XGBoost categorical splits)
+        self.native = isinstance(encoder, OrdinalEncoder)
+        if self.native:
+            if not (math.isnan(encoder.unknown_value) and math.isnan(encoder.encoded_missing_value)):
+                raise ValueError("OrdinalEncoder must encode unknown and missing values as NaN")
+        elif encoder.drop is not None:
+            raise ValueError("OneHotEncoder with drop is not supported")
+
+        self.features_num: list[str] = num_cols
+        self.features_cat: list[str] = cat_cols
+        self.sparse = bool(pre.sparse_output_)
+
+        # numeric block: (x - mean) / scale, same float64 ops as StandardScaler
+        n_num = len(num_cols)
+        self._mean = scaler.mean_ if scaler.with_mean else np.zeros(n_num)
+        self._scale = scaler.scale_ if scaler.with_std else np.ones(n_num)
+        num_slice = pre.output_indices_["num"]
+        self._num_idx = np.arange(num_slice.start, num_slice.stop, dtype=np.int32)
+
+        # categorical block: one value -> absolute output column (one-hot) or code (native)
+        # per feature (sklearn folds None/NaN into a single "missing" category; keyed as None here)
+        cat_slice = pre.output_indices_["cat"]
+        offset = 0 if self.native else cat_slice.start
+        self._cat_cols = np.arange(cat_slice.start, cat_slice.stop, dtype=np.int32)
+        self._cat_maps: list[dict[Any, int]] = []
+        for cats in encoder.categories_:
+            self._cat_maps.append({_cat_key(c): offset + i for i, c in enumerate(cats.tolist())})
+            if not self.native:
+                offset += len(cats)
+        self.n_features = int(cat_slice.stop)
+
+        self.booster = reg.get_booster()
+        self._missing = reg.missing
+        best = getattr(reg, "best_iteration", None)
+        self._iteration_range = (0, best + 1) if best is not None else (0, 0)
+        self._local = threading.local()
+
+    # ---------------------------------------------------------------- encoding
+    def encode_num(self, records: Sequence[Mapping[str, Any]]) -> np.ndarray:
+        out = np.empty((len(records), len(self.features_num)), dtype=np.float64)
+        for i, r in enumerate(records):
+            for j, f in enumerate(self.features_num):
+                v = r.get(f)
+                out[i, j] = math.nan if v is None else float(v)
+        out -= self._mean
+        out /= self._scale
+        return out
+
+    def encode_cat(self, feature: str, values: Sequence[Any]) -> np.ndarray:
+        """Output column (one-hot) or category code (native) per value of one feature (-1 = unknown)."""
+        m = self._cat_maps[self.features_cat.index(feature)]
+        return np.fromiter((m.get(_cat_key(v), -1) for v in values), dtype=np.int32, count=len(values))
+
+    def _buffer(self, n_rows: int, n_cols: int, dtype) -> np.ndarray:
+        key = (n_cols, np.dtype(dtype).str)
+        bufs = getattr(self._local, "bufs", None)
+        if bufs is None:
+            bufs = self._local.bufs = {}
+        buf = bufs.get(key)
+        if buf is None or buf.shape[0] < n_rows:
+            buf = np.empty((max(n_rows, 64), n_cols), dtype=dtype)
+            bufs[key] = buf
+        return buf[:n_rows]
+
+    def assemble(self, num: np.ndarray, cat_idx: np.ndarray):
+        """
+        num:     (n, n_num) scaled numeric block
+        cat_idx: (n, n_cat) output columns / codes from encode_cat, -1 for unknown categories
+        Returns the model matrix in the same layout/format as `pre.transform`.
+        """
+        n = num.shape[0]
+        if self.native:
+            X = self._buffer(n, self.n_features, np.float64)
+            X[:, self._num_idx] = num
+            X[:, self._cat_cols] = np.where(cat_idx >= 0, cat_idx, np.nan)
+            return X
+        if not self.sparse:
+            X = self._buffer(n, self.n_features, np.float64)
+            X.fill(0.0)
+            X[:, self._num_idx] = num
+            rows, cols = np.nonzero(cat_idx >= 0)
+            X[rows, cat_idx[rows, cols]] = 1.0
+            return X
+
+        # CSR: zeros are implicit (xgboost treats them as missing), mirroring sklearn's hstack
+        width = num.shape[1] + cat_idx.shape[1]
+        vals = self._buffer(n, width, np.float64)
+        cols = self._buffer(n, width, np.int32)
+        vals[:, : num.shape[1]] = num
+        vals[:, num.shape[1]:] = 1.0
+        cols[:, : num.shape[1]] = self._num_idx
+        cols[:, num.shape[1]:] = cat_idx
+        keep = (vals != 0.0) & (cols >= 0)
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(keep.sum(axis=1), out=indptr[1:])
+        return sparse.csr_matrix((vals[keep], cols[keep], indptr), shape=(n, self.n_features))
+
+    # --------------------------------------------------------------- inference
+    def predict_matrix(self, X) -> np.ndarray:
+        return self.booster.inplace_predict(
+            X, iteration_range=self._iteration_range, missing=self._missing
+        )
+
+    def predict_records(self, records: Sequence[Mapping[str, Any]]) -> np.ndarray:
+        """Equivalent of `pipe.predict(pd.DataFrame(records))`."""
+        num = self.encode_num(records)
+        cat_idx = np.empty((len(records), len(self.features_cat)), dtype=np.int32)
+        for j, f in enumerate(self.features_cat):
+            cat_idx[:, j] = self.encode_cat(f, [r.get(f) for r in records])
+        return np.asarray(self.predict_matrix(self.assemble(num, cat_idx)), dtype=np.float64)
+
+    def predict_grid(self, fields: Sequence[Mapping[str, Any]], crops: Sequence[str],
+                     crop_feature: str = "crop") -> np.ndarray:
+        """
+        Score every field against every candidate crop.
+        Field features are encoded once and broadcast; returns an (n_fields, n_crops) array.
+        """
+        n_f, n_c = len(fields), len(crops)
+        num = np.repeat(self.encode_num(fields), n_c, axis=0)
+        cat_idx = np.empty((n_f * n_c, len(self.features_cat)), dtype=np.int32)
+        for j, f in enumerate(self.features_cat):
+            if f == crop_feature:
+                cat_idx[:, j] = np.tile(self.encode_cat(f, list(crops)), n_f)
+            else:
+                cat_idx[:, j] = np.repeat(self.encode_cat(f, [r.get(f) for r in fields]), n_c)
+        y = self.predict_matrix(self.assemble(num, cat_idx))
+        return np.asarray(y, dtype=np.float64).reshape(n_f, n_c)
@@ -1,20 +1,15 @@
 # app/deps_market.py
-import pandas as pd
-from functools import lru_cache
 from pathlib import Path
+from .price_store import PriceHistoryStore
 
 DATA = Path(__file__).resolve().parents[1] / "data"
 
-@lru_cache(maxsize=64)
+# Shared, indexed price history (reloaded when market_prices.csv changes)
+prices = PriceHistoryStore(DATA / "market_prices.csv")
+
 def price_for(crop: str, state: str) -> float:
-    file = DATA / "market_prices.csv"
-    if not file.exists():
-        return 0.0
-    df = pd.read_csv(file)
-    df = df[(df["crop"]==crop) & (df["state"]==state)]
-    if df.empty: return 0.0
-    latest = df.sort_values("date").tail(1)["modal"].values[0]
-    return float(latest)
+    latest = prices.latest(crop, state)
+    return 0.0 if latest is None else latest
 
 def cost_for(crop: str, state: str) -> float:
     base = {
@@ -0,0 +1,80 @@
+# app/forecast_store.py
+"""
+Read side of the materialized market forecasts (see traning/materialize_forecasts.py).
+
+Lookups are primary-key reads on a small SQLite file. Each thread keeps a
+read-only connection, and the connection is reopened when the file is
+atomically replaced by a new materialization run.
+"""
+from __future__ import annotations
+
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+from .market_registry import series_key
+
+
+class ForecastStore:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0  # present but older than max_age_s: counted as misses too
+
+    def _connect(self) -> sqlite3.Connection | None:
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            return None
+        sig = (st.st_ino, st.st_mtime_ns)
+        con = getattr(self._local, "con", None)
+        if con is None or self._local.sig != sig:
+            if con is not None:
+                con.close()
+            con = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            self._local.con, self._local.sig = con, sig
+        return con
+
+    def lookup(self, crop: str, state: str, horizon: int, max_age_s: float | None = None) -> dict[str, Any] | None:
+        """First `horizon` days of the precomputed forecast, or None on a miss
+        (including an entry older than `max_age_s`)."""
+        con = self._connect()
+        key = series_key(crop, state)
+        row = None
+        if con is not None:
+            row = con.execute(
+                "SELECT horizon_max, generated_at FROM series WHERE crop_key=? AND state_key=?", key
+            ).fetchone()
+        if row is None or row[0] < horizon:
+            self.misses += 1
+            return None
+        generated_at = row[1]
+        age = (datetime.now(timezone.utc) - datetime.fromisoformat(generated_at)).total_seconds()
+        if max_age_s is not None and age > max_age_s:
+            self.stale += 1
+            self.misses += 1
+            return None
+        points = con.execute(
+            "SELECT date, modal_pred FROM forecasts WHERE crop_key=? AND state_key=? AND day<=? ORDER BY day",
+            (*key, horizon),
+        ).fetchall()
+        self.hits += 1
+        return {
+            "forecast": [{"date": d, "modal_pred": v} for d, v in points],
+            "generated_at": generated_at,
+            "age_seconds": round(age, 1),
+        }
+
+    def stats(self) -> dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "present": self.path.exists(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "hit_ratio": (self.hits / total) if total else 0.0,
+        }
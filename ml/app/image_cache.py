@@ -0,0 +1,148 @@
+# app/image_cache.py
+"""
+Result cache for disease predictions keyed by image content.
+
+Two levels:
+  * exact: BLAKE2b of the uploaded bytes. A retry or a re-synced upload hits
+    here before anything is decoded.
+  * near:  64-bit dHash of the picture. A re-encoded, resized or re-compressed
+    copy of the same photo lands within a few bits. Any cached hash within
+    `max_distance` (Hamming) is a hit. Hashes are kept in a flat uint64 array,
+    so a lookup is one vectorized XOR + popcount over the whole cache.
+
+Entries are LRU-bounded and tied to a model version. Seeing a new version
+drops everything cached for the old one.
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable
+
+import numpy as np
+
+
+def content_key(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def _popcount(x: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):  # numpy >= 2.0
+        return np.bitwise_count(x)
+    return np.unpackbits(x.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+class ImageResultCache:
+    def __init__(self, max_entries: int = 5000, max_distance: int = 4):
+        self.max_entries = int(max_entries)
+        self.max_distance = int(max_distance)  # < 0 disables near-duplicate matching
+        self._lock = threading.Lock()
+        self._version: Hashable = None
+        # content key -> (slot, result); slot indexes the perceptual-hash arrays
+        self._entries: OrderedDict[bytes, tuple[int, Any]] = OrderedDict()
+        cap = max(self.max_entries, 0)
+        self._hashes = np.zeros(cap, dtype=np.uint64)
+        self._used = np.zeros(cap, dtype=bool)
+        self._slot_key: list[bytes | None] = [None] * cap
+        self._free = list(range(cap - 1, -1, -1))
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @property
+    def near_enabled(self) -> bool:
+        return self.enabled and self.max_distance >= 0
+
+    # ---------------------------------------------------------------- internal
+    def _check_version(self, version: Hashable) -> None:
+        if version != self._version:
+            if self._version is not None:
+                self.invalidations += 1
+            self._entries.clear()
+            self._used[:] = False
+            self._slot_key = [None] * len(self._slot_key)
+            self._free = list(range(len(self._slot_key) - 1, -1, -1))
+            self._version = version
+
+    def _evict_oldest(self) -> None:
+        _, (slot, _) = self._entries.popitem(last=False)
+        if slot >= 0:
+            self._used[slot] = False
+            self._slot_key[slot] = None
+            self._free.append(slot)
+
+    # ---------------------------------------------------------------- access
+    def get_exact(self, key: bytes, version: Hashable) -> Any | None:
+        with self._lock:
+            self._check_version(version)
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return item[1]
+
+    def get_near(self, phash: int, version: Hashable) -> Any | None:
+        """Closest cached result within max_distance bits of `phash`, else None (counts a miss)."""
+        with self._lock:
+            self._check_version(version)
+            if self.near_enabled and self._used.any():
+                dist = _popcount(self._hashes ^ np.uint64(phash)).astype(np.int64)
+                dist[~self._used] = 65
+                slot = int(dist.argmin())
+                if dist[slot] <= self.max_distance:
+                    key = self._slot_key[slot]
+                    self._entries.move_to_end(key)
+                    self.near_hits += 1
+                    return self._entries[key][1]
+            self.misses += 1
+            return None
+
+    def miss(self) -> None:
+        with self._lock:
+            self.misses += 1
+
+    def put(self, key: bytes, phash: int | None, result: Any, version: Hashable) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            if version != self._version:
+                return  # computed with a model that has since been replaced
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+            if len(self._entries) >= self.max_entries:
+                self._evict_oldest()
+            slot = -1
+            if phash is not None:
+                slot = self._free.pop()
+                self._hashes[slot] = phash
+                self._used[slot] = True
+                self._slot_key[slot] = key
+            self._entries[key] = (slot, result)
+
+    def clear(self) -> None:
+        with self._lock:
+            version, self._version = self._version, None
+            self._check_version(version)
+
+    def stats(self) -> dict[str, Any]:
+        total = self.exact_hits + self.near_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "capacity": self.max_entries,
+            "max_distance": self.max_distance,
+            "exact_hits": self.exact_hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "hit_ratio": ((self.exact_hits + self.near_hits) / total) if total else 0.0,
+            "invalidations": self.invalidations,
+            "model_version": None if self._version is None else str(self._version),
+        }
@@ -1,42 +1,38 @@
 # ml/app/main.py
 from __future__ import annotations
 
-import json
 from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import List, Dict, Any
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
+from fastapi.responses import JSONResponse, RedirectResponse
 
 from .settings import settings
-from .routes_crop import router as crop_router
-from .routes_disease import router as disease_router
-from .routes_market import router as market_router
+from .model_registry import store as model_store
+from .routes_crop import router as crop_router, cache as crop_cache, crop_meta
+from .routes_disease import router as disease_router, batcher as disease_batcher, stats as disease_stats
+from .routes_market import router as market_router, registry as market_registry, forecasts as market_forecasts
+from .routes_admin import router as admin_router
 
 # --------------------------------------------------------------------------------------
 # Paths
 # --------------------------------------------------------------------------------------
 ROOT = Path(__file__).resolve().parents[1]          # .../ml
 MODELS = ROOT / "models"
-CROP_META_PATH = MODELS / "crop_meta.json"
 
 
 # --------------------------------------------------------------------------------------
-# Lifespan: load lightweight metadata on startup
+# Lifespan: start loading + warming models in the background and accept traffic right
+# away. Routes answer 503 until their model is in; /api/ready says when all are
 # --------------------------------------------------------------------------------------
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    app.state.crop_meta: Optional[Dict[str, Any]] = None
-    try:
-        if CROP_META_PATH.exists():
-            app.state.crop_meta = json.loads(CROP_META_PATH.read_text(encoding="utf-8"))
-    except Exception:
-        # Don't block startup if meta can't be read
-        app.state.crop_meta = None
+    model_store.start(settings.LOAD_MODELS)
     yield
-    # graceful shutdown hooks (none)
+    # graceful shutdown: fail pending batched requests and stop the worker thread
+    await disease_batcher.stop()
 
 
 # --------------------------------------------------------------------------------------
@@ -82,21 +78,38 @@ def health():
         "endpoints": [
             "/api/ml/meta",
             "/api/info",
+            "/api/ready",
             "/api/predict/crops",
+            "/api/predict/crops/batch",
             "/api/predict/disease",
+            "/api/predict/disease/batch",
             "/api/predict/market",
+            "/api/admin/models",
         ],
     }
 
 
+@app.get("/api/ready", tags=["System"])
+def ready():
+    """Readiness probe: 200 once every model in LOAD_MODELS is loaded and warmed up, 503 before."""
+    models = model_store.readiness()
+    ok = all(models[name]["status"] == "ready" for name in settings.LOAD_MODELS if name in models)
+    return JSONResponse(status_code=200 if ok else 503, content={"ready": ok, "models": models})
+
+
 @app.get("/api/info", tags=["System"])
 def info():
-    meta = getattr(app.state, "crop_meta", None)
+    meta = crop_meta()  # follows hot-swapped versions
     payload: Dict[str, Any] = {
         "service": getattr(settings, "PROJECT_NAME", "AgriVision ML"),
         "version": getattr(settings, "VERSION", "0.1.0"),
         "models_path": str(MODELS),
         "crop_meta_present": bool(meta is not None),
+        "model_versions": model_store.stats(),
+        "crop_cache": crop_cache.stats(),
+        "disease": disease_stats(),
+        "market_registry": market_registry.stats(),
+        "market_forecasts": market_forecasts.stats(),
     }
     if meta:
         payload.update(
@@ -114,7 +127,7 @@ def info():
 # ---- Meta for frontend (exact shape expected by Dashboard.jsx) ----
 @app.get("/api/ml/meta", tags=["System"])
 def ml_meta():
-    meta = getattr(app.state, "crop_meta", None)
+    meta = crop_meta()
     if meta:
         return {
             "crops": meta.get("crops", []),
@@ -122,7 +135,7 @@ def ml_meta():
             "features_cat": meta.get("features_cat", []),
         }
 
-    # Safe fallback if models/crop_meta.json is missing
+    # Safe fallback if no crop model is loaded
     return {
         "crops": [
             # 🌾 Cereals
@@ -160,4 +173,5 @@ def ml_meta():
 app.include_router(crop_router, prefix="/api", tags=["Crop Recommendation"])
 app.include_router(disease_router, prefix="/api", tags=["Disease Detection"])
 app.include_router(market_router, prefix="/api", tags=["Market Forecast"])
+app.include_router(admin_router, prefix="/api", tags=["Admin"])
 
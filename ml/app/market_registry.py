@@ -0,0 +1,101 @@
+# app/market_registry.py
+"""
+In-memory registry for per-(crop, state) market forecasters.
+
+`market_meta.json` is parsed once into a dict keyed by normalized (crop, state)
+and re-read only when the file changes on disk (mtime/size). Unpickled models
+live in a size-bounded LRU so hot series never touch disk after the first call.
+"""
+from __future__ import annotations
+
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+import joblib
+
+
+def series_key(crop: str, state: str) -> tuple[str, str]:
+    return (crop or "").strip().lower(), (state or "").strip().lower()
+
+
+class MarketModelRegistry:
+    def __init__(self, models_dir: Path, max_models: int = 32, meta_name: str = "market_meta.json"):
+        self.models_dir = Path(models_dir)
+        self.meta_path = self.models_dir / meta_name
+        self.max_models = max(1, int(max_models))
+        self._lock = threading.Lock()
+        self._sig: tuple[int, int] | None = None
+        self._meta: dict[str, Any] = {"models": [], "horizon": 7}
+        self._index: dict[tuple[str, str], dict] = {}
+        self._lru: OrderedDict[str, dict] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    # ------------------------------------------------------------------ meta
+    def _signature(self) -> tuple[int, int] | None:
+        try:
+            st = self.meta_path.stat()
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def refresh(self) -> None:
+        """Reload the metadata (and drop cached models) if market_meta.json changed."""
+        sig = self._signature()
+        if sig == self._sig:
+            return
+        with self._lock:
+            if sig == self._sig:
+                return
+            meta = {"models": [], "horizon": 7}
+            if sig is not None:
+                meta = json.loads(self.meta_path.read_text())
+            self._meta = meta
+            self._index = {series_key(m["crop"], m["state"]): m for m in meta.get("models", [])}
+            self._lru.clear()
+            self._sig = sig
+            self.reloads += 1
+
+    @property
+    def meta(self) -> dict[str, Any]:
+        self.refresh()
+        return self._meta
+
+    def entry(self, crop: str, state: str) -> dict | None:
+        self.refresh()
+        return self._index.get(series_key(crop, state))
+
+    # ---------------------------------------------------------------- models
+    def load(self, entry: dict) -> dict:
+        """Returns the artifact blob ({"model", "feat_cols"}) for a registry entry."""
+        path = entry["path"]
+        with self._lock:
+            blob = self._lru.get(path)
+            if blob is not None:
+                self._lru.move_to_end(path)
+                self.hits += 1
+                return blob
+            self.misses += 1
+        blob = joblib.load(self.models_dir / path)
+        with self._lock:
+            self._lru[path] = blob
+            self._lru.move_to_end(path)
+            while len(self._lru) > self.max_models:
+                self._lru.popitem(last=False)
+        return blob
+
+    def stats(self) -> dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "series": len(self._index),
+            "loaded": len(self._lru),
+            "capacity": self.max_models,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits / total) if total else 0.0,
+            "reloads": self.reloads,
+        }
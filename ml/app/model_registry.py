@@ -1,16 +1,447 @@
 # app/model_registry.py
-import json, joblib
+"""
+Model loading plus a versioned store for hot-swapping models without a restart.
+
+Published versions are snapshot directories, models/versions/<name>/<version>/,
+holding the same filenames the loaders below read from models/. manifest.json
+lists them and says which one is active:
+
+    {"models": {"crop": {"active": "20261018T0530Z",
+                         "versions": {"20261018T0530Z": {"path": "versions/crop/20261018T0530Z", ...}}}}}
+
+Models without a manifest entry are loaded from the fixed filenames in models/.
+
+    cd ml && python -m app.model_registry publish crop      # snapshot + activate
+    cd ml && python -m app.model_registry activate crop <version>
+    cd ml && python -m app.model_registry list
+"""
+import argparse, json, joblib, logging, os, shutil, threading, time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import numpy as np
 from pathlib import Path
+from typing import Any, Callable
+from .settings import settings
 
 MODELS = Path(__file__).resolve().parents[1] / "models"
+MANIFEST = "manifest.json"
+log = logging.getLogger(__name__)
 
-def load_crop_model():
-    pipe = joblib.load(MODELS / "crop_reco_v1.joblib")
-    meta = json.loads((MODELS / "crop_meta.json").read_text())
+# files that make up one version of each model (missing optional ones are skipped)
+MODEL_FILES = {
+    "crop": ["crop_reco_v1.joblib", "crop_meta.json"],
+    "disease": ["disease_efficientnet_v1.keras", "disease_efficientnet_v1.tflite", "disease_labels.json",
+                "disease_fast_v1.keras", "disease_fast_v1.tflite", "disease_cascade.json"],
+}
+
+def artifact_version(path: Path) -> str:
+    """Identifies one build of an artifact file (changes whenever it is rewritten)."""
+    st = path.stat()
+    return f"{path.name}@{st.st_mtime_ns:x}-{st.st_size:x}"
+
+def load_crop_model(models_dir: Path = MODELS):
+    pipe = joblib.load(models_dir / "crop_reco_v1.joblib")
+    meta = json.loads((models_dir / "crop_meta.json").read_text())
     return pipe, meta
 
+def compile_crop_model(pipe):
+    from .crop_compiled import CompiledCropModel
+    return CompiledCropModel(pipe)
+
+def load_disease_labels(models_dir: Path = MODELS):
+    import ast
+    return ast.literal_eval((models_dir / "disease_labels.json").read_text())
+
+# ---- disease inference engines: predict(uint8/float NHWC batch) -> class scores ----
+class KerasEngine:
+    name = "keras"
+
+    def __init__(self, path: Path):
+        import tensorflow as tf
+        self.path = path
+        self.model = tf.keras.models.load_model(path)
+
+    def predict(self, arr: np.ndarray) -> np.ndarray:
+        return np.asarray(self.model.predict(arr, verbose=0))
+
+def _tflite_interpreter():
+    """(Interpreter class, runtime name) from the smallest available TFLite runtime:
+    LiteRT (ai-edge-litert, in requirements.txt), tflite-runtime, then full TF."""
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+        return Interpreter, "ai-edge-litert"
+    except ImportError:
+        pass
+    try:
+        from tflite_runtime.interpreter import Interpreter
+        return Interpreter, "tflite-runtime"
+    except ImportError:
+        pass
+    log.warning("No lightweight TFLite runtime installed (pip install ai-edge-litert); "
+                "falling back to tf.lite from full TensorFlow")
+    import tensorflow as tf
+    return tf.lite.Interpreter, "tensorflow"
+
+class TFLiteEngine:
+    """Quantized artifact from `train_disease.py --export-tflite`; no TensorFlow graph build."""
+    name = "tflite"
+
+    def __init__(self, path: Path, num_threads: int | None = None):
+        self.path = path
+        interpreter, self.runtime = _tflite_interpreter()
+        self._interp = interpreter(model_path=str(path), num_threads=num_threads)
+        self._in = self._interp.get_input_details()[0]
+        self._out = self._interp.get_output_details()[0]
+        self._batch = None
+        self._lock = threading.Lock()  # an interpreter is not thread-safe
+
+    def predict(self, arr: np.ndarray) -> np.ndarray:
+        x = np.asarray(arr, dtype=np.float32)
+        scale, zero = self._in["quantization"]
+        if self._in["dtype"] != np.float32 and scale:
+            x = np.round(x / scale + zero)
+        x = x.astype(self._in["dtype"])
+        with self._lock:
+            if x.shape[0] != self._batch:
+                self._interp.resize_tensor_input(self._in["index"], x.shape)
+                self._interp.allocate_tensors()
+                self._batch = x.shape[0]
+            self._interp.set_tensor(self._in["index"], x)
+            self._interp.invoke()
+            out = self._interp.get_tensor(self._out["index"]).copy()
+        scale, zero = self._out["quantization"]
+        if self._out["dtype"] != np.float32 and scale:
+            out = (out.astype(np.float32) - zero) * scale
+        return out
+
+def load_disease_engine(stem: str = "disease_efficientnet_v1", engine: str = "keras", num_threads: int | None = None,
+                        models_dir: Path = MODELS):
+    if engine == "tflite":
+        return TFLiteEngine(models_dir / f"{stem}.tflite", num_threads)
+    if engine != "keras":
+        raise ValueError(f"Unknown disease engine {engine!r} (expected 'keras' or 'tflite')")
+    return KerasEngine(models_dir / f"{stem}.keras")
+
 def load_disease_model():
     import tensorflow as tf, ast
     model = tf.keras.models.load_model(MODELS / "disease_efficientnet_v1.keras")
     labels = ast.literal_eval((MODELS / "disease_labels.json").read_text())
     return model, labels
+
+def load_disease_fast_model(engine: str = "keras", num_threads: int | None = None, models_dir: Path = MODELS):
+    """Cascade stage 1 (train_disease.py --cascade) and its chosen threshold."""
+    model = load_disease_engine("disease_fast_v1", engine, num_threads, models_dir)
+    cfg_path = models_dir / "disease_cascade.json"
+    cfg = json.loads(cfg_path.read_text()) if cfg_path.exists() else {}
+    return model, cfg.get("threshold")
+
+# ---- manifest: published versions and the active pointer ----
+def read_manifest(models_dir: Path = MODELS) -> dict:
+    path = models_dir / MANIFEST
+    return json.loads(path.read_text()) if path.exists() else {"models": {}}
+
+def _write_manifest(manifest: dict, models_dir: Path = MODELS):
+    path = models_dir / MANIFEST
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2))
+    os.replace(tmp, path)
+
+def publish(name: str, version: str | None = None, activate: bool = True, models_dir: Path = MODELS) -> dict:
+    """Snapshot the current files of `name` into versions/<name>/<version>/ and list it in the manifest."""
+    files = [f for f in MODEL_FILES[name] if (models_dir / f).exists()]
+    if not files:
+        raise FileNotFoundError(f"No {name} model files in {models_dir}")
+    if version is None and name == "crop":
+        version = json.loads((models_dir / "crop_meta.json").read_text()).get("version")  # stamped by train_crop.py
+    version = version or datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    dest = models_dir / "versions" / name / version
+    if dest.exists():
+        raise FileExistsError(f"{name} version {version} is already published")
+    tmp = dest.with_name(dest.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    for f in files:
+        shutil.copy2(models_dir / f, tmp / f)
+    os.replace(tmp, dest)  # a version directory is complete or absent
+
+    manifest = read_manifest(models_dir)
+    entry = manifest["models"].setdefault(name, {"active": None, "versions": {}})
+    info = {"path": dest.relative_to(models_dir).as_posix(), "files": files,
+            "published_at": datetime.now(timezone.utc).isoformat(timespec="seconds")}
+    entry["versions"][version] = info
+    if activate:
+        entry["active"] = version
+    _write_manifest(manifest, models_dir)
+    return {"name": name, "version": version, "active": entry["active"], **info}
+
+def activate(name: str, version: str, models_dir: Path = MODELS) -> None:
+    """Point `name` at an already published version (every worker follows on its next poll)."""
+    manifest = read_manifest(models_dir)
+    entry = manifest["models"].get(name)
+    if entry is None or version not in entry["versions"]:
+        raise KeyError(f"{name} version {version} is not published")
+    entry["active"] = version
+    _write_manifest(manifest, models_dir)
+
+# ---- versioned store: background load, atomic swap, refcounted retirement ----
+class LoadedModel:
+    """One loaded version. `refs` counts requests still using it."""
+
+    def __init__(self, name: str, version: str, obj: Any, load_seconds: float, warmup_seconds: float = 0.0):
+        self.name = name
+        self.version = version
+        self.obj = obj
+        self.load_seconds = load_seconds
+        self.warmup_seconds = warmup_seconds
+        self.loaded_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        self.refs = 0
+        self.retired = False
+
+class ModelStore:
+    """
+    Holds the serving version of each registered model behind a pointer that is
+    swapped under a lock. A request takes a reference with `use()` and keeps the
+    version it started on; a replaced version is dropped once its last request
+    finishes. New versions load (and run their warm-up) on a background thread,
+    so requests never wait for a load: until the first version of a model is
+    in, use() yields None and routes answer 503. A failed load leaves the old
+    version serving.
+
+    The manifest is re-checked (one stat) at most every `poll_s` seconds on use,
+    so activating a version reaches every worker process without a restart.
+    """
+
+    LEGACY = "legacy"  # no manifest entry: fixed filenames in models/
+    _UNSYNCED = object()  # manifest signature that never matches: re-check on next poll
+
+    def __init__(self, models_dir: Path = MODELS, poll_s: float = 5.0):
+        self.models_dir = Path(models_dir)
+        self.poll_s = float(poll_s)
+        self._lock = threading.Lock()
+        self._loaders: dict[str, Callable[[Path], Any]] = {}
+        self._warmups: dict[str, Callable[[Any], Any] | None] = {}
+        self._started: set[str] = set()
+        self._current: dict[str, LoadedModel | None] = {}
+        self._draining: dict[str, list[LoadedModel]] = {}
+        self._loading: dict[str, threading.Thread] = {}
+        self._wanted: dict[str, str | None] = {}  # last requested version per model (None = legacy)
+        self._errors: dict[str, str | None] = {}
+        self._manifest_sig = None
+        self._next_poll = 0.0
+        self.swaps = 0
+
+    @property
+    def names(self) -> list[str]:
+        return list(self._loaders)
+
+    # ---------------------------------------------------------------- manifest
+    def _signature(self):
+        try:
+            st = (self.models_dir / MANIFEST).stat()
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def active_version(self, name: str) -> str | None:
+        return read_manifest(self.models_dir)["models"].get(name, {}).get("active")
+
+    def _version_dir(self, name: str, version: str | None) -> Path:
+        if version is None:
+            return self.models_dir
+        entry = read_manifest(self.models_dir)["models"].get(name, {}).get("versions", {}).get(version)
+        if entry is None:
+            raise KeyError(f"{name} version {version} is not published")
+        return self.models_dir / entry["path"]
+
+    def is_serving(self, name: str, version: str | None) -> bool:
+        cur = self._current.get(name)
+        return cur is not None and cur.version == (version or self.LEGACY)
+
+    def _poll(self):
+        if self.poll_s <= 0 or time.monotonic() < self._next_poll:
+            return
+        self._next_poll = time.monotonic() + self.poll_s
+        sig = self._signature()
+        if sig == self._manifest_sig:
+            return
+        synced = True
+        for name in list(self._started):
+            want = self.active_version(name)
+            if not self.is_serving(name, want):
+                synced = False
+                self.reload(name, want)
+        # remember the manifest as handled only once every model serves its active version,
+        # so an activation that is still loading (or failed to load) is retried next poll
+        if synced:
+            self._manifest_sig = sig
+
+    # ------------------------------------------------------------------ loading
+    def register(self, name: str, loader: Callable[[Path], Any], warmup: Callable[[Any], Any] | None = None):
+        """Add a model. Nothing is loaded until start(); `warmup(obj)` runs a dummy
+        prediction on each freshly loaded version before it starts serving."""
+        self._loaders[name] = loader
+        self._warmups[name] = warmup
+
+    def start(self, names: list[str] | None = None) -> list[threading.Thread]:
+        """Kick off background loads of the active versions (app startup)."""
+        self._manifest_sig = self._UNSYNCED
+        names = self.names if names is None else [n for n in names if n in self._loaders]
+        self._started.update(names)
+        return [self.reload(name) for name in names]
+
+    def _load(self, name: str, version: str | None):
+        t0 = time.perf_counter()
+        obj = self._loaders[name](self._version_dir(name, version))
+        t1 = time.perf_counter()
+        if self._warmups[name] is not None:
+            self._warmups[name](obj)  # first graph trace / allocations happen here, not on a request
+        lm = LoadedModel(name, version or self.LEGACY, obj, t1 - t0, time.perf_counter() - t1)
+        self._swap(lm)
+        self._errors[name] = None
+
+    def _swap(self, new: LoadedModel):
+        with self._lock:
+            old = self._current.get(new.name)
+            self._current[new.name] = new
+            self.swaps += 1
+            if old is not None:
+                old.retired = True
+                if old.refs:
+                    self._draining.setdefault(new.name, []).append(old)
+
+    def _background_load(self, name: str):
+        """Load the wanted version; if another one was requested meanwhile, load that next."""
+        while True:
+            with self._lock:
+                version = self._wanted[name]
+            try:
+                self._load(name, version)
+            except Exception as e:
+                self._errors[name] = f"{type(e).__name__}: {e}"  # keep serving what we have
+            with self._lock:
+                if self._wanted[name] == version:
+                    self._loading.pop(name, None)
+                    return
+
+    def reload(self, name: str, version: str | None = None, wait: bool = False) -> threading.Thread:
+        """Load `version` (default: the manifest's active one) in the background and swap it in.
+        A request made while a load is running is picked up when that load finishes."""
+        if name not in self._loaders:
+            raise KeyError(f"Unknown model {name!r}")
+        self._started.add(name)
+        if version is None:
+            version = self.active_version(name)
+        with self._lock:
+            self._wanted[name] = version
+            t = self._loading.get(name)
+            if t is None:
+                t = threading.Thread(target=self._background_load, args=(name,),
+                                     name=f"model-load-{name}", daemon=True)
+                self._loading[name] = t
+                t.start()
+        if wait:
+            t.join()
+        return t
+
+    # -------------------------------------------------------------------- access
+    def current(self, name: str) -> LoadedModel | None:
+        self._poll()
+        return self._current.get(name)
+
+    @contextmanager
+    def use(self, name: str):
+        """The serving version of `name` (or None), pinned until the block exits."""
+        self._poll()
+        with self._lock:
+            lm = self._current.get(name)
+            if lm is not None:
+                lm.refs += 1
+        try:
+            yield lm
+        finally:
+            if lm is not None:
+                with self._lock:
+                    lm.refs -= 1
+                    if lm.retired and lm.refs == 0 and lm in self._draining.get(name, []):
+                        self._draining[name].remove(lm)
+
+    def status(self, name: str) -> str:
+        """disabled (never started), loading, ready or failed."""
+        if self._current.get(name) is not None:
+            return "ready"
+        if name not in self._started:
+            return "disabled"
+        t = self._loading.get(name)
+        if t is not None and t.is_alive():
+            return "loading"
+        return "failed" if self._errors.get(name) else "loading"
+
+    def readiness(self) -> dict[str, Any]:
+        out = {}
+        for name in self.names:
+            cur = self._current.get(name)
+            out[name] = {"status": self.status(name), "version": cur.version if cur else None,
+                         "load_seconds": round(cur.load_seconds, 3) if cur else None,
+                         "warmup_seconds": round(cur.warmup_seconds, 3) if cur else None,
+                         "error": self._errors.get(name)}
+        return out
+
+    def describe(self) -> dict[str, Any]:
+        manifest = read_manifest(self.models_dir)["models"]
+        out = {}
+        for name in self.names:
+            cur = self._current.get(name)
+            entry = manifest.get(name, {})
+            t = self._loading.get(name)
+            out[name] = {
+                "status": self.status(name),
+                "serving": None if cur is None else {"version": cur.version, "loaded_at": cur.loaded_at,
+                                                     "load_seconds": round(cur.load_seconds, 3),
+                                                     "warmup_seconds": round(cur.warmup_seconds, 3), "refs": cur.refs},
+                "active": entry.get("active"),
+                "loading": bool(t and t.is_alive()),
+                "last_error": self._errors.get(name),
+                "draining": [{"version": d.version, "refs": d.refs} for d in self._draining.get(name, [])],
+                "versions": [{"version": v, **info} for v, info in entry.get("versions", {}).items()],
+            }
+        return out
+
+    def stats(self) -> dict[str, Any]:
+        return {name: (cur.version if (cur := self._current.get(name)) else None) for name in self.names}
+
+# one store per process; each uvicorn worker polls the manifest on its own
+store = ModelStore(MODELS, poll_s=settings.MODEL_MANIFEST_POLL_S)
+
+def unavailable(name: str, label: str):
+    """503 for a request that found no serving version of `name`."""
+    from fastapi import HTTPException
+    status = store.status(name)
+    if status == "loading":
+        return HTTPException(status_code=503, detail=f"{label} model is still loading.", headers={"Retry-After": "2"})
+    if status == "disabled":
+        return HTTPException(status_code=503, detail=f"{label} model is not enabled on this instance (LOAD_MODELS).")
+    return HTTPException(status_code=503, detail=f"{label} model not loaded yet. Train and save it first.")
+
+def _main():
+    p = argparse.ArgumentParser(description="Publish and activate versioned model snapshots")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    pub = sub.add_parser("publish", help="Snapshot the current files in models/ as a new version")
+    pub.add_argument("name", choices=sorted(MODEL_FILES))
+    pub.add_argument("--version", default=None, help="Version id (default: crop_meta.json version or a UTC stamp)")
+    pub.add_argument("--no-activate", action="store_true", help="Publish without switching traffic to it")
+    act = sub.add_parser("activate", help="Switch traffic to a published version")
+    act.add_argument("name", choices=sorted(MODEL_FILES))
+    act.add_argument("version")
+    sub.add_parser("list", help="Print the manifest")
+    args = p.parse_args()
+
+    if args.cmd == "publish":
+        print(json.dumps(publish(args.name, args.version, not args.no_activate), indent=2))
+    elif args.cmd == "activate":
+        activate(args.name, args.version)
+        print(f"{args.name}: active version is now {args.version}")
+    else:
+        print(json.dumps(read_manifest(), indent=2))
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,126 @@
+# app/prediction_cache.py
+"""
+LRU + TTL memo cache for model predictions.
+
+Keys are the feature record with every numeric feature quantized to a grid
+(`resolution`, optionally per feature), so near-identical requests from the
+same village share an entry, plus the model version. Seeing a new model
+version drops every entry made by the old one. A record with a non-scalar
+value (list, dict, ...) gets no key and is always predicted uncached, so the
+model reports the bad input instead of the cache raising on it.
+
+The Flask backend loads this same file (backend/services/prediction_cache.py),
+so keep it free of imports from this package.
+"""
+from __future__ import annotations
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Mapping, Sequence
+
+_SCALARS = (str, int, float, bool)
+
+
+def parse_resolutions(spec: str) -> dict[str, float]:
+    """'ph=0.05,rain_sum=5' -> {'ph': 0.05, 'rain_sum': 5.0}"""
+    out: dict[str, float] = {}
+    for part in (spec or "").split(","):
+        if "=" in part:
+            name, val = part.split("=", 1)
+            out[name.strip()] = float(val)
+    return out
+
+
+class PredictionCache:
+    def __init__(self, max_entries: int = 10000, ttl_s: float = 3600.0, resolution: float = 0.01,
+                 per_feature: Mapping[str, float] | None = None):
+        self.max_entries = int(max_entries)
+        self.ttl_s = float(ttl_s)
+        self.resolution = float(resolution)
+        self.per_feature = dict(per_feature or {})
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._version: Hashable = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    # ------------------------------------------------------------------ keys
+    def _q(self, name: str, v: Any) -> Any:
+        if isinstance(v, bool) or not isinstance(v, (int, float)):
+            return v
+        if math.isnan(v):
+            return "nan"
+        res = self.per_feature.get(name, self.resolution)
+        return round(v / res) if res > 0 else v
+
+    def key(self, record: Mapping[str, Any], features: Sequence[str]) -> tuple | None:
+        """Cache key for one record, or None if a feature value is not a scalar."""
+        values = [record.get(f) for f in features]
+        if not all(v is None or isinstance(v, _SCALARS) for v in values):
+            return None
+        return tuple(self._q(f, v) for f, v in zip(features, values))
+
+    # ---------------------------------------------------------------- access
+    def _check_version(self, version: Hashable) -> None:
+        if version != self._version:
+            self._data.clear()
+            if self._version is not None:
+                self.invalidations += 1
+            self._version = version
+
+    def get_many(self, keys: Sequence[tuple | None], version: Hashable) -> list[Any]:
+        """Cached value per key, or None for misses (expired entries and None keys count as misses)."""
+        now = time.monotonic()
+        out = []
+        with self._lock:
+            self._check_version(version)
+            for k in keys:
+                item = self._data.get(k) if k is not None else None
+                if item is not None and item[0] > now:
+                    self._data.move_to_end(k)
+                    self.hits += 1
+                    out.append(item[1])
+                    continue
+                if item is not None:
+                    del self._data[k]
+                self.misses += 1
+                out.append(None)
+        return out
+
+    def put_many(self, keys: Sequence[tuple | None], values: Sequence[Any], version: Hashable) -> None:
+        expires = time.monotonic() + self.ttl_s
+        with self._lock:
+            if version != self._version:
+                return  # computed with a model that has since been replaced
+            for k, v in zip(keys, values):
+                if k is None:
+                    continue
+                self._data[k] = (expires, v)
+                self._data.move_to_end(k)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._data),
+            "capacity": self.max_entries,
+            "ttl_s": self.ttl_s,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits / total) if total else 0.0,
+            "invalidations": self.invalidations,
+            "model_version": None if self._version is None else str(self._version),
+        }
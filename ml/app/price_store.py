@@ -0,0 +1,103 @@
+# app/price_store.py
+"""
+Indexed, in-memory view of market_prices.csv.
+
+The CSV is parsed once (only the columns we need, with explicit dtypes), sorted
+by (crop, state, date) and kept as flat NumPy columns plus an offset index
+{(crop, state): (start, stop)}. The last N observations of a series are a slice
+and the latest modal price is a single array lookup. The file is re-read when
+its mtime/size changes, and readers always see a complete snapshot.
+"""
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .market_registry import series_key
+
+
+class _Snapshot:
+    __slots__ = ("dates", "modal", "index")
+
+    def __init__(self, dates: np.ndarray, modal: np.ndarray, index: dict[tuple[str, str], tuple[int, int]]):
+        self.dates = dates
+        self.modal = modal
+        self.index = index
+
+
+_EMPTY = _Snapshot(np.empty(0, dtype="datetime64[ns]"), np.empty(0, dtype=np.float64), {})
+
+
+def _build(path: Path) -> _Snapshot:
+    df = pd.read_csv(
+        path,
+        usecols=["date", "crop", "state", "modal"],
+        dtype={"crop": "string", "state": "string", "modal": "float64"},
+    )
+    df = df.dropna(subset=["date", "crop", "state", "modal"])
+    df["date"] = pd.to_datetime(df["date"])
+    df["crop"] = df["crop"].str.strip().str.lower()
+    df["state"] = df["state"].str.strip().str.lower()
+    df = df.sort_values(["crop", "state", "date"], kind="mergesort").reset_index(drop=True)
+
+    crops = df["crop"].to_numpy(dtype=object)
+    states = df["state"].to_numpy(dtype=object)
+    index: dict[tuple[str, str], tuple[int, int]] = {}
+    if len(df):
+        # series boundaries = positions where (crop, state) changes
+        change = np.flatnonzero((crops[1:] != crops[:-1]) | (states[1:] != states[:-1])) + 1
+        starts = np.concatenate(([0], change))
+        stops = np.concatenate((change, [len(df)]))
+        for a, b in zip(starts.tolist(), stops.tolist()):
+            index[(crops[a], states[a])] = (a, b)
+    return _Snapshot(df["date"].to_numpy(), df["modal"].to_numpy(), index)
+
+
+class PriceHistoryStore:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._sig: tuple[int, int] | None = None
+        self._snap: _Snapshot = _EMPTY
+
+    def _signature(self) -> tuple[int, int] | None:
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def snapshot(self) -> _Snapshot:
+        sig = self._signature()
+        if sig != self._sig:
+            with self._lock:
+                if sig != self._sig:
+                    self._snap = _build(self.path) if sig is not None else _EMPTY
+                    self._sig = sig
+        return self._snap
+
+    # ---------------------------------------------------------------- queries
+    def count(self, crop: str, state: str) -> int:
+        a, b = self.snapshot().index.get(series_key(crop, state), (0, 0))
+        return b - a
+
+    def latest(self, crop: str, state: str) -> float | None:
+        snap = self.snapshot()
+        span = snap.index.get(series_key(crop, state))
+        if span is None:
+            return None
+        return float(snap.modal[span[1] - 1])
+
+    def history(self, crop: str, state: str, n: int | None = None) -> pd.DataFrame:
+        """Last `n` observations (all if None) as a [date, modal] frame sorted by date."""
+        snap = self.snapshot()
+        a, b = snap.index.get(series_key(crop, state), (0, 0))
+        if n is not None:
+            a = max(a, b - n)
+        return pd.DataFrame({"date": snap.dates[a:b], "modal": snap.modal[a:b]})
+
+    def series(self) -> list[tuple[str, str]]:
+        return list(self.snapshot().index)
@@ -0,0 +1,73 @@
+# app/routes_admin.py
+import hmac
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from .model_registry import store, publish, activate
+from .settings import settings
+
+
+def require_api_key(x_api_key: str = Header(default="")):
+    # publish/activate/reload change what every worker serves: off unless a real key is configured
+    if not settings.API_KEY or settings.API_KEY == "changeme":
+        raise HTTPException(status_code=503, detail="Admin API disabled: set ML_API_KEY to enable it.")
+    if not hmac.compare_digest(x_api_key.encode(), settings.API_KEY.encode()):
+        raise HTTPException(status_code=401, detail="Invalid or missing X-API-Key")
+
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_api_key)])
+
+
+def _known(name: str):
+    if name not in store.names:
+        raise HTTPException(status_code=404, detail=f"Unknown model {name!r}. Known: {store.names}")
+
+
+@router.get("/models")
+def list_models():
+    """Published versions per model, which one is active, and what this worker is serving."""
+    return store.describe()
+
+
+@router.post("/models/{name}/reload")
+def reload_model(
+    name: str,
+    version: str | None = Query(None, description="Published version to switch to (default: the manifest's active one)"),
+    wait: bool = Query(False, description="Block until the new version is loaded and serving"),
+):
+    """
+    Load a version in the background and swap it in; requests already running
+    finish on the version they started with. A given version is also made active
+    in the manifest, so the other workers follow it on their next poll.
+    """
+    _known(name)
+    if version is not None:
+        try:
+            activate(name, version, store.models_dir)
+        except KeyError as e:
+            raise HTTPException(status_code=404, detail=str(e.args[0]))
+    if version is None:
+        version = store.active_version(name)
+    store.reload(name, version, wait=wait)
+    state = store.describe()[name]
+    if wait and not store.is_serving(name, version):
+        raise HTTPException(status_code=500, detail={"error": f"{name} version {version or 'legacy'} failed to load",
+                                                     "last_error": state["last_error"], "state": state})
+    return state
+
+
+@router.post("/models/{name}/publish")
+def publish_model(
+    name: str,
+    version: str | None = Query(None, description="Version id (default: crop_meta.json version or a UTC stamp)"),
+    activate_now: bool = Query(True, alias="activate", description="Switch traffic to it"),
+):
+    """Snapshot the model files currently in models/ as a new version (after a training run)."""
+    _known(name)
+    try:
+        info = publish(name, version, activate_now, store.models_dir)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except FileExistsError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if activate_now:
+        store.reload(name, info["version"])
+    return info
@@ -1,48 +1,119 @@
 # app/routes_crop.py
 from fastapi import APIRouter, HTTPException
+import numpy as np
 import pandas as pd
-from .schemas import CropFeatures, CropResponse, CropScore
-from .model_registry import load_crop_model
+from .schemas import CropFeatures, CropResponse, CropScore, CropBatchRequest, CropBatchResponse
+from .model_registry import load_crop_model, compile_crop_model, artifact_version, store, unavailable
 from .deps_market import price_for, cost_for
-from .utils_preprocess import sustainability
+from .utils_preprocess import sustainability, sustainability_array
+from .settings import settings
+from .prediction_cache import PredictionCache, parse_resolutions
 
 router = APIRouter()
-# Load on import for speed
-try:
-    pipe, meta = load_crop_model()
-except Exception:
-    pipe, meta = None, {"crops": ["Wheat","Paddy","Maize","Mustard","Sugarcane"]}
+
+
+def _load(models_dir) -> dict:
+    """One servable crop version: pipeline, meta, compiled fast path and cache key."""
+    pipe, meta = load_crop_model(models_dir)
+    # Compiled fast path (falls back to the sklearn pipeline if the artifact can't be compiled)
+    compiled = None
+    if settings.CROP_COMPILED:
+        try:
+            compiled = compile_crop_model(pipe)
+        except Exception:
+            compiled = None
+    return {
+        "pipe": pipe,
+        "meta": meta,
+        "compiled": compiled,
+        "version": artifact_version(models_dir / "crop_reco_v1.joblib"),
+        "features": (meta.get("features_num", []) + meta.get("features_cat", [])) or
+                    sorted(set(CropFeatures.model_fields) - {"candidate_crops"}) + ["crop"],
+    }
+
+
+def _warmup(m: dict):
+    """Score one blank field so the first request doesn't pay for lazy init."""
+    field = {f: None if f in m["meta"].get("features_cat", []) else 0.0 for f in m["features"] if f != "crop"}
+    _infer_grid(m, [field], m["meta"].get("crops", [])[:1] or ["Wheat"])
+
+
+# Loaded in the background at startup (main.py lifespan); later versions are swapped in by the
+# registry (app/routes_admin.py). Until then store.use("crop") yields None and we answer 503
+store.register("crop", _load, _warmup)
+
+REASONS = [
+    "Soil pH & nutrients considered",
+    "Weather window summary applied",
+    "Latest market modal price used"
+]
+
+
+# Yield memo cache keyed on quantized features + model version (prices are never cached)
+cache = PredictionCache(
+    max_entries=settings.CROP_CACHE_SIZE,
+    ttl_s=settings.CROP_CACHE_TTL_S,
+    resolution=settings.CROP_CACHE_RESOLUTION,
+    per_feature=parse_resolutions(settings.CROP_CACHE_RESOLUTIONS),
+)
+
+
+def crop_meta() -> dict | None:
+    """Meta of the crop version currently serving (None if no model is loaded)."""
+    lm = store.current("crop")
+    return lm.obj["meta"] if lm is not None else None
+
+
+def _infer_grid(m: dict, fields: list[dict], crops: list[str]) -> np.ndarray:
+    if m["compiled"] is not None:
+        return m["compiled"].predict_grid(fields, crops)
+    X = pd.DataFrame([{**f, "crop": c} for f in fields for c in crops])
+    return np.asarray(m["pipe"].predict(X), dtype=np.float64).reshape(len(fields), len(crops))
+
+
+def _infer_records(m: dict, records: list[dict]) -> np.ndarray:
+    if m["compiled"] is not None:
+        return m["compiled"].predict_records(records)
+    return np.asarray(m["pipe"].predict(pd.DataFrame(records)), dtype=np.float64)
+
+
+def _predict_yields(m: dict, fields: list[dict], crops: list[str]) -> np.ndarray:
+    """Expected yield (q/ha) for every field x crop, shape (len(fields), len(crops))."""
+    if not cache.enabled:
+        return _infer_grid(m, fields, crops)
+
+    records = [{**f, "crop": c} for f in fields for c in crops]
+    keys = [cache.key(r, m["features"]) for r in records]
+    y = cache.get_many(keys, m["version"])
+    miss = [i for i, v in enumerate(y) if v is None]
+    if miss:
+        # full miss keeps the broadcast grid path; partial misses score just those cells
+        if len(miss) == len(y):
+            fresh = _infer_grid(m, fields, crops).ravel().tolist()
+        else:
+            fresh = _infer_records(m, [records[i] for i in miss]).tolist()
+        for i, v in zip(miss, fresh):
+            y[i] = v
+        cache.put_many([keys[i] for i in miss], fresh, m["version"])
+    return np.asarray(y, dtype=np.float64).reshape(len(fields), len(crops))
+
 
 @router.post("/predict/crops", response_model=CropResponse)
 def predict_crops(payload: CropFeatures):
-    if pipe is None:
-        raise HTTPException(status_code=503, detail="Crop model not loaded yet. Train and save it first.")
-
-    crops = payload.candidate_crops or meta.get("crops", [])
-    if not crops:
-        raise HTTPException(status_code=400, detail="No candidate crops provided and model meta missing.")
-
-    rows = []
-    for c in crops:
-        rows.append({
-            "ph": payload.ph,
-            "moisture": payload.moisture,
-            "n": payload.n, "p": payload.p, "k": payload.k,
-            "rain_sum": payload.rain_sum,
-            "tmin_avg": payload.tmin_avg, "tmax_avg": payload.tmax_avg,
-            "humidity_avg": payload.humidity_avg, "wind_avg": payload.wind_avg,
-            "prev_crop_1": payload.prev_crop_1, "prev_crop_2": payload.prev_crop_2,
-            "village": payload.village, "state": payload.state,
-            "irrigation": payload.irrigation, "area_ha": payload.area_ha,
-            "lat": payload.lat, "lon": payload.lon,
-            "sowing_month": payload.sowing_month,
-            "crop": c
-        })
-    X = pd.DataFrame(rows)
-    try:
-        y_hat = pipe.predict(X)  # expected yield (q/ha)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Inference error: {e}")
+    # the version in hand stays loaded until this request is done, even if a reload swaps it out
+    with store.use("crop") as lm:
+        if lm is None:
+            raise unavailable("crop", "Crop")
+
+        crops = payload.candidate_crops or lm.obj["meta"].get("crops", [])
+        if not crops:
+            raise HTTPException(status_code=400, detail="No candidate crops provided and model meta missing.")
+
+        field = payload.model_dump(exclude={"candidate_crops"})
+        try:
+            y_hat = _predict_yields(lm.obj, [field], crops)[0]  # expected yield (q/ha)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Inference error: {e}")
 
     scored: list[CropScore] = []
     for i, c in enumerate(crops):
@@ -58,12 +129,68 @@ def predict_crops(payload: CropFeatures):
             cost_estimate=float(cx),
             expected_profit=float(profit),
             sustainability_score=float(sust),
-            reasons=[
-                "Soil pH & nutrients considered",
-                "Weather window summary applied",
-                "Latest market modal price used"
-            ]
+            reasons=REASONS
         ))
 
     scored.sort(key=lambda s: (s.expected_profit, s.expected_yield_q_per_ha, s.sustainability_score), reverse=True)
     return CropResponse(top=scored[:5])
+
+
+@router.post("/predict/crops/batch", response_model=CropBatchResponse)
+def predict_crops_batch(payload: CropBatchRequest):
+    """
+    Score N fields x M crops with one model call; profit/sustainability are array ops
+    and each field's top-k comes from a partial sort.
+    """
+    with store.use("crop") as lm:
+        if lm is None:
+            raise unavailable("crop", "Crop")
+        if not payload.fields:
+            return CropBatchResponse(results=[])
+        if len(payload.fields) > settings.CROP_BATCH_MAX_FIELDS:
+            raise HTTPException(status_code=413, detail=f"At most {settings.CROP_BATCH_MAX_FIELDS} fields per batch.")
+
+        crops = payload.candidate_crops or lm.obj["meta"].get("crops", [])
+        if not crops:
+            raise HTTPException(status_code=400, detail="No candidate crops provided and model meta missing.")
+
+        fields = [f.model_dump(exclude={"candidate_crops"}) for f in payload.fields]
+        try:
+            y_hat = _predict_yields(lm.obj, fields, crops)  # (N, M)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Inference error: {e}")
+
+    # price/cost only vary by (crop, state): look up each distinct state once
+    states, state_idx = np.unique([f["state"] for f in fields], return_inverse=True)
+    px = np.array([[price_for(c, s) for c in crops] for s in states])[state_idx]
+    cx = np.array([[cost_for(c, s) for c in crops] for s in states])[state_idx]
+    profit = y_hat * px - cx
+
+    sust = sustainability_array(*([f[k] for f in fields] for k in ("ph", "n", "p", "k", "irrigation", "rain_sum")))
+
+    # top-k per field by (profit, yield) descending, without sorting all M crops
+    k = min(payload.top_k, len(crops))
+    rows = np.arange(len(fields))[:, None]
+    part = np.argpartition(-profit, k - 1, axis=1)[:, :k]
+    # rows with ties straddling the k-th profit need the full (profit, yield, input order) ranking
+    kth = profit[rows, part].min(axis=1)
+    for i in np.flatnonzero((profit >= kth[:, None]).sum(axis=1) > k):
+        part[i] = np.lexsort((np.arange(len(crops)), -y_hat[i], -profit[i]))[:k]
+    order = np.lexsort((part, -y_hat[rows, part], -profit[rows, part]), axis=1)
+    top = np.take_along_axis(part, order, axis=1)
+
+    results = []
+    for i in range(len(fields)):
+        results.append(CropResponse(top=[
+            CropScore(
+                crop=crops[j],
+                expected_yield_q_per_ha=float(y_hat[i, j]),
+                expected_price=float(px[i, j]),
+                cost_estimate=float(cx[i, j]),
+                expected_profit=float(profit[i, j]),
+                sustainability_score=float(sust[i]),
+                reasons=REASONS,
+            )
+            for j in top[i]
+        ]))
+    return CropBatchResponse(results=results)
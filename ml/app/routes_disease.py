@@ -1,31 +1,277 @@
 # app/routes_disease.py
+from typing import List
 from fastapi import APIRouter, UploadFile, File, HTTPException
-from .model_registry import load_disease_model
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from .model_registry import artifact_version, load_disease_engine, load_disease_labels, load_disease_fast_model, store, unavailable
+from .batching import MicroBatcher
+from .image_cache import ImageResultCache, content_key
+from .image_preprocess import IMG_SIZE, BatchBuffer, dhash, open_draft, resize_into
+from .settings import settings
+from contextlib import ExitStack
 import numpy as np
-from PIL import Image
-import io, tensorflow as tf
+import asyncio, json, logging
 
 router = APIRouter()
-try:
-    model, labels = load_disease_model()
-except Exception:
-    model, labels = None, []
+log = logging.getLogger(__name__)
+threads = settings.DISEASE_THREADS or None
+
+
+def _version(model, fast_model, threshold) -> str:
+    """Everything that changes an answer: engine, artifacts, cascade threshold."""
+    parts = [settings.DISEASE_ENGINE, artifact_version(model.path)]
+    if fast_model is not None:
+        parts += [artifact_version(fast_model.path), f"threshold={threshold}"]
+    return "|".join(parts)
+
+
+def _load(models_dir) -> dict:
+    """One servable disease version: main model, labels and the optional cascade stage 1."""
+    model = load_disease_engine(engine=settings.DISEASE_ENGINE, num_threads=threads, models_dir=models_dir)
+    labels = load_disease_labels(models_dir)
+
+    # cascade stage 1 (optional): cheap model first, EfficientNet only when it is unsure
+    fast_model, threshold = None, None
+    if settings.DISEASE_CASCADE:
+        engine = settings.DISEASE_ENGINE
+        fast_path = models_dir / f"disease_fast_v1.{'tflite' if engine == 'tflite' else 'keras'}"
+        if not fast_path.exists():
+            log.info("no cascade stage 1 at %s; serving the full model only", fast_path)
+        else:
+            try:
+                fast_model, threshold = load_disease_fast_model(engine, threads, models_dir)
+            except Exception:
+                # the full model still serves; /api/info reports cascade.enabled=false
+                log.exception("cascade stage 1 %s failed to load with engine %r; serving without the cascade",
+                              fast_path, engine)
+                fast_model = None
+        if settings.DISEASE_CASCADE_THRESHOLD:
+            threshold = float(settings.DISEASE_CASCADE_THRESHOLD)
+        if threshold is None:
+            threshold = 0.9
+    return {"model": model, "labels": labels, "fast_model": fast_model, "threshold": threshold,
+            "version": _version(model, fast_model, threshold)}
+
+
+def _warmup(m: dict):
+    """Run a blank batch through each stage: traces the graph / allocates tensors
+    so the first real request doesn't. Sized like a full micro-batch."""
+    arr = np.zeros((max(1, settings.DISEASE_MAX_BATCH), IMG_SIZE[1], IMG_SIZE[0], 3), dtype=np.uint8)
+    for engine in (m["fast_model"], m["model"]):
+        if engine is not None:
+            engine.predict(arr)
+            engine.predict(arr[:1])
+
+
+# Loaded in the background at startup (main.py lifespan), so importing this module doesn't import
+# TensorFlow; later versions are swapped in by the registry (app/routes_admin.py)
+store.register("disease", _load, _warmup)
+
+# which stage answered, for /api/info (only touched by the batcher's worker thread)
+stage_counts = {"fast": 0, "full": 0}
+cache = ImageResultCache(settings.DISEASE_CACHE_SIZE, settings.DISEASE_CACHE_MAX_DISTANCE)
+
+
+def _top1(engine, arr: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Class index and confidence per image. Both stages end in a softmax layer
+    (train_disease.py), so their outputs are used as probabilities as is: the
+    confidence means the same thing whichever stage answered, and so does the
+    cascade threshold."""
+    probs = engine.predict(arr)
+    return np.argmax(probs, axis=1), np.max(probs, axis=1)
+
+
+def _predict_group(m: dict, images: list[np.ndarray]) -> list[tuple[int, float, str]]:
+    arr = _batch_buf.stack(images)
+    if m["fast_model"] is None:
+        idx, conf = _top1(m["model"], arr)
+        stage = np.full(len(arr), "full", dtype=object)
+    else:
+        idx, conf = _top1(m["fast_model"], arr)
+        stage = np.full(len(arr), "fast", dtype=object)
+        unsure = np.flatnonzero(conf < m["threshold"])
+        if len(unsure):
+            idx[unsure], conf[unsure] = _top1(m["model"], arr[unsure])
+            stage[unsure] = "full"
+    n_full = int((stage == "full").sum())
+    stage_counts["full"] += n_full
+    stage_counts["fast"] += len(arr) - n_full
+    return [(int(i), float(c), s) for i, c, s in zip(idx, conf, stage)]
+
+
+def _predict_batch(items: list[tuple[np.ndarray, dict]]) -> list[tuple[int, float, str]]:
+    """Runs on the batcher's worker thread: one model call per stage for the whole batch.
+    Each item carries the model version its request started on; a batch only spans
+    two versions right after a reload, and then each group runs on its own model."""
+    groups: dict[int, list[int]] = {}
+    for i, (_, m) in enumerate(items):
+        groups.setdefault(id(m), []).append(i)
+    out: list = [None] * len(items)
+    for rows in groups.values():
+        for i, r in zip(rows, _predict_group(items[rows[0]][1], [items[i][0] for i in rows])):
+            out[i] = r
+    return out
+
+
+_batch_buf = BatchBuffer(settings.DISEASE_MAX_BATCH, IMG_SIZE)  # only used on the batcher's thread
+
+batcher = MicroBatcher(
+    _predict_batch,
+    max_batch=settings.DISEASE_MAX_BATCH,
+    max_wait_ms=settings.DISEASE_MAX_WAIT_MS,
+    name="disease-batch",
+)
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+def _prepare(data: bytes, version: str) -> tuple[int | None, dict | None, np.ndarray | None]:
+    """Threadpool side of an exact-cache miss: one reduced decode gives the
+    perceptual hash and, unless a near-duplicate is cached, the model input."""
+    img = open_draft(data, IMG_SIZE)
+    phash = None
+    if cache.near_enabled:
+        phash = dhash(img)
+        hit = cache.get_near(phash, version)
+        if hit is not None:
+            return phash, hit, None
+    elif cache.enabled:
+        cache.miss()
+    # Decoded into a fresh array, not a batch slot: decoding runs here, concurrently, before the
+    # batcher has decided which batch (and row) the image lands in, and the array must outlive
+    # this call until that batch runs. _batch_buf.stack() then copies it into the model input.
+    return phash, None, resize_into(img, np.empty((IMG_SIZE[1], IMG_SIZE[0], 3), dtype=np.uint8))
+
+
+async def _predict_bytes(data: bytes, m: dict) -> dict:
+    """Cached prediction for one upload on model version `m`. Raises InvalidImage if it can't be decoded."""
+    key = content_key(data) if cache.enabled else None
+    if key is not None:
+        hit = cache.get_exact(key, m["version"])
+        if hit is not None:
+            return {**hit, "cache": "exact"}  # no decode, no inference
+    try:
+        phash, hit, arr = await run_in_threadpool(_prepare, data, m["version"])
+    except Exception as e:
+        raise InvalidImage("Invalid image file") from e
+    if hit is not None:
+        return {**hit, "cache": "near"}
+
+    idx, conf, stage = await batcher.submit((arr, m))
+    labels = m["labels"]
+    label = labels[idx] if labels and 0 <= idx < len(labels) else f"class_{idx}"
+    result = {"diagnosis": label, "confidence": conf, "stage": stage}
+    if key is not None:
+        cache.put(key, phash, result, m["version"])
+    return {**result, "cache": "miss"}
 
-IMG_SIZE = (224, 224)
 
 @router.post("/predict/disease")
 async def predict_disease(file: UploadFile = File(...)):
-    if model is None:
-        raise HTTPException(status_code=503, detail="Disease model not loaded yet. Train and save it first.")
+    # the version in hand stays loaded until this request is done, even if a reload swaps it out
+    with store.use("disease") as lm:
+        if lm is None:
+            raise unavailable("disease", "Disease")
+        try:
+            return await _predict_bytes(await file.read(), lm.obj)
+        except InvalidImage:
+            raise HTTPException(status_code=400, detail="Invalid image file")
+
+
+async def _predict_upload(index: int, file: UploadFile, m: dict) -> dict:
+    """One NDJSON line; never raises (errors become an `error` line, details go to the log)."""
+    out = {"index": index, "filename": file.filename}
     try:
-        img = Image.open(io.BytesIO(await file.read())).convert("RGB").resize(IMG_SIZE)
+        try:
+            data = await file.read()
+        finally:
+            await file.close()
+        return {**out, **await _predict_bytes(data, m)}
+    except InvalidImage:
+        return {**out, "error": "Invalid image file"}
     except Exception:
-        raise HTTPException(status_code=400, detail="Invalid image file")
+        log.exception("disease prediction failed for upload %d (%r)", index, file.filename)
+        return {**out, "error": "Prediction failed"}
 
-    arr = np.array(img)[None, ...]
-    logits = model.predict(arr, verbose=0)
-    probs = tf.nn.softmax(logits).numpy()
-    idx = int(np.argmax(probs, axis=1)[0])
-    conf = float(np.max(probs))
-    label = labels[idx] if labels and 0 <= idx < len(labels) else f"class_{idx}"
-    return {"diagnosis": label, "confidence": conf}
+
+async def _stream_predictions(files: List[UploadFile], m: dict, pin: ExitStack):
+    """
+    NDJSON lines in completion order. At most DISEASE_STREAM_WINDOW images are
+    read/decoded/queued at once: uploads wait in Starlette's spooled temp files
+    until a slot frees up, so memory doesn't grow with the number of files.
+    Decoding runs in the threadpool while earlier images are in the batcher,
+    which groups them into DISEASE_MAX_BATCH-sized model calls. The whole
+    stream is answered by model version `m`, which `pin` keeps loaded until
+    the stream ends.
+    """
+    with pin:
+        async for line in _stream_on(files, m):
+            yield line
+
+
+async def _stream_on(files: List[UploadFile], m: dict):
+    window = asyncio.Semaphore(max(1, settings.DISEASE_STREAM_WINDOW))
+    results: asyncio.Queue = asyncio.Queue()
+    tasks: set[asyncio.Task] = set()
+
+    async def one(i: int, f: UploadFile):
+        # every file must queue exactly one line, or the loop below waits forever
+        try:
+            line = await _predict_upload(i, f, m)
+        except Exception:
+            log.exception("disease prediction failed for upload %d (%r)", i, f.filename)
+            line = {"index": i, "filename": f.filename, "error": "Prediction failed"}
+        finally:
+            window.release()
+        results.put_nowait(line)
+
+    async def feed():
+        for i, f in enumerate(files):
+            await window.acquire()
+            t = asyncio.create_task(one(i, f))
+            tasks.add(t)
+            t.add_done_callback(tasks.discard)
+
+    feeder = asyncio.create_task(feed())
+    try:
+        for _ in range(len(files)):
+            yield json.dumps(await results.get()) + "\n"
+    finally:
+        # client went away (or we're done): don't keep decoding for nobody
+        feeder.cancel()
+        for t in list(tasks):
+            t.cancel()
+
+
+@router.post("/predict/disease/batch")
+async def predict_disease_batch(files: List[UploadFile] = File(...)):
+    """One multipart request with many `files`; streams one JSON object per image
+    ({index, filename, diagnosis, confidence, stage} or {index, filename, error})."""
+    if len(files) > settings.DISEASE_BATCH_MAX_FILES:
+        raise HTTPException(status_code=413, detail=f"At most {settings.DISEASE_BATCH_MAX_FILES} images per batch.")
+    # pin the version here, so a reload between this check and the first line can't empty the stream;
+    # _stream_predictions releases it when the stream ends
+    pin = ExitStack()
+    lm = pin.enter_context(store.use("disease"))
+    if lm is None:
+        pin.close()
+        raise unavailable("disease", "Disease")
+    return StreamingResponse(_stream_predictions(files, lm.obj, pin), media_type="application/x-ndjson")
+
+
+def stats() -> dict:
+    lm = store.current("disease")
+    m = lm.obj if lm is not None else {"model": None, "fast_model": None}
+    return {
+        "engine": getattr(m["model"], "name", None),
+        "runtime": getattr(m["model"], "runtime", None),  # which TFLite runtime, for the tflite engine
+        "model_version": lm.version if lm is not None else None,
+        "cascade": {
+            "enabled": m["fast_model"] is not None,
+            "threshold": m["threshold"] if m["fast_model"] is not None else None,
+            "answered_by": dict(stage_counts),
+        },
+        "cache": cache.stats(),
+    }
@@ -1,18 +1,18 @@
 # app/routes_market.py
 from fastapi import APIRouter, HTTPException, Query
-import pandas as pd, joblib, json
 from pathlib import Path
 from .settings import settings
+from .market_registry import MarketModelRegistry
+from .deps_market import prices
+from .forecast_store import ForecastStore
 
 router = APIRouter()
 MODELS = Path(__file__).resolve().parents[1] / "models"
-DATA = Path(settings.DATA_PATH)
 
-def _load_registry():
-    meta_path = MODELS / "market_meta.json"
-    if not meta_path.exists():
-        return {"models": [], "horizon": 7}
-    return json.loads(meta_path.read_text())
+# market_meta.json indexed once (reloaded on change) + LRU of unpickled boosters
+registry = MarketModelRegistry(MODELS, max_models=settings.MARKET_MODEL_CACHE_SIZE)
+# precomputed forecasts written by traning/materialize_forecasts.py
+forecasts = ForecastStore(MODELS / "market_forecasts.sqlite")
 
 @router.get("/predict/market")
 def predict_market(
@@ -22,47 +22,53 @@ def predict_market(
 ):
     """
     Forecast mandi modal prices for the next N days (per crop,state).
-    Uses trained XGBoost model artifacts saved in /models.
+    Served from the materialized forecast store when it has a fresh entry;
+    otherwise computed live from the trained XGBoost artifacts in /models.
     """
-    registry = _load_registry()
-    entry = next(
-        (m for m in registry["models"]
-         if m["crop"].lower() == crop.lower() and m["state"].lower() == state.lower()),
-        None
-    )
+    entry = registry.entry(crop, state)
     if not entry:
         raise HTTPException(404, f"No trained market model for crop={crop}, state={state}")
+    metrics = {
+        "mae": entry.get("mae"),
+        "mape": entry.get("mape"),
+        "n_train": entry.get("n_train"),
+        "n_val": entry.get("n_val"),
+    }
 
-    # Load model + features
-    blob = joblib.load(MODELS / entry["path"])
-    model, feat_cols = blob["model"], blob["feat_cols"]
+    hit = forecasts.lookup(crop, state, horizon, max_age_s=settings.FORECAST_MAX_AGE_HOURS * 3600)
+    if hit is not None:
+        return {
+            "crop": crop,
+            "state": state,
+            "horizon": horizon,
+            "forecast": hit["forecast"],
+            "metrics": metrics,
+            "source": "materialized",
+            "generated_at": hit["generated_at"],
+            "age_seconds": hit["age_seconds"],
+        }
 
-    # Load recent history
-    prices = pd.read_csv(DATA / "market_prices.csv")
-    prices["date"] = pd.to_datetime(prices["date"])
-    hist = prices[
-        (prices["crop"].str.lower() == crop.lower()) &
-        (prices["state"].str.lower() == state.lower())
-    ][["date", "modal"]].dropna().sort_values("date")
+    # Miss (or stale): load model + features
+    blob = registry.load(entry)
+    model, feat_cols = blob["model"], blob["feat_cols"]
 
-    if len(hist) < 60:
+    # Recent history: a slice of the indexed price store
+    if prices.count(crop, state) < 60:
         raise HTTPException(400, "Not enough recent history to forecast.")
+    hist = prices.history(crop, state, 60)
 
-    # Import helper funcs from training script
-    from training.train_markets import _make_time_features, _recursive_forecast
+    # Import the forecaster from the training script (ml/traning)
+    from traning.train_markets import _recursive_forecast
 
-    hist_feats = _make_time_features(hist)
-    future = _recursive_forecast(hist_feats.tail(60), model, feat_cols, horizon)
+    future = _recursive_forecast(hist, model, feat_cols, horizon)
 
     return {
         "crop": crop,
         "state": state,
         "horizon": horizon,
         "forecast": future.to_dict(orient="records"),
-        "metrics": {
-            "mae": entry.get("mae"),
-            "mape": entry.get("mape"),
-            "n_train": entry.get("n_train"),
-            "n_val": entry.get("n_val"),
-        }
+        "metrics": metrics,
+        "source": "live",
+        "generated_at": None,
+        "age_seconds": 0.0,
     }
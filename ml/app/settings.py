@@ -9,10 +9,59 @@ class Settings:
     DATA_PATH: str = os.getenv("DATA_PATH", "data")
     MODELS_PATH: str = os.getenv("MODELS_PATH", "models")
 
+    # Crop inference: run the booster on precompiled arrays instead of pandas + sklearn
+    CROP_COMPILED: bool = os.getenv("CROP_COMPILED", "1") == "1"
+    CROP_BATCH_MAX_FIELDS: int = int(os.getenv("CROP_BATCH_MAX_FIELDS", "5000"))
+
+    # Crop yield memo cache (0 entries disables). Numeric features are bucketed to
+    # CROP_CACHE_RESOLUTION, overridable per feature, e.g. "ph=0.05,rain_sum=5"
+    CROP_CACHE_SIZE: int = int(os.getenv("CROP_CACHE_SIZE", "20000"))
+    CROP_CACHE_TTL_S: float = float(os.getenv("CROP_CACHE_TTL_S", "3600"))
+    CROP_CACHE_RESOLUTION: float = float(os.getenv("CROP_CACHE_RESOLUTION", "0.01"))
+    CROP_CACHE_RESOLUTIONS: str = os.getenv("CROP_CACHE_RESOLUTIONS", "")
+
+    # Disease inference micro-batching: flush at DISEASE_MAX_BATCH images or after DISEASE_MAX_WAIT_MS
+    DISEASE_MAX_BATCH: int = int(os.getenv("DISEASE_MAX_BATCH", "16"))
+    DISEASE_MAX_WAIT_MS: float = float(os.getenv("DISEASE_MAX_WAIT_MS", "10"))
+
+    # Disease result cache keyed by upload bytes (exact) and 64-bit dHash (near-duplicates
+    # within DISEASE_CACHE_MAX_DISTANCE bits; -1 = exact only). 0 entries disables
+    DISEASE_CACHE_SIZE: int = int(os.getenv("DISEASE_CACHE_SIZE", "5000"))
+    DISEASE_CACHE_MAX_DISTANCE: int = int(os.getenv("DISEASE_CACHE_MAX_DISTANCE", "4"))
+
+    # /api/predict/disease/batch: max files per request, and images in flight (read + decoded +
+    # queued) at once, which bounds memory regardless of upload size
+    DISEASE_BATCH_MAX_FILES: int = int(os.getenv("DISEASE_BATCH_MAX_FILES", "200"))
+    DISEASE_STREAM_WINDOW: int = int(os.getenv("DISEASE_STREAM_WINDOW", "32"))
+
+    # Disease inference engine: "keras" or "tflite" (quantized export from train_disease.py
+    # --export-tflite, served with ai-edge-litert / tflite-runtime when installed). 0 threads = runtime default
+    DISEASE_ENGINE: str = os.getenv("DISEASE_ENGINE", "keras")
+    DISEASE_THREADS: int = int(os.getenv("DISEASE_THREADS", "0"))
+
+    # Disease cascade: the small model answers when its top-1 confidence is at least the
+    # threshold, otherwise EfficientNet runs. Empty threshold = value picked at training time
+    DISEASE_CASCADE: bool = os.getenv("DISEASE_CASCADE", "1") == "1"
+    DISEASE_CASCADE_THRESHOLD: str = os.getenv("DISEASE_CASCADE_THRESHOLD", "")
+
+    # Models to load in the background at startup (and that /api/ready waits for), e.g. "crop"
+    # for a crop-only replica that never imports TensorFlow. Others answer 503
+    LOAD_MODELS: list[str] = [m.strip() for m in os.getenv("LOAD_MODELS", "crop,disease").split(",") if m.strip()]
+
+    # Versioned models (models/manifest.json): how often each worker re-checks the manifest for a
+    # newly activated version to load in the background and swap in. 0 = only on admin reload
+    MODEL_MANIFEST_POLL_S: float = float(os.getenv("MODEL_MANIFEST_POLL_S", "5"))
+
+    # Market forecasting: max number of unpickled per-(crop, state) models kept in memory
+    MARKET_MODEL_CACHE_SIZE: int = int(os.getenv("MARKET_MODEL_CACHE_SIZE", "64"))
+
+    # Materialized market forecasts older than this are ignored (computed live instead)
+    FORECAST_MAX_AGE_HOURS: float = float(os.getenv("FORECAST_MAX_AGE_HOURS", "36"))
+
     # CORS
     ALLOWED_ORIGINS: list[str] = os.getenv("ALLOWED_ORIGINS", "http://localhost:5173").split(",")
 
-    # Security
-    API_KEY: str = os.getenv("ML_API_KEY", "changeme")  # secure in prod!
+    # Security: X-API-Key for /api/admin/*. Unset (or the old "changeme") disables the admin API
+    API_KEY: str = os.getenv("ML_API_KEY", "")
 
 settings = Settings()
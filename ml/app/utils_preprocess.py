@@ -1,4 +1,6 @@
 # app/utils_preprocess.py
+import numpy as np
+
 def sustainability(ph, n, p, k, irrigation, rain_sum) -> float:
     score = 80.0
     if ph < 6.0 or ph > 7.8:
@@ -8,3 +10,14 @@ def sustainability(ph, n, p, k, irrigation, rain_sum) -> float:
     if n > 100 or p > 60 or k > 120:
         score -= 10
     return max(0.0, min(100.0, score))
+
+
+def sustainability_array(ph, n, p, k, irrigation, rain_sum) -> np.ndarray:
+    """Vectorized `sustainability` over arrays of fields."""
+    ph, n, p, k, rain_sum = (np.asarray(a, dtype=np.float64) for a in (ph, n, p, k, rain_sum))
+    drip = np.array([(i or "").lower() == "drip" for i in irrigation], dtype=bool)
+    score = np.full(ph.shape, 80.0)
+    score -= 10 * ((ph < 6.0) | (ph > 7.8))
+    score -= 5 * ((rain_sum < 10) & ~drip)
+    score -= 10 * ((n > 100) | (p > 60) | (k > 120))
+    return np.clip(score, 0.0, 100.0)
@@ -0,0 +1,90 @@
+# ml/tests/bench_decode.py
+"""
+Benchmark the disease-image decode path: the original
+Image.open().convert("RGB").resize() + np.array() vs app/image_preprocess.py
+(JPEG draft mode + preallocated batch buffer).
+
+    cd ml && python tests/bench_decode.py                    # synthetic 12 MP photos
+    cd ml && python tests/bench_decode.py --images data/leaves/val/rust
+"""
+from pathlib import Path
+import argparse, io, sys, time
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.image_preprocess import IMG_SIZE, BatchBuffer, decode_into  # noqa: E402
+
+
+def synthetic_photos(n, size=(4000, 3000), quality=90):
+    """Smooth leaf-ish gradients + noise, saved like a phone camera would."""
+    rng = np.random.default_rng(0)
+    w, h = size
+    yy, xx = np.mgrid[0:h, 0:w].astype(np.float32)
+    out = []
+    for i in range(n):
+        base = np.stack([
+            60 + 40 * np.sin(xx / (300 + 50 * i)),
+            120 + 60 * np.cos(yy / (400 + 30 * i)),
+            50 + 30 * np.sin((xx + yy) / 500),
+        ], axis=-1)
+        img = np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8)
+        buf = io.BytesIO()
+        Image.fromarray(img).save(buf, "JPEG", quality=quality)
+        out.append(buf.getvalue())
+    return out
+
+
+def load_photos(folder):
+    exts = {".jpg", ".jpeg", ".png", ".webp"}
+    return [p.read_bytes() for p in sorted(Path(folder).rglob("*")) if p.suffix.lower() in exts]
+
+
+def baseline(data):
+    img = Image.open(io.BytesIO(data)).convert("RGB").resize(IMG_SIZE)
+    return np.array(img)[None, ...]
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark disease image decode + resize")
+    p.add_argument("--images", type=Path, help="Folder of photos (default: synthetic 12 MP JPEGs)")
+    p.add_argument("--n", type=int, default=16, help="Number of synthetic photos")
+    p.add_argument("--repeat", type=int, default=3, help="Timing repeats (best is reported)")
+    args = p.parse_args()
+
+    if args.images:
+        blobs = load_photos(args.images)
+        if not blobs:
+            sys.exit(f"[ERROR] No images found in {args.images}")
+    else:
+        print(f"Generating {args.n} synthetic 4000x3000 JPEGs ...")
+        blobs = synthetic_photos(args.n)
+
+    t_old, old = timed(lambda: np.concatenate([baseline(b) for b in blobs]), args.repeat)
+
+    buf = BatchBuffer(len(blobs))
+    t_new, new = timed(lambda: buf.decode(blobs), args.repeat)
+
+    one = np.empty(IMG_SIZE[::-1] + (3,), dtype=np.uint8)
+    t_single, _ = timed(lambda: [decode_into(b, one) for b in blobs], args.repeat)
+
+    diff = np.abs(old.astype(np.int16) - new.astype(np.int16))
+    n = len(blobs)
+    print(f"images: {n}  ({sum(map(len, blobs)) / n / 1e6:.2f} MB avg)")
+    print(f"baseline  open+convert+resize+np.array : {1000 * t_old / n:8.2f} ms/img")
+    print(f"draft     into batch buffer            : {1000 * t_new / n:8.2f} ms/img  ({t_old / t_new:.1f}x)")
+    print(f"draft     into one reused array        : {1000 * t_single / n:8.2f} ms/img  ({t_old / t_single:.1f}x)")
+    print(f"pixel difference vs baseline: mean {diff.mean():.2f}, p99 {np.percentile(diff, 99):.0f}, max {diff.max()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+# ml/tests/smoke_disease_models.py
+"""
+Smoke run for the disease model builders in traning/train_disease.py: build the
+EfficientNet model and the cascade stage-1 MobileNetV3 (ImageNet weights are
+downloaded on first run), push one blank batch through each and check the
+output shape. Catches backbone/weights combinations Keras can't load before a
+long --cascade run does.
+
+    cd ml && python tests/smoke_disease_models.py
+"""
+from pathlib import Path
+import argparse, sys
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "traning"))
+from train_disease import FAST_SIZE, IMG_SIZE, build_fast_model, build_model  # noqa: E402
+
+
+def main():
+    p = argparse.ArgumentParser(description="Build both disease models and run one batch")
+    p.add_argument("--classes", type=int, default=5)
+    p.add_argument("--fast-only", action="store_true", help="Skip EfficientNet")
+    args = p.parse_args()
+
+    x = np.zeros((2,) + IMG_SIZE + (3,), dtype=np.float32)
+    fast = build_fast_model(args.classes, FAST_SIZE)
+    out = fast.predict(x, verbose=0)
+    assert out.shape == (2, args.classes), out.shape
+    print(f"fast model OK: {fast.count_params():,} params, output {out.shape}")
+
+    if not args.fast_only:
+        full, _ = build_model(args.classes)
+        out = full.predict(x, verbose=0)
+        assert out.shape == (2, args.classes), out.shape
+        print(f"full model OK: {full.count_params():,} params, output {out.shape}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# training/materialize_forecasts.py
+"""
+Precompute market forecasts for every trained (crop, state) series.
+
+Forecasts are recursive, so the first h days of a max-horizon run are exactly
+the h-day forecast: one run per series at --max-horizon covers every horizon.
+Results go to a small SQLite file keyed by normalized (crop, state, day), which
+both the FastAPI /api/predict/market route and the Flask /api/markets/forecast
+blueprint read; they fall back to live compute only on a miss.
+
+Output (models/market_forecasts.sqlite):
+    series(crop_key, state_key, crop, state, horizon_max, model_path, generated_at)
+    forecasts(crop_key, state_key, day, date, modal_pred)
+
+Usage (runs automatically at the end of train_markets.py):
+    python training/materialize_forecasts.py --max-horizon 30
+"""
+
+from __future__ import annotations
+import argparse, json, os, sqlite3, time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import joblib
+import pandas as pd
+
+from train_markets import DATA, MODELS, RecursiveForecaster
+
+STORE_PATH = MODELS / "market_forecasts.sqlite"
+HISTORY = 60  # same window /api/predict/market feeds the forecaster
+
+SCHEMA = """
+CREATE TABLE series (
+    crop_key TEXT NOT NULL,
+    state_key TEXT NOT NULL,
+    crop TEXT NOT NULL,
+    state TEXT NOT NULL,
+    horizon_max INTEGER NOT NULL,
+    model_path TEXT NOT NULL,
+    generated_at TEXT NOT NULL,
+    PRIMARY KEY (crop_key, state_key)
+) WITHOUT ROWID;
+CREATE TABLE forecasts (
+    crop_key TEXT NOT NULL,
+    state_key TEXT NOT NULL,
+    day INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    modal_pred REAL NOT NULL,
+    PRIMARY KEY (crop_key, state_key, day)
+) WITHOUT ROWID;
+"""
+
+
+def _key(v: str) -> str:
+    return str(v).strip().lower()
+
+
+def materialize(max_horizon: int = 30, out_path: Path = STORE_PATH) -> dict:
+    meta_path = MODELS / "market_meta.json"
+    if not meta_path.exists():
+        raise FileNotFoundError(f"{meta_path} not found; train market models first")
+    meta = json.loads(meta_path.read_text())
+
+    df = pd.read_csv(DATA / "market_prices.csv", usecols=["date", "crop", "state", "modal"])
+    df = df.dropna(subset=["date", "crop", "state", "modal"]).copy()
+    df["date"] = pd.to_datetime(df["date"])
+    df["crop_key"] = df["crop"].map(_key)
+    df["state_key"] = df["state"].map(_key)
+    df = df.sort_values(["crop_key", "state_key", "date"], kind="mergesort")
+    groups = {k: g for k, g in df.groupby(["crop_key", "state_key"], sort=False)}
+
+    generated_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    tmp = out_path.with_name(out_path.name + ".tmp")
+    tmp.unlink(missing_ok=True)
+    con = sqlite3.connect(tmp)
+    con.executescript(SCHEMA)
+
+    t0 = time.perf_counter()
+    written, skipped = 0, []
+    for m in meta.get("models", []):
+        key = (_key(m["crop"]), _key(m["state"]))
+        g = groups.get(key)
+        if g is None or len(g) < HISTORY:
+            skipped.append(f"{m['crop']}-{m['state']}")
+            continue
+        blob = joblib.load(MODELS / m["path"])
+        fut = RecursiveForecaster(blob["model"], blob["feat_cols"]).forecast_many(
+            [g[["date", "modal"]].tail(HISTORY)], max_horizon)[0]
+        con.execute("INSERT INTO series VALUES (?,?,?,?,?,?,?)",
+                    (*key, m["crop"], m["state"], max_horizon, m["path"], generated_at))
+        con.executemany(
+            "INSERT INTO forecasts VALUES (?,?,?,?,?)",
+            [(*key, day, pd.Timestamp(d).isoformat(), float(v))
+             for day, (d, v) in enumerate(zip(fut["date"], fut["modal_pred"]), start=1)],
+        )
+        written += 1
+    con.commit()
+    con.close()
+    os.replace(tmp, out_path)  # readers switch to the new file atomically
+
+    summary = {"series": written, "skipped": skipped, "max_horizon": max_horizon,
+               "generated_at": generated_at, "seconds": round(time.perf_counter() - t0, 3)}
+    print(f"Materialized {written} series x {max_horizon} days → {out_path.name} "
+          f"({summary['seconds']:.1f}s, {len(skipped)} skipped)")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute market forecasts into a keyed SQLite store")
+    parser.add_argument("--max-horizon", type=int, default=30, help="Days to precompute per series")
+    parser.add_argument("--out", type=Path, default=STORE_PATH, help="SQLite file to (re)write")
+    args = parser.parse_args()
+    materialize(args.max_horizon, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,28 @@
 # training/train_crop.py
 import argparse
+import hashlib
+import inspect
+import io
 import json
+import math
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 import warnings
-from datetime import datetime
+from datetime import datetime, timezone
 
 import joblib
 import numpy as np
 import pandas as pd
+from sklearn.base import clone
 from sklearn.compose import ColumnTransformer
 from sklearn.metrics import mean_absolute_error, r2_score
 from sklearn.model_selection import train_test_split
 from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, StandardScaler
+import xgboost as xgb
 from xgboost import XGBRegressor
 
 warnings.filterwarnings("ignore", category=UserWarning)
@@ -48,6 +58,52 @@ TARGET = "yield_q_per_ha"
 
 DEFAULT_CROPS = ["Wheat", "Paddy", "Maize", "Mustard", "Sugarcane"]
 
+# "onehot": OneHotEncoder -> wide sparse matrix (original pipeline)
+# "native": OrdinalEncoder with a fixed category dictionary -> XGBoost categorical splits
+CATEGORICAL_MODES = ["onehot", "native"]
+
+# XGBoost settings of the shipped model; --search tunes everything but the seed
+XGB_PARAMS = {
+    "n_estimators": 500,
+    "max_depth": 6,
+    "learning_rate": 0.05,
+    "subsample": 0.85,
+    "colsample_bytree": 0.85,
+    "reg_lambda": 2.0,
+    "random_state": 42,
+    "n_jobs": 4,
+}
+
+# --------------------------------------------------------------------------------------
+# Columns read per table (everything downstream code looks at) and their dtypes.
+# Anything else in the CSVs (e.g. Weather.csv's trailing empty columns) is never parsed.
+# --------------------------------------------------------------------------------------
+_F, _S = "float64", "str"
+TABLE_COLUMNS = {
+    "soil": {"N": _F, "P": _F, "K": _F},
+    "weather": {"Date": _S, "Year": _F, "MaxT": _F, "MinT": _F, "RH1": _F, "RH2": _F, "Wind": _F,
+                "Rain": _F, "Lat": _F, "Lon": _F, "Cum_Rain": _F},
+    "yields": {
+        # raw names (see alias_map in build_training_frame)
+        "Crop": _S, "Yield_kg_per_ha": _F, "Area_ha": _F, "Temperature_C": _F, "Humidity_%": _F,
+        "pH": _F, "Rainfall_mm": _F, "Wind_Speed_m_s": _F, "State Name": _S, "Dist Name": _S,
+        "Year": _F, "Lat": _F, "Lon": _F, "N_req_kg_per_ha": _F, "P_req_kg_per_ha": _F, "K_req_kg_per_ha": _F,
+        # already-normalized names some exports use
+        "crop": _S, "state": _S, "season_start": _S, "yield_q_per_ha": _F, "yield_kg_per_ha": _F,
+        "year": _F, "tmin": _F, "tmax": _F, "humidity_avg": _F, "wind_avg": _F, "rain_sum": _F,
+        "lat": _F, "lon": _F, "area_ha": _F, "ph": _F, "moisture": _F, "sowing_month": _F,
+    },
+    "hist": {"field_id": _S, "prev_crop_1": _S, "prev_crop_2": _S},
+    "fields": {"field_id": _S, "village": _S, "state": _S, "irrigation": _S, "area_ha": _F, "lat": _F, "lon": _F},
+    "crop": {"N": _F, "P": _F, "K": _F, "temperature": _F, "humidity": _F, "ph": _F, "rainfall": _F, "label": _S},
+}
+
+# Parsed tables and the built training frame are cached as Parquet, keyed by content
+# hashes of the inputs (and, for the frame, the feature config + frame-building code).
+CACHE_DIR = DATA / ".cache"
+FRAME_INPUTS = ["yields", "soil"]  # tables build_training_frame actually reads
+FRAME_VERSION = 1                  # bump to invalidate cached frames by hand
+
 
 # --------------------------------------------------------------------------------------
 # Utilities
@@ -57,14 +113,67 @@ def _lower_strip_cols(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def _load_csv_if_exists(name: str) -> pd.DataFrame | None:
+def _load_csv_if_exists(name: str | Path, columns: dict[str, str] | None = None) -> pd.DataFrame | None:
     path = DATA / name
     if not path.exists():
         return None
-    df = pd.read_csv(path)
+    if not columns:
+        df = pd.read_csv(path)
+        return _lower_strip_cols(df)
+    wanted = set(columns)
+    usecols = lambda c: str(c).replace("\ufeff", "").strip() in wanted
+    try:
+        df = pd.read_csv(path, usecols=usecols, dtype=columns, encoding="utf-8-sig")
+    except ValueError:
+        # a numeric column holds junk: parse as text and coerce like the rest of the ETL
+        df = pd.read_csv(path, usecols=usecols, dtype=str, encoding="utf-8-sig")
+        df = _lower_strip_cols(df)
+        for c in df.columns:
+            if columns.get(c) == _F:
+                df[c] = _safe_to_numeric(df[c])
+        return df
     return _lower_strip_cols(df)
 
 
+def _file_hash(path: Path) -> str | None:
+    if not path.exists():
+        return None
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _cache_get(path: Path) -> pd.DataFrame | None:
+    if not path.exists():
+        return None
+    try:
+        return pd.read_parquet(path)
+    except Exception as e:  # corrupt/partial file or no parquet engine
+        print(f"[cache] ignoring {path.name}: {e}")
+        return None
+
+
+def _cache_put(df: pd.DataFrame, path: Path, stale_glob: str):
+    """Atomically write `path` and drop older cache files matching `stale_glob`."""
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+    except ImportError as e:
+        print(f"[cache] disabled (install pyarrow to enable): {e}")
+        return
+    for old in path.parent.glob(stale_glob):
+        if old != path:
+            old.unlink(missing_ok=True)
+
+
+def input_hashes() -> dict[str, str | None]:
+    return {key: _file_hash(DATA / name) for key, name in CANDIDATE_FILES.items()}
+
+
 def _audit_step(title: str, df: pd.DataFrame | None):
     if df is None:
         print(f"\n[{title}] file missing — skipping.")
@@ -96,13 +205,30 @@ def _season_start_from_year(year: float | int) -> pd.Timestamp:
 # --------------------------------------------------------------------------------------
 # Loading
 # --------------------------------------------------------------------------------------
-def load_tables() -> dict[str, pd.DataFrame | None]:
-    soil = _load_csv_if_exists(CANDIDATE_FILES["soil"])
-    weather = _load_csv_if_exists(CANDIDATE_FILES["weather"])
-    yields = _load_csv_if_exists(CANDIDATE_FILES["yields"])
-    hist = _load_csv_if_exists(CANDIDATE_FILES["hist"])
-    fields = _load_csv_if_exists(CANDIDATE_FILES["fields"])
-    crop = _load_csv_if_exists(CANDIDATE_FILES["crop"])  # optional
+def _load_table(key: str, file_hash: str | None, use_cache: bool) -> pd.DataFrame | None:
+    """One input table, from the Parquet cache when the CSV's content hash is unchanged."""
+    if file_hash is None:
+        return None
+    spec_hash = hashlib.blake2b(json.dumps(TABLE_COLUMNS.get(key), sort_keys=True).encode(), digest_size=4).hexdigest()
+    path = CACHE_DIR / "tables" / f"{key}-{file_hash}-{spec_hash}.parquet"
+    if use_cache:
+        df = _cache_get(path)
+        if df is not None:
+            return df
+    df = _load_csv_if_exists(CANDIDATE_FILES[key], TABLE_COLUMNS.get(key))
+    if use_cache and df is not None:
+        _cache_put(df, path, f"{key}-*.parquet")
+    return df
+
+
+def load_tables(hashes: dict[str, str | None] | None = None, use_cache: bool = True) -> dict[str, pd.DataFrame | None]:
+    hashes = hashes or input_hashes()
+    soil = _load_table("soil", hashes["soil"], use_cache)
+    weather = _load_table("weather", hashes["weather"], use_cache)
+    yields = _load_table("yields", hashes["yields"], use_cache)
+    hist = _load_table("hist", hashes["hist"], use_cache)
+    fields = _load_table("fields", hashes["fields"], use_cache)
+    crop = _load_table("crop", hashes["crop"], use_cache)  # optional
 
     _audit_step(CANDIDATE_FILES["soil"], soil)
     _audit_step(CANDIDATE_FILES["weather"], weather)
@@ -170,16 +296,28 @@ def aggregate_weather(weather: pd.DataFrame) -> pd.DataFrame:
 # --------------------------------------------------------------------------------------
 # Build training frame
 # --------------------------------------------------------------------------------------
-def build_training_frame(tables: dict, crops: list[str]) -> pd.DataFrame:
-    yields = tables["yields"]
-    if yields is None or yields.empty:
-        raise FileNotFoundError("Required dataset 'crop_yield_history.csv' not found or empty in data/")
+# Fallbacks for numeric features that have no usable values at all
+HARD_DEFAULTS = {
+    "lat": 23.5,            # India centroid-ish
+    "lon": 78.5,
+    "moisture": 20.0,
+    "area_ha": 1.0,
+    "sowing_month": 6,
+    "tmin_avg": 20.0,
+    "tmax_avg": 30.0,
+    "humidity_avg": 60.0,
+    "wind_avg": 2.0,
+    "rain_sum": 500.0,
+    "ph": 6.5,
+    "n": 100.0,
+    "p": 40.0,
+    "k": 40.0,
+}
 
-    soil = tables["soil"]
-    weather = tables["weather"]
-    hist = tables["hist"]
-    fields = tables["fields"]
 
+def normalize_yields(yields: pd.DataFrame, soil: pd.DataFrame | None) -> pd.DataFrame:
+    """Row-wise part of the frame build: rename, derive and default every feature
+    column. Needs nothing but the rows themselves, so it also runs chunk by chunk."""
     y = yields.copy()
 
     alias_map = {
@@ -300,53 +438,85 @@ def build_training_frame(tables: dict, crops: list[str]) -> pd.DataFrame:
 
     keep = NUM_FEATURES + CAT_FEATURES + [TARGET]
     _ensure_cols(y, keep, fill_value=np.nan)
+    return y
+
+
+def fill_values(medians: pd.Series | dict) -> dict:
+    """Imputation value per numeric column: its median, else HARD_DEFAULTS (else 0)."""
+    out = {}
+    for col in NUM_FEATURES + [TARGET]:
+        med = medians.get(col, np.nan)
+        out[col] = med if pd.notna(med) else HARD_DEFAULTS.get(col, 0.0)
+    return out
 
-    # ------------------- HARD DEFAULTS TO PREVENT DROP-ALL -------------------
-    hard_defaults = {
-        "lat": 23.5,            # India centroid-ish
-        "lon": 78.5,
-        "moisture": 20.0,
-        "area_ha": 1.0,
-        "sowing_month": 6,
-        "tmin_avg": 20.0,
-        "tmax_avg": 30.0,
-        "humidity_avg": 60.0,
-        "wind_avg": 2.0,
-        "rain_sum": 500.0,
-        "ph": 6.5,
-        "n": 100.0,
-        "p": 40.0,
-        "k": 40.0,
-    }
-    for col, val in hard_defaults.items():
-        if col in y.columns and y[col].isna().all():
-            y[col] = val
-    # ------------------------------------------------------------------------
 
-    # Minimal imputations (with fallback to hard defaults/0 if median is NaN)
+def impute_frame(y: pd.DataFrame, fills: dict, report: bool = False) -> pd.DataFrame:
+    """Minimal imputations, then keep only rows with every required column."""
     for col in NUM_FEATURES + [TARGET]:
-        if y[col].dtype.kind in "biufc":
+        if y[col].dtype.kind in "biufc" or y[col].isna().all():
             if y[col].isna().any():
-                med = y[col].median(skipna=True)
-                fillv = med if pd.notna(med) else hard_defaults.get(col, 0.0)
-                y[col] = y[col].fillna(fillv)
+                y[col] = y[col].fillna(fills[col])
 
     for col in CAT_FEATURES:
         if y[col].isna().any():
             y[col] = y[col].fillna("Unknown")
 
-    # Optional: quick visibility into remaining NaNs
-    na_cols = [c for c in keep if y[c].isna().any()]
-    if na_cols:
-        print("[debug] columns still containing NaN before dropna():", na_cols[:12], "..." if len(na_cols) > 12 else "")
+    keep = NUM_FEATURES + CAT_FEATURES + [TARGET]
+    if report:
+        # Optional: quick visibility into remaining NaNs
+        na_cols = [c for c in keep if y[c].isna().any()]
+        if na_cols:
+            print("[debug] columns still containing NaN before dropna():", na_cols[:12], "..." if len(na_cols) > 12 else "")
+    return y[keep].dropna().copy()
+
+
+def build_training_frame(tables: dict, crops: list[str]) -> pd.DataFrame:
+    yields = tables["yields"]
+    if yields is None or yields.empty:
+        raise FileNotFoundError("Required dataset 'crop_yield_history.csv' not found or empty in data/")
+
+    y = normalize_yields(yields, tables["soil"])
+    numeric = [c for c in NUM_FEATURES + [TARGET] if y[c].dtype.kind in "biufc"]
+    fills = fill_values(y[numeric].median(skipna=True))
 
     before = len(y)
-    out = y[keep].dropna().copy()
+    out = impute_frame(y, fills, report=True)
     after = len(out)
     print(f"\n[train_frame] kept {after:,}/{before:,} rows after minimal imputations & required-column dropna()")
     return out
 
 
+def frame_cache_key(hashes: dict[str, str | None]) -> str:
+    """Hash of everything the training frame depends on: the input tables it reads,
+    the feature config and the code that builds it."""
+    payload = {
+        "inputs": {k: hashes.get(k) for k in FRAME_INPUTS},
+        "columns": {k: TABLE_COLUMNS[k] for k in FRAME_INPUTS},
+        "num": NUM_FEATURES,
+        "cat": CAT_FEATURES,
+        "target": TARGET,
+        "version": FRAME_VERSION,
+        "defaults": HARD_DEFAULTS,
+        "code": "".join(inspect.getsource(f) for f in (normalize_yields, fill_values, impute_frame, build_training_frame)),
+    }
+    return hashlib.blake2b(json.dumps(payload, sort_keys=True).encode(), digest_size=16).hexdigest()
+
+
+def load_training_frame(tables: dict, crops: list[str], hashes: dict[str, str | None],
+                        use_cache: bool = True) -> pd.DataFrame:
+    """build_training_frame(), reused from CACHE_DIR when nothing it depends on changed."""
+    path = CACHE_DIR / f"train_frame-{frame_cache_key(hashes)}.parquet"
+    if use_cache:
+        df = _cache_get(path)
+        if df is not None:
+            print(f"\n[train_frame] {len(df):,} rows from cache ({path.name})")
+            return df
+    df = build_training_frame(tables, crops)
+    if use_cache:
+        _cache_put(df, path, "train_frame-*.parquet")
+    return df
+
+
 # --------------------------------------------------------------------------------------
 # Auto-detect crops for metadata
 # --------------------------------------------------------------------------------------
@@ -376,31 +546,52 @@ def infer_all_crops(tables: dict) -> list[str]:
 # --------------------------------------------------------------------------------------
 # Pipeline & Training
 # --------------------------------------------------------------------------------------
-def make_pipeline() -> Pipeline:
+def category_dictionary(df: pd.DataFrame) -> dict[str, list[str]]:
+    """Sorted category list per categorical feature; position = code the model sees."""
+    return {c: sorted(df[c].dropna().astype(str).unique().tolist()) for c in CAT_FEATURES}
+
+
+def make_pipeline(categorical: str = "onehot", categories: dict[str, list[str]] | None = None,
+                  params: dict | None = None) -> Pipeline:
+    """Preprocessor + XGBRegressor; `params` override XGB_PARAMS (and the native-mode defaults)."""
+    if categorical == "native":
+        # unknown / missing categories -> NaN, which XGBoost routes down the learned default branch
+        cat = OrdinalEncoder(
+            categories=[categories[c] for c in CAT_FEATURES],
+            handle_unknown="use_encoded_value",
+            unknown_value=np.nan,
+            encoded_missing_value=np.nan,
+            dtype=np.float64,
+        )
+        native = dict(
+            enable_categorical=True,
+            tree_method="hist",
+            feature_types=["q"] * len(NUM_FEATURES) + ["c"] * len(CAT_FEATURES),
+            # each split stores its category set; with ~1k villages an uncapped
+            # partition bloats the model ~10x and overfits single villages
+            max_cat_threshold=16,
+        )
+    else:
+        cat = OneHotEncoder(handle_unknown="ignore")
+        native = {}
+
     pre = ColumnTransformer(
         transformers=[
             ("num", Pipeline(steps=[("sc", StandardScaler())]), NUM_FEATURES),
-            ("cat", OneHotEncoder(handle_unknown="ignore"), CAT_FEATURES),
+            ("cat", cat, CAT_FEATURES),
         ],
         remainder="drop",
     )
 
-    model = XGBRegressor(
-        n_estimators=500,
-        max_depth=6,
-        learning_rate=0.05,
-        subsample=0.85,
-        colsample_bytree=0.85,
-        reg_lambda=2.0,
-        random_state=42,
-        n_jobs=4,
-    )
+    model = XGBRegressor(**{**XGB_PARAMS, **native, **(params or {})})
 
     pipe = Pipeline([("pre", pre), ("reg", model)])
     return pipe
 
 
-def train_and_eval(train_df: pd.DataFrame, test_size=0.2, random_state=42) -> tuple[Pipeline, dict]:
+def train_and_eval(train_df: pd.DataFrame, test_size=0.2, random_state=42,
+                   categorical: str = "onehot", verbose: bool = True,
+                   params: dict | None = None) -> tuple[Pipeline, dict]:
     X = train_df[NUM_FEATURES + CAT_FEATURES]
     y = train_df[TARGET].astype(float)
 
@@ -408,8 +599,11 @@ def train_and_eval(train_df: pd.DataFrame, test_size=0.2, random_state=42) -> tu
         X, y, test_size=test_size, random_state=random_state
     )
 
-    pipe = make_pipeline()
+    categories = category_dictionary(train_df) if categorical == "native" else None
+    pipe = make_pipeline(categorical, categories, params)
+    t0 = time.perf_counter()
     pipe.fit(X_tr, y_tr)
+    train_seconds = time.perf_counter() - t0
 
     y_hat_tr = pipe.predict(X_tr)
     y_hat_te = pipe.predict(X_te)
@@ -424,19 +618,271 @@ def train_and_eval(train_df: pd.DataFrame, test_size=0.2, random_state=42) -> tu
         "features_num": NUM_FEATURES,
         "features_cat": CAT_FEATURES,
         "target": TARGET,
+        "categorical": categorical,
+        "train_seconds": float(train_seconds),
+    }
+
+    if verbose:
+        print("\n[metrics]")
+        for k, v in metrics.items():
+            if isinstance(v, float):
+                print(f"  {k}: {v:.4f}")
+            else:
+                print(f"  {k}: {v}")
+
+    return pipe, metrics
+
+
+def benchmark_pipeline(pipe: Pipeline, X: pd.DataFrame, n_single: int = 200, n_batch: int = 1000) -> dict:
+    """Artifact size and pipe.predict latency: one-row requests (p50) and one batch."""
+    buf = io.BytesIO()
+    joblib.dump(pipe, buf)
+    rows = [X.iloc[[i]] for i in range(min(n_single, len(X)))]
+    pipe.predict(rows[0])  # warm up
+    lat = []
+    for r in rows:
+        t0 = time.perf_counter()
+        pipe.predict(r)
+        lat.append(time.perf_counter() - t0)
+    batch = X.iloc[:n_batch]
+    t0 = time.perf_counter()
+    pipe.predict(batch)
+    batch_s = time.perf_counter() - t0
+    width = pipe.named_steps["pre"].transform(X.iloc[:1]).shape[1]
+    return {
+        "artifact_mb": buf.getbuffer().nbytes / 1e6,
+        "model_columns": int(width),
+        "p50_ms_1row": 1000 * float(np.median(lat)),
+        "ms_per_1k_rows": 1000 * batch_s * 1000 / max(len(batch), 1),
     }
 
-    print("\n[metrics]")
-    for k, v in metrics.items():
-        if isinstance(v, float):
-            print(f"  {k}: {v:.4f}")
+
+def compare_categorical(train_df: pd.DataFrame) -> dict[str, tuple[Pipeline, dict]]:
+    """Train both encodings on the same split and print a side-by-side report."""
+    X = train_df[NUM_FEATURES + CAT_FEATURES]
+    results, report = {}, {}
+    for mode in CATEGORICAL_MODES:
+        pipe, metrics = train_and_eval(train_df, categorical=mode, verbose=False)
+        results[mode] = (pipe, metrics)
+        report[mode] = {"train_s": metrics["train_seconds"], "test_mae": metrics["test_mae"],
+                        "test_r2": metrics["test_r2"], **benchmark_pipeline(pipe, X)}
+
+    cols = ["train_s", "artifact_mb", "model_columns", "p50_ms_1row", "ms_per_1k_rows", "test_mae", "test_r2"]
+    print("\n[categorical encoding comparison]")
+    print(f"  {'':<16}" + "".join(f"{m:>12}" for m in CATEGORICAL_MODES))
+    for c in cols:
+        print(f"  {c:<16}" + "".join(f"{report[m][c]:>12.4g}" for m in CATEGORICAL_MODES))
+    return results
+
+
+# --------------------------------------------------------------------------------------
+# Hyperparameter search (successive halving)
+# --------------------------------------------------------------------------------------
+# name -> (kind, low, high); "log" samples uniformly in log space
+SEARCH_SPACE = {
+    "max_depth": ("int", 3, 10),
+    "learning_rate": ("log", 0.01, 0.3),
+    "subsample": ("float", 0.6, 1.0),
+    "colsample_bytree": ("float", 0.5, 1.0),
+    "min_child_weight": ("log", 1.0, 20.0),
+    "reg_lambda": ("log", 0.1, 10.0),
+}
+
+
+def sample_params(rng: np.random.Generator) -> dict:
+    out = {}
+    for name, (kind, lo, hi) in SEARCH_SPACE.items():
+        if kind == "int":
+            out[name] = int(rng.integers(lo, hi + 1))
+        elif kind == "log":
+            out[name] = float(np.exp(rng.uniform(np.log(lo), np.log(hi))))
         else:
-            print(f"  {k}: {v}")
+            out[name] = float(rng.uniform(lo, hi))
+    return out
+
 
+def rung_budgets(min_rounds: int, max_rounds: int, eta: int) -> list[int]:
+    """Boosting rounds per rung, geometric with ratio eta, ending at max_rounds."""
+    n = max(0, int(math.floor(math.log(max(max_rounds / max(min_rounds, 1), 1), eta))))
+    return [int(round(max_rounds / eta ** (n - i))) for i in range(n + 1)]
+
+
+def search_matrix(train_df: pd.DataFrame, categorical: str, test_size: float, val_size: float,
+                  random_state: int, use_cache: bool = True) -> Path:
+    """Preprocess the search split once and store it for every trial (and worker) to mmap.
+
+    Uses the same train/test split as train_and_eval and carves the early-stopping
+    validation set out of its training part, so the test rows stay unseen.
+    """
+    frame_hash = hashlib.blake2b(pd.util.hash_pandas_object(train_df, index=False).to_numpy().tobytes(),
+                                 digest_size=16).hexdigest()
+    key = hashlib.blake2b(json.dumps([frame_hash, categorical, test_size, val_size, random_state]).encode(),
+                          digest_size=8).hexdigest()
+    path = CACHE_DIR / "search" / f"matrix-{key}.joblib"
+    if use_cache and path.exists():
+        print(f"\n[search] preprocessed matrix from cache ({path.name})")
+        return path
+
+    X = train_df[NUM_FEATURES + CAT_FEATURES]
+    y = train_df[TARGET].astype(float)
+    X_tr, _, y_tr, _ = train_test_split(X, y, test_size=test_size, random_state=random_state)
+    X_fit, X_val, y_fit, y_val = train_test_split(X_tr, y_tr, test_size=val_size, random_state=random_state)
+
+    categories = category_dictionary(train_df) if categorical == "native" else None
+    pipe = make_pipeline(categorical, categories)
+    pre = pipe.named_steps["pre"]
+    data = {
+        "X_fit": pre.fit_transform(X_fit),
+        "y_fit": y_fit.to_numpy(dtype=np.float32),
+        "X_val": pre.transform(X_val),
+        "y_val": y_val.to_numpy(dtype=np.float32),
+        "feature_types": pipe.named_steps["reg"].get_params()["feature_types"],
+        "categories": categories,
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    joblib.dump(data, tmp)
+    os.replace(tmp, path)
+    for old in path.parent.glob("matrix-*.joblib"):
+        if old != path:
+            old.unlink(missing_ok=True)
+    return path
+
+
+# --- worker-process state: (dtrain, dval, y_val) ---
+_search_data = None
+
+
+def _search_init(path: str, threads: int):
+    """Load the shared matrix (memory-mapped) and quantize it once per worker."""
+    global _search_data
+    d = joblib.load(path, mmap_mode="r")
+    native = d["feature_types"] is not None
+    dtrain = xgb.QuantileDMatrix(d["X_fit"], d["y_fit"], feature_types=d["feature_types"],
+                                 enable_categorical=native, nthread=threads)
+    dval = xgb.QuantileDMatrix(d["X_val"], d["y_val"], ref=dtrain, feature_types=d["feature_types"],
+                               enable_categorical=native, nthread=threads)
+    _search_data = (dtrain, dval, np.asarray(d["y_val"]))
+
+
+def _booster_latency(booster: xgb.Booster, X, n_single: int = 200, n_batch: int = 1000) -> dict:
+    """Single-threaded model latency on preprocessed rows (the preprocessor is the same for every trial)."""
+    booster.set_param({"nthread": 1})
+    rows = [X[i:i + 1] for i in range(min(n_single, X.shape[0]))]
+    booster.inplace_predict(rows[0])  # warm up
+    lat = []
+    for r in rows:
+        t0 = time.perf_counter()
+        booster.inplace_predict(r)
+        lat.append(time.perf_counter() - t0)
+    batch = X[:n_batch]
+    t0 = time.perf_counter()
+    booster.inplace_predict(batch)
+    batch_s = time.perf_counter() - t0
+    return {"p50_ms_1row": 1000 * float(np.median(lat)),
+            "ms_per_1k_rows": 1000 * batch_s * 1000 / max(batch.shape[0], 1)}
+
+
+def _search_trial(trial: int, params: dict, rounds: int, early_stopping: int) -> dict:
+    dtrain, dval, y_val = _search_data
+    t0 = time.perf_counter()
+    booster = xgb.train(params, dtrain, num_boost_round=rounds, evals=[(dval, "val")],
+                        early_stopping_rounds=early_stopping, verbose_eval=False)
+    fit_s = time.perf_counter() - t0
+    best = booster.best_iteration + 1
+    if best < booster.num_boosted_rounds():
+        booster = booster[:best]  # what a final fit with n_estimators=best would ship
+    mae = float(np.abs(booster.predict(dval) - y_val).mean())
+    return {"trial": trial, "rounds": rounds, "best_rounds": best, "val_mae": mae, "fit_s": fit_s,
+            "converged": best + early_stopping <= rounds, "model": bytes(booster.save_raw(raw_format="ubj"))}
+
+
+def successive_halving(path: Path, categorical: str, n_trials: int = 27, eta: int = 3,
+                       min_rounds: int = 50, max_rounds: int = 1000, early_stopping: int = 30,
+                       workers: int = 1, threads: int = 4, seed: int = 42) -> list[dict]:
+    """Run n_trials random configs at the smallest budget, keep the best 1/eta at each
+    rung and give them eta times more boosting rounds. Returns the leaderboard."""
+    shared = joblib.load(path, mmap_mode="r")
+    categories = shared["categories"]
+    base = make_pipeline(categorical, categories).named_steps["reg"].get_xgb_params()
+    base = {k: v for k, v in base.items() if v is not None and k != "n_jobs"}
+    base.update(nthread=threads, eval_metric="mae")
+
+    rng = np.random.default_rng(seed)
+    defaults = {k: XGB_PARAMS[k] for k in SEARCH_SPACE if k in XGB_PARAMS}
+    trial_params = [{**base, **defaults}] + [{**base, **sample_params(rng)} for _ in range(n_trials - 1)]
+    budgets = rung_budgets(min_rounds, max_rounds, eta)
+    print(f"\n[search] {n_trials} trials, rungs {budgets} rounds, {workers} worker(s) x {threads} thread(s)")
+
+    results: dict[int, dict] = {}
+    alive = list(range(n_trials))
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_search_init,
+                               initargs=(str(path), threads)) if workers > 1 else None
+    if pool is None:
+        _search_init(str(path), threads)
+    try:
+        for rung, rounds in enumerate(budgets):
+            t0 = time.perf_counter()
+            # a trial that early-stopped below the last budget would grow the same trees again
+            todo = [t for t in alive if not (t in results and results[t]["converged"])]
+            if pool is None:
+                done = [_search_trial(t, trial_params[t], rounds, early_stopping) for t in todo]
+            else:
+                futures = [pool.submit(_search_trial, t, trial_params[t], rounds, early_stopping) for t in todo]
+                done = [f.result() for f in as_completed(futures)]
+            for r in done:
+                results[r["trial"]] = r
+            for t in alive:
+                results[t]["rung"] = rung
+            alive.sort(key=lambda t: results[t]["val_mae"])
+            best = results[alive[0]]
+            print(f"  rung {rung}: {len(alive)} trial(s) @ {rounds} rounds, {len(todo)} trained in "
+                  f"{time.perf_counter() - t0:.1f}s, best val_mae {best['val_mae']:.4f} (trial {best['trial']})")
+            if rung < len(budgets) - 1:
+                alive = alive[: max(1, math.ceil(len(alive) / eta))]
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    # latency is measured here, one model at a time, not while other trials compete for the CPU
+    for t, r in results.items():
+        r["params"] = {k: trial_params[t][k] for k in SEARCH_SPACE if k in trial_params[t]}
+        r.update(_booster_latency(xgb.Booster(model_file=bytearray(r.pop("model"))), shared["X_val"]))
+    # deeper rungs first: a trial cut at 50 rounds is not comparable to one trained for 1000
+    return sorted(results.values(), key=lambda r: (-r["rung"], r["val_mae"]))
+
+
+def print_leaderboard(board: list[dict], top: int = 10):
+    print("\n[search leaderboard]")
+    print(f"  {'#':>3} {'trial':>5} {'rung':>4} {'rounds':>6} {'val_mae':>9} {'fit_s':>7} "
+          f"{'p50_ms':>7} {'ms/1k':>7}  params")
+    for i, r in enumerate(board[:top], 1):
+        params = ", ".join(f"{k}={v:.3g}" for k, v in r["params"].items())
+        print(f"  {i:>3} {r['trial']:>5} {r['rung']:>4} {r['best_rounds']:>6} {r['val_mae']:>9.4f} "
+              f"{r['fit_s']:>7.2f} {r['p50_ms_1row']:>7.3f} {r['ms_per_1k_rows']:>7.2f}  {params}")
+
+
+def search(train_df: pd.DataFrame, categorical: str = "onehot", use_cache: bool = True,
+           **kwargs) -> tuple[Pipeline, dict]:
+    """Tune, write models/crop_search.json, then fit the winner with train_and_eval."""
+    path = search_matrix(train_df, categorical, test_size=0.2, val_size=0.2, random_state=42, use_cache=use_cache)
+    board = successive_halving(path, categorical, **kwargs)
+    print_leaderboard(board)
+
+    MODELS.mkdir(parents=True, exist_ok=True)
+    (MODELS / "crop_search.json").write_text(json.dumps({"categorical": categorical, "leaderboard": board}, indent=2))
+    print(f"\nLeaderboard: {MODELS / 'crop_search.json'}")
+
+    best = board[0]
+    params = {**best["params"], "n_estimators": best["best_rounds"]}
+    pipe, metrics = train_and_eval(train_df, categorical=categorical, params=params)
+    metrics["search"] = {"trials": len(board), "best_trial": best["trial"], "val_mae": best["val_mae"],
+                         "params": params}
     return pipe, metrics
 
 
-def save_artifacts(pipe: Pipeline, crops: list[str], metrics: dict):
+def save_artifacts(pipe: Pipeline, crops: list[str], metrics: dict,
+                   categories: dict[str, list[str]] | None = None):
     MODELS.mkdir(parents=True, exist_ok=True)
     joblib.dump(pipe, MODELS / "crop_reco_v1.joblib")
     meta = {
@@ -445,11 +891,140 @@ def save_artifacts(pipe: Pipeline, crops: list[str], metrics: dict):
         "features_cat": CAT_FEATURES,
         "target": TARGET,
         "metrics": metrics,
+        "categorical": metrics.get("categorical", "onehot"),
+        "version": _new_version(),
     }
+    if categories is not None:
+        # the exact code table the saved model was trained with (position = code)
+        meta["categories"] = categories
     (MODELS / "crop_meta.json").write_text(json.dumps(meta, indent=2))
     print(f"\nSaved:\n  - {MODELS/'crop_reco_v1.joblib'}\n  - {MODELS/'crop_meta.json'}")
 
 
+# --------------------------------------------------------------------------------------
+# Incremental (warm-start) retraining
+# --------------------------------------------------------------------------------------
+ARTIFACT = "crop_reco_v1"
+
+
+def _new_version() -> str:
+    return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def versioned_path(version: str) -> Path:
+    return MODELS / f"{ARTIFACT}.{version}.joblib"
+
+
+def _atomic_write(path: Path, write):
+    tmp = path.with_name(path.name + ".tmp")
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def unseen_categories(pipe: Pipeline, X: pd.DataFrame) -> dict[str, int]:
+    """Rows per categorical feature holding a value the frozen encoder has never seen."""
+    enc = pipe.named_steps["pre"].named_transformers_["cat"]
+    out = {}
+    for col, cats in zip(CAT_FEATURES, enc.categories_):
+        n = int((~X[col].astype(str).isin(set(cats))).sum())
+        if n:
+            out[col] = n
+    return out
+
+
+def _evaluate(pipe: Pipeline, X: pd.DataFrame, y: pd.Series) -> dict:
+    pred = pipe.predict(X)
+    return {"mae": float(mean_absolute_error(y, pred)), "r2": float(r2_score(y, pred)) if len(y) > 1 else None}
+
+
+def incremental_update(new_df: pd.DataFrame, rounds: int = 50, learning_rate: float | None = None,
+                       test_size: float = 0.2, random_state: int = 42) -> dict:
+    """Add `rounds` boosting rounds to the saved model, fitted on `new_df` only.
+
+    The preprocessor (scaler statistics, category dictionary) is reused as is, so
+    cost is one transform of the new rows plus `rounds` trees over them. Writes
+    models/crop_reco_v1.<version>.joblib, promotes it to crop_reco_v1.joblib and
+    appends a before/after entry to crop_meta.json["incremental"].
+    """
+    artifact, meta_path = MODELS / f"{ARTIFACT}.joblib", MODELS / "crop_meta.json"
+    pipe = joblib.load(artifact)
+    meta = json.loads(meta_path.read_text())
+    parent = meta.get("version") or datetime.fromtimestamp(artifact.stat().st_mtime, timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    if not versioned_path(parent).exists():
+        shutil.copy2(artifact, versioned_path(parent))  # keep what we are replacing, for rollback
+
+    X = new_df[NUM_FEATURES + CAT_FEATURES]
+    y = new_df[TARGET].astype(float)
+    if len(new_df) >= 20:
+        X_tr, X_te, y_tr, y_te = train_test_split(X, y, test_size=test_size, random_state=random_state)
+    else:
+        print(f"\n[incremental] only {len(new_df)} new rows: evaluating on the rows it trains on")
+        X_tr, X_te, y_tr, y_te = X, X, y, y
+
+    pre, reg = pipe.named_steps["pre"], pipe.named_steps["reg"]
+    before = _evaluate(pipe, X_te, y_te)
+
+    base = reg.get_booster().copy()
+    base.set_attr(best_iteration=None, best_score=None)  # continue from every tree, not an early-stopping cut
+    cont = clone(reg).set_params(n_estimators=rounds)
+    if learning_rate:
+        cont.set_params(learning_rate=learning_rate)
+    t0 = time.perf_counter()
+    cont.fit(pre.transform(X_tr), y_tr, xgb_model=base)  # pre is frozen: transform only, never refit
+    train_seconds = time.perf_counter() - t0
+
+    new_pipe = Pipeline([("pre", pre), ("reg", cont)])
+    after = _evaluate(new_pipe, X_te, y_te)
+
+    version, n = _new_version(), 1
+    while version == parent or versioned_path(version).exists():  # two updates within one second
+        version, n = f"{_new_version()}-{n}", n + 1
+    path = versioned_path(version)
+    joblib.dump(new_pipe, path)
+    _atomic_write(artifact, lambda tmp: shutil.copy2(path, tmp))
+
+    entry = {
+        "version": version,
+        "parent_version": parent,
+        "rows": int(len(new_df)),
+        "train_rows": int(len(X_tr)),
+        "eval_rows": int(len(X_te)),
+        "rounds_added": int(rounds),
+        "total_rounds": int(cont.get_booster().num_boosted_rounds()),
+        "learning_rate": float(cont.get_params()["learning_rate"]),
+        "train_seconds": float(train_seconds),
+        "before": before,
+        "after": after,
+        "delta": {k: (after[k] - before[k]) if after[k] is not None and before[k] is not None else None
+                  for k in before},
+        "unseen_categories": unseen_categories(pipe, X),
+    }
+    # only crops the frozen encoder can represent become candidates; the rest would all
+    # score as the same "unknown crop" and still be ranked by /api/predict/crops
+    new_crops = {" ".join(str(c).split()).title() for c in new_df["crop"].dropna().unique()} - {"Unknown"}
+    enc = pipe.named_steps["pre"].named_transformers_["cat"]
+    known = {str(c) for c in enc.categories_[CAT_FEATURES.index("crop")]}
+    entry["skipped_crops"] = sorted(new_crops - known)
+    meta["crops"] = sorted(set(meta.get("crops", [])) | (new_crops & known))
+    meta["version"] = version
+    meta.setdefault("incremental", []).append(entry)
+    _atomic_write(meta_path, lambda tmp: tmp.write_text(json.dumps(meta, indent=2)))
+
+    print(f"\n[incremental] {parent} -> {version}: +{rounds} rounds on {len(X_tr):,} rows "
+          f"in {train_seconds:.2f}s ({entry['total_rounds']} trees total)")
+    print(f"  {'':<6}{'before':>10}{'after':>10}{'delta':>10}")
+    for k in before:
+        if before[k] is not None and after[k] is not None:
+            print(f"  {k:<6}{before[k]:>10.4f}{after[k]:>10.4f}{entry['delta'][k]:>+10.4f}")
+    if entry["unseen_categories"]:
+        print(f"  [warn] categories the frozen encoder does not know (rows): {entry['unseen_categories']}; "
+              f"a full retrain is needed to learn them")
+    if entry["skipped_crops"]:
+        print(f"  [warn] not added to meta crops (unknown to the model): {entry['skipped_crops']}")
+    print(f"\nSaved:\n  - {path}\n  - {artifact}\n  - {meta_path}")
+    return entry
+
+
 # --------------------------------------------------------------------------------------
 # Main
 # --------------------------------------------------------------------------------------
@@ -461,9 +1036,60 @@ def main():
         default=None,   # auto-detect when None
         help="Candidate crop list (stored in meta; UI helper). If omitted, auto-detect all crops from data."
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help=f"Re-parse every CSV and rebuild the training frame instead of using {CACHE_DIR}"
+    )
+    parser.add_argument(
+        "--categorical",
+        choices=CATEGORICAL_MODES,
+        default="onehot",
+        help="Categorical encoding: one-hot (default) or XGBoost native categorical splits"
+    )
+    parser.add_argument(
+        "--compare-categorical",
+        action="store_true",
+        help="Train both encodings and report training time, artifact size and inference latency"
+    )
+    parser.add_argument(
+        "--search",
+        action="store_true",
+        help="Successive-halving search over XGBoost parameters; trains and saves the winner"
+    )
+    parser.add_argument("--trials", type=int, default=27, help="Configurations sampled for --search")
+    parser.add_argument("--eta", type=int, default=3, help="Keep the best 1/eta trials per rung, eta x more rounds")
+    parser.add_argument("--min-rounds", type=int, default=50, help="Minimum boosting rounds at the first rung")
+    parser.add_argument("--max-rounds", type=int, default=1000, help="Boosting rounds at the last rung")
+    parser.add_argument("--early-stopping", type=int, default=30, help="Rounds without val MAE improvement")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Run search trials in this many processes (1 = sequential)")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="XGBoost threads per trial (default: cpu_count // workers)")
+    parser.add_argument(
+        "--incremental",
+        type=Path,
+        metavar="CSV",
+        help="Warm-start: add boosting rounds to the saved model using only the yield rows in CSV "
+             "(same columns as crop_yield_history.csv); preprocessing stays frozen"
+    )
+    parser.add_argument("--rounds", type=int, default=50, help="Boosting rounds to add with --incremental")
+    parser.add_argument("--learning-rate", type=float, default=None,
+                        help="Learning rate for the added rounds (default: the saved model's)")
     args = parser.parse_args()
+    use_cache = not args.no_cache
+
+    if args.incremental:
+        new = _load_csv_if_exists(args.incremental.resolve(), TABLE_COLUMNS["yields"])
+        if new is None or new.empty:
+            raise FileNotFoundError(f"No new yield rows in {args.incremental}")
+        soil = _load_table("soil", _file_hash(DATA / CANDIDATE_FILES["soil"]), use_cache)
+        new_df = build_training_frame({"yields": new, "soil": soil}, [])
+        incremental_update(new_df, args.rounds, args.learning_rate)
+        return
 
-    tables = load_tables()
+    hashes = input_hashes()
+    tables = load_tables(hashes, use_cache)
 
     # Auto-detect crops for metadata when not provided
     crops_for_meta = args.crops if args.crops else infer_all_crops(tables)
@@ -471,15 +1097,27 @@ def main():
         crops_for_meta = DEFAULT_CROPS  # final fallback
 
     # Build training frame
-    train_df = build_training_frame(tables, crops_for_meta)
+    train_df = load_training_frame(tables, crops_for_meta, hashes, use_cache)
     if len(train_df) < 50:
         print("\n[warn] Very small training set after feature preparation; check your data coverage.")
 
     # Train + evaluate
-    pipe, metrics = train_and_eval(train_df)
+    if args.search:
+        workers = max(1, args.workers)
+        threads = args.threads or max(1, (os.cpu_count() or 1) // workers)
+        pipe, metrics = search(
+            train_df, args.categorical, use_cache,
+            n_trials=args.trials, eta=args.eta, min_rounds=args.min_rounds, max_rounds=args.max_rounds,
+            early_stopping=args.early_stopping, workers=workers, threads=threads,
+        )
+    elif args.compare_categorical:
+        pipe, metrics = compare_categorical(train_df)[args.categorical]
+    else:
+        pipe, metrics = train_and_eval(train_df, categorical=args.categorical)
 
     # Save artifacts
-    save_artifacts(pipe, crops_for_meta, metrics)
+    categories = category_dictionary(train_df) if args.categorical == "native" else None
+    save_artifacts(pipe, crops_for_meta, metrics, categories)
 
 
 if __name__ == "__main__":
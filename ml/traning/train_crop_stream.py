@@ -0,0 +1,363 @@
+# training/train_crop_stream.py
+"""
+Out-of-core training for the crop yield model.
+
+train_crop.py builds the whole training frame in memory before fitting. This
+script streams crop_yield_history.csv in chunks instead, so peak memory is set
+by --chunk-rows and --sample-rows, not by the size of the file:
+
+  pass 1  read every chunk once: category dictionary, imputation values
+          (medians of a bounded uniform sample) and the StandardScaler
+          statistics of the training rows (merged chunk by chunk, exact).
+  train   an xgboost.DataIter replays the chunks through the fitted
+          preprocessor into an ExtMemQuantileDMatrix (quantized pages on disk)
+          or, with --matrix quantile, a compressed in-memory QuantileDMatrix.
+  eval    one more pass for train/test MAE and R2 with the final pipeline.
+
+Rows are split train/test per chunk with a seeded RNG, so every pass sees the
+same split. The saved artifact is the same sklearn Pipeline (pre + XGBRegressor)
+train_crop.py writes, so the API loaders and CompiledCropModel are unchanged.
+
+Usage:
+    python training/train_crop_stream.py --chunk-rows 200000
+    python training/train_crop_stream.py --csv /mnt/yields/all_india.csv --categorical native
+"""
+
+from __future__ import annotations
+import argparse, sys, time
+from pathlib import Path
+from typing import Callable, Iterator
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.pipeline import Pipeline
+
+from train_crop import (
+    CACHE_DIR, CANDIDATE_FILES, CAT_FEATURES, CATEGORICAL_MODES, DATA, DEFAULT_CROPS, NUM_FEATURES,
+    TABLE_COLUMNS, TARGET, _F, _S, _load_csv_if_exists, _lower_strip_cols, _safe_to_numeric,
+    fill_values, impute_frame, make_pipeline, normalize_yields, save_artifacts,
+)
+
+MATRIX_KINDS = ["extmem", "quantile"]
+
+
+def peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2**20 if sys.platform == "darwin" else rss / 2**10  # bytes on macOS, KiB on Linux
+
+
+# --------------------------------------------------------------------------------------
+# Chunked reading
+# --------------------------------------------------------------------------------------
+def read_chunks(path: Path, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """Raw yield rows, `chunk_rows` at a time, limited to the columns the frame build reads."""
+    columns = TABLE_COLUMNS["yields"]
+    usecols = lambda c: str(c).replace("\ufeff", "").strip() in columns
+    text = {c: "str" for c, t in columns.items() if t == _S}
+    # numeric columns are coerced per chunk: one junk cell must not abort a long stream
+    with pd.read_csv(path, usecols=usecols, dtype=text, encoding="utf-8-sig", chunksize=chunk_rows) as reader:
+        for chunk in reader:
+            chunk = _lower_strip_cols(chunk)
+            for c in chunk.columns:
+                if columns.get(c) == _F and chunk[c].dtype.kind not in "biufc":
+                    chunk[c] = _safe_to_numeric(chunk[c])
+            yield chunk
+
+
+def _test_mask(n: int, chunk_idx: int, test_size: float, seed: int) -> np.ndarray:
+    return np.random.default_rng([seed, chunk_idx]).random(n) < test_size
+
+
+class RunningMoments:
+    """Count / mean / M2 per column, merged chunk by chunk (Chan et al.)."""
+
+    def __init__(self, n_cols: int):
+        self.n = np.zeros(n_cols)
+        self.mean = np.zeros(n_cols)
+        self.m2 = np.zeros(n_cols)
+
+    def _merge(self, n_b, mean_b, m2_b):
+        n = self.n + n_b
+        safe = np.where(n > 0, n, 1)
+        delta = mean_b - self.mean
+        self.mean = self.mean + delta * n_b / safe
+        self.m2 = self.m2 + m2_b + delta**2 * self.n * n_b / safe
+        self.n = n
+
+    def update(self, values: np.ndarray):
+        """Add a (rows, cols) block; NaNs are skipped per column."""
+        n_b = (~np.isnan(values)).sum(axis=0).astype(float)
+        mean_b = np.nansum(values, axis=0) / np.where(n_b > 0, n_b, 1)
+        m2_b = np.nansum((values - mean_b) ** 2, axis=0)
+        self._merge(n_b, mean_b, m2_b)
+
+    def add_constant(self, count: np.ndarray, value: np.ndarray):
+        """Account for `count` rows per column that all hold `value` (imputed cells)."""
+        self._merge(count.astype(float), value.astype(float), np.zeros_like(self.m2))
+
+    @property
+    def var(self) -> np.ndarray:
+        return np.where(self.n > 0, self.m2 / np.where(self.n > 0, self.n, 1), 0.0)
+
+
+class FirstPass:
+    """Everything the preprocessor needs, gathered in one read of the file."""
+
+    def __init__(self, sample_rows: int, seed: int):
+        self.sample_rows = sample_rows
+        self.rng = np.random.default_rng(seed)
+        self.sample: pd.DataFrame | None = None
+        self.categories: dict[str, set] = {c: set() for c in CAT_FEATURES}
+        self.moments = RunningMoments(len(NUM_FEATURES))
+        self.missing = np.zeros(len(NUM_FEATURES), dtype=np.int64)  # training cells to be imputed
+        self.rows = 0
+        self.train_rows = 0
+        self.chunks = 0
+
+    def update(self, y: pd.DataFrame, test: np.ndarray):
+        self.rows += len(y)
+        self.chunks += 1
+        for c in CAT_FEATURES:
+            self.categories[c].update(y[c].fillna("Unknown").astype(str).unique())
+
+        num = y.loc[~test, NUM_FEATURES].apply(_safe_to_numeric).to_numpy(dtype=np.float64)
+        self.train_rows += len(num)
+        self.moments.update(num)
+        self.missing += np.isnan(num).sum(axis=0)
+
+        # bottom-k on a uniform key == uniform sample of every row seen so far
+        s = y[NUM_FEATURES + CAT_FEATURES + [TARGET]].assign(_u=self.rng.random(len(y)))
+        if self.sample is not None:
+            s = pd.concat([self.sample, s], ignore_index=True)
+        self.sample = s.nsmallest(self.sample_rows, "_u") if len(s) > self.sample_rows else s
+
+    def category_dictionary(self) -> dict[str, list[str]]:
+        return {c: sorted(v) for c, v in self.categories.items()}
+
+    def fill_values(self) -> dict:
+        numeric = self.sample[NUM_FEATURES + [TARGET]].apply(_safe_to_numeric)
+        return fill_values(numeric.median(skipna=True))
+
+    def scaler_stats(self, fills: dict) -> tuple[np.ndarray, np.ndarray, int]:
+        """Mean / variance of the imputed training columns, as StandardScaler would see them."""
+        self.moments.add_constant(self.missing, np.array([fills[c] for c in NUM_FEATURES], dtype=float))
+        return self.moments.mean, self.moments.var, self.train_rows
+
+
+def first_pass(chunks: Callable[[], Iterator[pd.DataFrame]], soil: pd.DataFrame | None,
+               sample_rows: int, test_size: float, seed: int) -> FirstPass:
+    stats = FirstPass(sample_rows, seed)
+    for i, raw in enumerate(chunks()):
+        y = normalize_yields(raw, soil)
+        stats.update(y, _test_mask(len(y), i, test_size, seed))
+    return stats
+
+
+# --------------------------------------------------------------------------------------
+# Preprocessor + training
+# --------------------------------------------------------------------------------------
+def fit_preprocessor(stats: FirstPass, categorical: str) -> tuple[Pipeline, dict, dict[str, list[str]]]:
+    """Unfitted-model pipeline whose preprocessor carries the full-data statistics."""
+    categories = stats.category_dictionary()
+    fills = stats.fill_values()
+    pipe = make_pipeline(categorical, categories)
+    if categorical == "onehot":
+        # the sample may not contain every village; the encoder must know all of them
+        pipe.set_params(pre__cat__categories=[categories[c] for c in CAT_FEATURES])
+
+    sample = impute_frame(stats.sample.drop(columns="_u"), fills)
+    pre = pipe.named_steps["pre"]
+    pre.fit(sample[NUM_FEATURES + CAT_FEATURES])
+
+    mean, var, n = stats.scaler_stats(fills)
+    sc = pre.named_transformers_["num"].named_steps["sc"]
+    sc.mean_, sc.var_, sc.n_samples_seen_ = mean, var, n
+    sc.scale_ = np.where(var > 1e-12, np.sqrt(var), 1.0)  # constant column -> unscaled, as sklearn does
+    return pipe, fills, categories
+
+
+def imputed_chunks(chunks, soil, fills, test_size, seed) -> Iterator[tuple[pd.DataFrame, np.ndarray]]:
+    """(frame, is_test) per chunk: the frame train_crop.py would build, one slice at a time."""
+    for i, raw in enumerate(chunks()):
+        y = normalize_yields(raw, soil)
+        test = pd.Series(_test_mask(len(y), i, test_size, seed), index=y.index)
+        df = impute_frame(y, fills)
+        yield df, test.loc[df.index].to_numpy()
+
+
+def training_batches(chunks, soil, pre, fills, test_size, seed) -> Iterator[tuple]:
+    """(X, y) for the training rows of each chunk, X already through `pre`."""
+    for df, test in imputed_chunks(chunks, soil, fills, test_size, seed):
+        df = df[~test]
+        if len(df):
+            yield pre.transform(df[NUM_FEATURES + CAT_FEATURES]), df[TARGET].to_numpy(dtype=np.float32)
+
+
+class ChunkIter(xgb.DataIter):
+    """Feeds transformed training chunks to XGBoost; XGBoost calls reset() between passes."""
+
+    def __init__(self, batches: Callable[[], Iterator[tuple]], feature_types: list[str] | None,
+                 cache_prefix: str | None = None):
+        self._batches = batches
+        self._feature_types = feature_types
+        self._it = None
+        self.rows = 0
+        self.passes = 0
+        super().__init__(cache_prefix=cache_prefix)
+
+    def reset(self):
+        self._it = None
+
+    def next(self, input_data) -> bool:
+        if self._it is None:
+            self._it = self._batches()
+            self.passes += 1
+        batch = next(self._it, None)
+        if batch is None:
+            return False
+        X, y = batch
+        self.rows += len(y)
+        input_data(data=X, label=y, feature_types=self._feature_types)
+        return True
+
+
+def build_matrix(it: ChunkIter, kind: str, categorical: bool) -> xgb.DMatrix:
+    if kind == "extmem":
+        return xgb.ExtMemQuantileDMatrix(it, enable_categorical=categorical)
+    return xgb.QuantileDMatrix(it, enable_categorical=categorical)
+
+
+class RunningErrors:
+    """MAE / R2 from running sums, so no prediction vector is ever held whole."""
+
+    def __init__(self):
+        self.n = self.abs_err = self.sse = self.s = self.s2 = 0.0
+
+    def update(self, y: np.ndarray, pred: np.ndarray):
+        y, err = y.astype(np.float64), pred.astype(np.float64) - y
+        self.n += len(y)
+        self.abs_err += float(np.abs(err).sum())
+        self.sse += float((err ** 2).sum())
+        self.s += float(y.sum())
+        self.s2 += float((y ** 2).sum())
+
+    def result(self) -> dict:
+        sst = self.s2 - self.s * self.s / self.n if self.n else 0.0
+        return {"n": int(self.n), "mae": self.abs_err / self.n if self.n else float("nan"),
+                "r2": 1.0 - self.sse / sst if sst > 0 else float("nan")}
+
+
+def stream_metrics(pipe: Pipeline, frames: Iterator[tuple[pd.DataFrame, np.ndarray]]) -> tuple[dict, dict]:
+    """(train, test) metrics of the final pipeline in a single read."""
+    tr, te = RunningErrors(), RunningErrors()
+    for df, test in frames:
+        if len(df):
+            pred = pipe.predict(df[NUM_FEATURES + CAT_FEATURES])
+            y = df[TARGET].to_numpy(dtype=np.float64)
+            tr.update(y[~test], pred[~test])
+            te.update(y[test], pred[test])
+    return tr.result(), te.result()
+
+
+def _report(stage: str, rows: int, seconds: float) -> dict:
+    rss = peak_rss_mb()
+    rate = rows / seconds if seconds > 0 else float("inf")
+    print(f"[{stage}] {rows:,} rows in {seconds:.1f}s ({rate:,.0f} rows/s)"
+          + (f", peak RSS {rss:,.0f} MB" if rss is not None else ""))
+    return {"rows": int(rows), "seconds": float(seconds), "rows_per_s": float(rate), "peak_rss_mb": rss}
+
+
+def train_streaming(csv: Path, chunk_rows: int = 100_000, sample_rows: int = 100_000,
+                    categorical: str = "onehot", matrix: str = "extmem", test_size: float = 0.2,
+                    seed: int = 42, cache_dir: Path = CACHE_DIR / "xgb-extmem") -> tuple[Pipeline, dict, dict, set]:
+    if not csv.exists():
+        raise FileNotFoundError(f"Yield history not found: {csv}")
+    soil = _load_csv_if_exists(CANDIDATE_FILES["soil"], TABLE_COLUMNS["soil"])
+    chunks = lambda: read_chunks(csv, chunk_rows)
+
+    t0 = time.perf_counter()
+    stats = first_pass(chunks, soil, sample_rows, test_size, seed)
+    if stats.train_rows == 0:
+        raise ValueError(f"No training rows in {csv}")
+    pipe, fills, categories = fit_preprocessor(stats, categorical)
+    perf = {"stats": _report("pass 1: stats", stats.rows, time.perf_counter() - t0)}
+
+    pre, reg = pipe.named_steps["pre"], pipe.named_steps["reg"]
+    params = reg.get_xgb_params()
+    params.setdefault("tree_method", "hist")
+    native = categorical == "native"
+    it = ChunkIter(
+        lambda: training_batches(chunks, soil, pre, fills, test_size, seed),
+        reg.get_params()["feature_types"] if native else None,
+        cache_prefix=str(cache_dir / "train") if matrix == "extmem" else None,
+    )
+    if matrix == "extmem":
+        cache_dir.mkdir(parents=True, exist_ok=True)
+
+    t0 = time.perf_counter()
+    dtrain = build_matrix(it, matrix, native)
+    perf["matrix"] = _report(f"pass 2: {matrix} matrix ({it.passes} read(s))", it.rows, time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    booster = xgb.train(params, dtrain, num_boost_round=reg.n_estimators)
+    perf["train"] = _report(f"train: {reg.n_estimators} rounds", dtrain.num_row(), time.perf_counter() - t0)
+    del dtrain
+    reg.load_model(bytearray(booster.save_raw(raw_format="ubj")))
+
+    t0 = time.perf_counter()
+    tr, te = stream_metrics(pipe, imputed_chunks(chunks, soil, fills, test_size, seed))
+    perf["eval"] = _report("pass 3: eval", tr["n"] + te["n"], time.perf_counter() - t0)
+
+    metrics = {
+        "train_mae": tr["mae"],
+        "train_r2": tr["r2"],
+        "test_mae": te["mae"],
+        "test_r2": te["r2"],
+        "n_train": tr["n"],
+        "n_test": te["n"],
+        "features_num": NUM_FEATURES,
+        "features_cat": CAT_FEATURES,
+        "target": TARGET,
+        "categorical": categorical,
+        "train_seconds": perf["train"]["seconds"],
+        "streaming": {"matrix": matrix, "chunk_rows": chunk_rows, "chunks": stats.chunks,
+                      "sample_rows": int(len(stats.sample)), **perf},
+    }
+    print("\n[metrics]")
+    for k in ["train_mae", "train_r2", "test_mae", "test_r2", "n_train", "n_test"]:
+        print(f"  {k}: {metrics[k]:.4f}" if isinstance(metrics[k], float) else f"  {k}: {metrics[k]}")
+    return pipe, metrics, categories, stats.categories["crop"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the crop yield model out-of-core from a chunked CSV")
+    parser.add_argument("--csv", type=Path, default=DATA / CANDIDATE_FILES["yields"], help="Yield history CSV")
+    parser.add_argument("--chunk-rows", type=int, default=100_000, help="Rows read and transformed at a time")
+    parser.add_argument("--sample-rows", type=int, default=100_000,
+                        help="Uniform sample kept for imputation medians and fitting the encoders")
+    parser.add_argument("--categorical", choices=CATEGORICAL_MODES, default="onehot",
+                        help="Categorical encoding: one-hot (default) or XGBoost native categorical splits")
+    parser.add_argument("--matrix", choices=MATRIX_KINDS, default="extmem",
+                        help="extmem: quantized pages on disk, bounded memory (default). "
+                             "quantile: compressed in-memory matrix, faster when it fits")
+    parser.add_argument("--cache-dir", type=Path, default=CACHE_DIR / "xgb-extmem", help="Where extmem pages go")
+    parser.add_argument("--test-size", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--crops", nargs="*", default=None, help="Crop list for meta (default: crops seen in data)")
+    args = parser.parse_args()
+
+    pipe, metrics, categories, crops_seen = train_streaming(
+        args.csv, args.chunk_rows, args.sample_rows, args.categorical, args.matrix,
+        args.test_size, args.seed, args.cache_dir,
+    )
+    crops = args.crops or sorted({" ".join(c.split()).title() for c in crops_seen} - {"Unknown", "Nan"})
+    save_artifacts(pipe, crops or DEFAULT_CROPS, metrics, categories if args.categorical == "native" else None)
+
+
+if __name__ == "__main__":
+    main()
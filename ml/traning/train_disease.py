@@ -1,6 +1,8 @@
 # training/train_disease.py
+import argparse, ast, hashlib, importlib.util, json, os, time
+import numpy as np
 import tensorflow as tf
-from tensorflow.keras.applications import EfficientNetB0
+from tensorflow.keras.applications import EfficientNetB0, MobileNetV3Small
 from tensorflow.keras import layers, models
 from pathlib import Path
 
@@ -11,6 +13,21 @@ IMG_SIZE = (224, 224)
 BATCH = 32
 EPOCHS = 12
 
+# cascade stage 1: small network on downscaled images
+FAST_SIZE = (128, 128)
+FAST_EPOCHS = 8
+THRESHOLDS = [0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.98]
+
+# --head-only: frozen-backbone embeddings cached per (split, class) shard
+EMB_DIR = MODELS / "embeddings"
+BACKBONE_ID = f"EfficientNetB0-imagenet-{IMG_SIZE[0]}x{IMG_SIZE[1]}"
+HEAD_EPOCHS = 30
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".gif"}
+
+# input pipeline
+SHUFFLE_BUFFER = 1000
+PROFILE_DIR = Path(__file__).resolve().parents[1] / "logs" / "disease_profile"
+
 def build_model(num_classes):
     base = EfficientNetB0(include_top=False, input_shape=IMG_SIZE+(3,), weights="imagenet")
     base.trainable = False
@@ -24,35 +41,499 @@ def build_model(num_classes):
     model.compile(optimizer="adam", loss="sparse_categorical_crossentropy", metrics=["accuracy"])
     return model, base
 
-def main():
-    # Directory structure:
-    # data/leaves/train/<class_name>/*.jpg
-    # data/leaves/val/<class_name>/*.jpg
-    train_ds = tf.keras.preprocessing.image_dataset_from_directory(
-        DATA / "leaves/train", image_size=IMG_SIZE, batch_size=BATCH)
-    val_ds = tf.keras.preprocessing.image_dataset_from_directory(
-        DATA / "leaves/val", image_size=IMG_SIZE, batch_size=BATCH)
+def build_fast_model(num_classes, fast_size=FAST_SIZE):
+    """Cascade stage 1. Takes the same 224x224 input as the full model and
+    downscales inside the graph, so the service can feed one array to both."""
+    base = MobileNetV3Small(include_top=False, input_shape=fast_size+(3,), weights="imagenet",
+                            alpha=1.0, minimalistic=True, include_preprocessing=True)
+    base.trainable = False
+    inputs = layers.Input(shape=IMG_SIZE+(3,))
+    x = layers.Resizing(*fast_size)(inputs)
+    x = base(x, training=False)
+    x = layers.GlobalAveragePooling2D()(x)
+    x = layers.Dropout(0.2)(x)
+    outputs = layers.Dense(num_classes, activation="softmax")(x)
+    model = models.Model(inputs, outputs)
+    model.compile(optimizer="adam", loss="sparse_categorical_crossentropy", metrics=["accuracy"])
+    return model
 
-    num_classes = train_ds.cardinality().numpy() and len(train_ds.class_names)
-    model, base = build_model(num_classes)
+def _run_both(fast, full, ds):
+    """Labels and both models' probabilities in one pass (the val dataset
+    reshuffles every iteration), plus mean seconds per image for each model."""
+    for x, _ in ds.take(1):
+        fast(x, training=False), full(x, training=False)  # warm up outside the timing
+    ys, p_fast, p_full, t_fast, t_full = [], [], [], 0.0, 0.0
+    for x, yb in ds:
+        t0 = time.perf_counter()
+        p_fast.append(fast(x, training=False).numpy())
+        t1 = time.perf_counter()
+        p_full.append(full(x, training=False).numpy())
+        t_full += time.perf_counter() - t1
+        t_fast += t1 - t0
+        ys.append(yb.numpy())
+    y = np.concatenate(ys)
+    n = max(len(y), 1)
+    return y, np.concatenate(p_fast), np.concatenate(p_full), t_fast / n, t_full / n
 
-    # warmup
-    model.fit(train_ds, validation_data=val_ds, epochs=EPOCHS)
+def evaluate_cascade(fast, full, val_ds, thresholds=THRESHOLDS, max_drop=0.005):
+    """Accuracy / mean latency of fast-then-full for each threshold on the val set.
 
-    # optional fine-tune top blocks
+    Stage 1 answers when its top-1 probability is >= threshold, otherwise the
+    image also goes through the full model (so escalated images pay for both).
+    Returns the report and the lowest threshold within `max_drop` of the full
+    model's accuracy (the cheapest one that is about as good).
+    """
+    y, p_fast, p_full, t_fast, t_full = _run_both(fast, full, val_ds)
+    fast_pred, fast_conf = p_fast.argmax(1), p_fast.max(1)
+    full_pred = p_full.argmax(1)
+    full_acc = float((full_pred == y).mean())
+
+    rows = []
+    for thr in thresholds:
+        escalate = fast_conf < thr
+        pred = np.where(escalate, full_pred, fast_pred)
+        rows.append({
+            "threshold": thr,
+            "accuracy": float((pred == y).mean()),
+            "escalated": float(escalate.mean()),
+            "latency_ms": 1000 * (t_fast + escalate.mean() * t_full),
+        })
+
+    print(f"\nfast only: acc={float((fast_pred == y).mean()):.4f} latency={1000 * t_fast:.2f} ms/img")
+    print(f"full only: acc={full_acc:.4f} latency={1000 * t_full:.2f} ms/img")
+    print(f"{'threshold':>9} {'accuracy':>9} {'escalated':>9} {'ms/img':>8}")
+    for r in rows:
+        print(f"{r['threshold']:>9.2f} {r['accuracy']:>9.4f} {r['escalated']:>9.1%} {r['latency_ms']:>8.2f}")
+
+    ok = [r for r in rows if r["accuracy"] >= full_acc - max_drop]
+    chosen = min(ok, key=lambda r: r["threshold"]) if ok else rows[-1]
+    return {
+        "fast_accuracy": float((fast_pred == y).mean()),
+        "fast_latency_ms": 1000 * t_fast,
+        "full_accuracy": full_acc,
+        "full_latency_ms": 1000 * t_full,
+        "thresholds": rows,
+        "threshold": chosen["threshold"],
+    }
+
+def train_cascade(train_ds, val_ds, fast_size=FAST_SIZE, epochs=FAST_EPOCHS,
+                  thresholds=THRESHOLDS, max_drop=0.005, callbacks=()):
+    """Train the stage-1 model and pick a threshold against the saved full model."""
+    num_classes = len(train_ds.class_names)
+    labels = ast.literal_eval((MODELS / "disease_labels.json").read_text())
+    if list(labels) != list(train_ds.class_names):
+        raise SystemExit(f"Class order {train_ds.class_names} differs from the full model's {labels}")
+    full = tf.keras.models.load_model(MODELS / "disease_efficientnet_v1.keras")
+
+    fast = build_fast_model(num_classes, fast_size)
+    fast.fit(train_ds, validation_data=val_ds, epochs=epochs, callbacks=list(callbacks))
+
+    report = evaluate_cascade(fast, full, val_ds, thresholds, max_drop)
+    fast.save(MODELS / "disease_fast_v1.keras")
+    report["fast_size"] = list(fast_size)
+    (MODELS / "disease_cascade.json").write_text(json.dumps(report, indent=2))
+    print(f"Saved fast model; cascade threshold={report['threshold']} (see disease_cascade.json)")
+
+def export_tflite(keras_path, calib_ds, quantize="int8", calib_samples=200):
+    """Convert a saved Keras model to TFLite next to it (<stem>.tflite).
+
+    float16: weights stored as fp16 (half the size, float math).
+    int8:    weights and activations quantized using `calib_samples` training
+             images to calibrate activation ranges; input/output stay float32 so
+             the service feeds the same arrays to either engine.
+    """
+    model = tf.keras.models.load_model(keras_path)
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantize == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantize == "int8":
+        calib = calib_ds.unbatch().take(calib_samples).batch(1)
+        converter.representative_dataset = lambda: ([tf.cast(x, tf.float32)] for x, _ in calib)
+    else:
+        raise ValueError(f"Unknown quantization {quantize!r}")
+    out_path = Path(keras_path).with_suffix(".tflite")
+    tmp = out_path.with_name(out_path.name + ".tmp")
+    tmp.write_bytes(converter.convert())
+    tmp.replace(out_path)
+    return out_path
+
+def compare_engines(keras_path, tflite_path, val_ds, samples=200):
+    """Top-1 agreement between the Keras model and its TFLite export, plus
+    single-image CPU latency percentiles for both."""
+    images = np.stack([x.numpy() for x, _ in val_ds.unbatch().take(samples)]).astype(np.float32)
+
+    model = tf.keras.models.load_model(keras_path)
+    interp = tf.lite.Interpreter(model_path=str(tflite_path))
+    interp.allocate_tensors()
+    inp, out = interp.get_input_details()[0]["index"], interp.get_output_details()[0]["index"]
+
+    def run_tflite(x):
+        interp.set_tensor(inp, x)
+        interp.invoke()
+        return interp.get_tensor(out)
+
+    engines = {"keras": lambda x: model(x, training=False).numpy(), "tflite": run_tflite}
+    report, preds = {}, {}
+    for name, run in engines.items():
+        run(images[:1])  # warm up
+        top1, lat = [], []
+        for img in images:
+            t0 = time.perf_counter()
+            p = run(img[None])
+            lat.append(time.perf_counter() - t0)
+            top1.append(int(p[0].argmax()))
+        preds[name] = np.array(top1)
+        report[name] = {
+            "p50_ms": 1000 * float(np.percentile(lat, 50)),
+            "p99_ms": 1000 * float(np.percentile(lat, 99)),
+        }
+    report["agreement"] = float((preds["keras"] == preds["tflite"]).mean())
+    report["samples"] = len(images)
+    report["size_mb"] = {
+        "keras": Path(keras_path).stat().st_size / 1e6,
+        "tflite": Path(tflite_path).stat().st_size / 1e6,
+    }
+    return report
+
+def export_all(train_ds, val_ds, quantize="int8", calib_samples=200, samples=200):
+    """Export the full model (and the cascade stage 1 if trained) and report."""
+    reports = {"quantize": quantize}
+    for stem in ("disease_efficientnet_v1", "disease_fast_v1"):
+        keras_path = MODELS / f"{stem}.keras"
+        if not keras_path.exists():
+            continue
+        tflite_path = export_tflite(keras_path, train_ds, quantize, calib_samples)
+        r = compare_engines(keras_path, tflite_path, val_ds, samples)
+        reports[stem] = r
+        print(f"\n{stem}: {quantize} TFLite {r['size_mb']['tflite']:.1f} MB "
+              f"(Keras {r['size_mb']['keras']:.1f} MB), top-1 agreement {r['agreement']:.2%} on {r['samples']} images")
+        for name in ("keras", "tflite"):
+            print(f"  {name:>6}: p50={r[name]['p50_ms']:.2f} ms  p99={r[name]['p99_ms']:.2f} ms")
+    (MODELS / "disease_export.json").write_text(json.dumps(reports, indent=2))
+    print("Serve with DISEASE_ENGINE=tflite")
+
+def fine_tune(model, base, train_ds, val_ds, epochs=6, callbacks=()):
+    """Unfreeze the top of the backbone and train end to end at a low LR."""
     base.trainable = True
     for layer in base.layers[:-40]:  # unfreeze last ~40 layers
         layer.trainable = False
     model.compile(optimizer=tf.keras.optimizers.Adam(1e-5),
                   loss="sparse_categorical_crossentropy",
                   metrics=["accuracy"])
-    model.fit(train_ds, validation_data=val_ds, epochs=6)
+    model.fit(train_ds, validation_data=val_ds, epochs=epochs, callbacks=list(callbacks))
 
+def save_model(model, class_names):
     MODELS.mkdir(exist_ok=True)
     model.save(MODELS / "disease_efficientnet_v1.keras")
-    (MODELS / "disease_labels.json").write_text(
-        tf.constant(train_ds.class_names).numpy().tolist().__repr__()
-    )
+    (MODELS / "disease_labels.json").write_text(repr([str(c) for c in class_names]))
     print("Saved disease model.")
+
+# --------------------------------------------------------------------------
+# Input pipeline
+# --------------------------------------------------------------------------
+def _class_files(split_dir, cls):
+    return sorted(p for p in (split_dir / cls).iterdir() if p.suffix.lower() in IMAGE_EXTS)
+
+def list_images(split, class_names=None):
+    """(paths, labels, class_names) for data/leaves/<split>/<class_name>/*; classes sorted like
+    image_dataset_from_directory unless given (val must use the train order)."""
+    split_dir = DATA / "leaves" / split
+    if class_names is None:
+        class_names = sorted(p.name for p in split_dir.iterdir() if p.is_dir())
+    paths, labels = [], []
+    for label, cls in enumerate(class_names):
+        if (split_dir / cls).is_dir():
+            files = _class_files(split_dir, cls)
+            paths += [str(f) for f in files]
+            labels += [label] * len(files)
+    return paths, labels, list(class_names)
+
+def _load_image(path):
+    # same decode + bilinear resize as image_dataset_from_directory
+    img = tf.image.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+    return tf.image.resize(img, IMG_SIZE)
+
+def _load_uint8(path, label):
+    # uint8 keeps the cache 4x smaller than float32 (rounding changes pixels by <= 0.5)
+    return tf.cast(tf.clip_by_value(tf.round(_load_image(path)), 0, 255), tf.uint8), label
+
+def _augment_batch(x, y):
+    # runs once per batch (vectorized), after the cache so every epoch sees new variants
+    x = tf.image.random_flip_left_right(x)
+    x = tf.image.random_flip_up_down(x)
+    x = tf.image.random_brightness(x, 20.0)
+    return tf.clip_by_value(x, 0.0, 255.0), y
+
+def build_pipeline(paths, labels, training=False, batch=BATCH, cache=None, seed=None,
+                   shuffle_buffer=SHUFFLE_BUFFER, augment=False):
+    """
+    files -> (shuffle file order once) -> parallel decode+resize -> cache ->
+    shuffle buffer -> batch -> float32 (+ augmentation) -> prefetch
+
+    cache: None, "memory", or a file prefix for tf.data's on-disk cache.
+    seed:  fixes shuffling and keeps parallel map output in order; without it
+           map may return elements out of order for speed.
+    """
+    ds = tf.data.Dataset.from_tensor_slices((paths, labels))
+    if training:
+        # files are grouped by class: mix them before the (smaller) shuffle buffer
+        ds = ds.shuffle(len(paths), seed=seed, reshuffle_each_iteration=False)
+    ds = ds.map(_load_uint8, num_parallel_calls=tf.data.AUTOTUNE)
+    if cache == "memory":
+        ds = ds.cache()
+    elif cache:
+        ds = ds.cache(str(cache))
+    if training:
+        ds = ds.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+    ds = ds.batch(batch)
+    to_float = lambda x, y: (tf.cast(x, tf.float32), y)
+    ds = ds.map(to_float, num_parallel_calls=tf.data.AUTOTUNE)
+    if training and augment:
+        ds = ds.map(_augment_batch, num_parallel_calls=tf.data.AUTOTUNE)
+    opts = tf.data.Options()
+    opts.deterministic = seed is not None
+    return ds.with_options(opts).prefetch(tf.data.AUTOTUNE)
+
+def make_dataset(split, class_names=None, training=False, cache=None, **kw):
+    paths, labels, class_names = list_images(split, class_names)
+    if cache and cache != "memory":
+        # one cache file per split and file list: stale caches are never reused
+        Path(cache).mkdir(parents=True, exist_ok=True)
+        sig = hashlib.sha1("\n".join(paths).encode() + repr(IMG_SIZE).encode()).hexdigest()[:12]
+        cache = Path(cache) / f"{split}-{sig}"
+    ds = build_pipeline(paths, labels, training, cache=cache, **kw)
+    ds.class_names = class_names
+    ds.num_images = len(paths)
+    return ds
+
+def load_datasets(cache=None, seed=None, shuffle_buffer=SHUFFLE_BUFFER, augment=False):
+    # Directory structure:
+    # data/leaves/train/<class_name>/*.jpg
+    # data/leaves/val/<class_name>/*.jpg
+    if seed is not None:
+        tf.keras.utils.set_random_seed(seed)
+    train_ds = make_dataset("train", training=True, cache=cache, seed=seed,
+                            shuffle_buffer=shuffle_buffer, augment=augment)
+    val_ds = make_dataset("val", train_ds.class_names, cache=cache, seed=seed)
+    return train_ds, val_ds
+
+class ThroughputLogger(tf.keras.callbacks.Callback):
+    """Training images/sec per epoch (validation time excluded)."""
+
+    def __init__(self, num_images):
+        super().__init__()
+        self.num_images = num_images
+        self.rates = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._t0 = self._t1 = time.perf_counter()
+
+    def on_train_batch_end(self, batch, logs=None):
+        self._t1 = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        seconds = max(self._t1 - self._t0, 1e-9)
+        self.rates.append(self.num_images / seconds)
+        print(f"  epoch {epoch + 1}: {self.rates[-1]:.1f} images/s ({seconds:.1f}s training)")
+
+def fit_callbacks(train_ds, profile=False):
+    callbacks = [ThroughputLogger(train_ds.num_images)]
+    if profile:
+        if importlib.util.find_spec("tensorboard") is None:
+            print("tensorboard not installed: skipping the step trace (stage table above still applies)")
+        else:
+            # trace a few steps of the first epoch; open with TensorBoard's Profile tab
+            # (Input pipeline analyzer shows host-side tf.data time per op)
+            callbacks.append(tf.keras.callbacks.TensorBoard(log_dir=str(PROFILE_DIR), profile_batch=(3, 8)))
+    return callbacks
+
+def profile_input(cache=None, seed=None, max_images=512):
+    """Images/sec for each input stage alone, then the full pipeline (two passes,
+    so a cache shows up as the second pass getting faster). No model runs."""
+    paths, labels, _ = list_images("train")
+    paths, labels = paths[:max_images], labels[:max_images]
+    n = len(paths)
+
+    def rate(ds):
+        t0 = time.perf_counter()
+        for _ in ds:
+            pass
+        return n / max(time.perf_counter() - t0, 1e-9)
+
+    def files():
+        return tf.data.Dataset.from_tensor_slices(paths)
+
+    stages = [
+        ("read", files().map(tf.io.read_file, num_parallel_calls=tf.data.AUTOTUNE)),
+        ("read+decode", files().map(lambda p: tf.image.decode_image(
+            tf.io.read_file(p), channels=3, expand_animations=False), num_parallel_calls=tf.data.AUTOTUNE)),
+        ("read+decode+resize", files().map(_load_image, num_parallel_calls=tf.data.AUTOTUNE)),
+    ]
+    print(f"\nInput pipeline profile ({n} training images, no model)")
+    print(f"{'stage':<28} {'images/s':>10} {'ms/img':>8}")
+    for name, ds in stages:
+        r = rate(ds.prefetch(tf.data.AUTOTUNE))
+        print(f"{name:<28} {r:>10.1f} {1000 / r:>8.2f}")
+    full = build_pipeline(paths, labels, training=True, cache="memory" if cache else None, seed=seed)
+    for i in (1, 2):
+        r = rate(full)
+        print(f"{f'full pipeline, pass {i}':<28} {r:>10.1f} {1000 / r:>8.2f}")
+    print("(compare with the images/s per training epoch: if the pipeline is not much faster, "
+          "training is input-bound)\n")
+
+# --------------------------------------------------------------------------
+# Head-only training on cached backbone embeddings
+# --------------------------------------------------------------------------
+def _signature(files):
+    h = hashlib.sha1(BACKBONE_ID.encode())
+    for f in files:
+        st = f.stat()
+        h.update(f"{f.name}:{st.st_size}:{st.st_mtime_ns}".encode())
+    return h.hexdigest()
+
+def embedding_extractor(model):
+    """Sub-model of build_model()'s graph ending at the pooled backbone features."""
+    pool = next(l for l in model.layers if isinstance(l, layers.GlobalAveragePooling2D))
+    return models.Model(model.inputs, pool.output)
+
+def embed_shard(extractor, files, out_path):
+    """Embeddings for `files`, written batch by batch into a memory-mapped .npy."""
+    ds = (tf.data.Dataset.from_tensor_slices([str(f) for f in files])
+          .map(_load_image, num_parallel_calls=tf.data.AUTOTUNE)
+          .batch(BATCH)
+          .prefetch(tf.data.AUTOTUNE))
+    dim = extractor.output_shape[-1]
+    tmp = out_path.with_name(out_path.name + ".tmp.npy")
+    shard = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=(len(files), dim))
+    i = 0
+    for x in ds:
+        e = extractor(x, training=False).numpy()
+        shard[i:i + len(e)] = e
+        i += len(e)
+    shard.flush()
+    del shard
+    os.replace(tmp, out_path)
+
+def cached_embeddings(extractor, split, class_names):
+    """(X, y) for one split from per-class shards under models/embeddings/<split>/.
+
+    A class's shard is recomputed only when its file list (names, sizes,
+    mtimes) changes, so adding a new class embeds just that class's images.
+    Labels are stored by class name and mapped to indices here, so existing
+    shards stay valid when a new class shifts the alphabetical order.
+    """
+    split_dir = DATA / "leaves" / split
+    out_dir = EMB_DIR / split
+    out_dir.mkdir(parents=True, exist_ok=True)
+    xs, ys = [], []
+    for label, cls in enumerate(class_names):
+        if not (split_dir / cls).is_dir():
+            continue
+        files = _class_files(split_dir, cls)
+        shard, side = out_dir / f"{cls}.npy", out_dir / f"{cls}.json"
+        sig = _signature(files)
+        cached = json.loads(side.read_text()) if side.exists() and shard.exists() else {}
+        if cached.get("signature") != sig:
+            t0 = time.perf_counter()
+            embed_shard(extractor, files, shard)
+            side.write_text(json.dumps({"class": cls, "count": len(files), "signature": sig,
+                                        "backbone": BACKBONE_ID}))
+            print(f"  embedded {split}/{cls}: {len(files)} images in {time.perf_counter() - t0:.1f}s")
+        x = np.load(shard, mmap_mode="r")
+        xs.append(x)
+        ys.append(np.full(len(x), label, dtype=np.int32))
+    return np.concatenate(xs), np.concatenate(ys)
+
+def train_head_only(epochs=HEAD_EPOCHS, fine_tune_epochs=0, pipeline=None, profile=False):
+    """Train the classifier head on cached embeddings, then (optionally) fine-tune."""
+    class_names = sorted(p.name for p in (DATA / "leaves/train").iterdir() if p.is_dir())
+    model, base = build_model(len(class_names))
+    extractor = embedding_extractor(model)
+
+    t0 = time.perf_counter()
+    x_train, y_train = cached_embeddings(extractor, "train", class_names)
+    x_val, y_val = cached_embeddings(extractor, "val", class_names)
+    print(f"Embeddings ready in {time.perf_counter() - t0:.1f}s "
+          f"(train {x_train.shape}, val {x_val.shape}, cache {EMB_DIR})")
+
+    # same head as build_model(): Dropout -> Dense(softmax) on the pooled features
+    head = models.Sequential([
+        layers.Input(shape=x_train.shape[1:]),
+        layers.Dropout(0.2),
+        layers.Dense(len(class_names), activation="softmax"),
+    ])
+    head.compile(optimizer="adam", loss="sparse_categorical_crossentropy", metrics=["accuracy"])
+    t0 = time.perf_counter()
+    head.fit(x_train, y_train, validation_data=(x_val, y_val) if len(x_val) else None,
+             epochs=epochs, batch_size=BATCH, verbose=2)
+    print(f"Head trained in {time.perf_counter() - t0:.1f}s")
+    model.layers[-1].set_weights(head.layers[-1].get_weights())
+
+    if fine_tune_epochs:
+        train_ds, val_ds = load_datasets(**(pipeline or {}))
+        fine_tune(model, base, train_ds, val_ds, fine_tune_epochs, fit_callbacks(train_ds, profile))
+    save_model(model, class_names)
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the leaf disease classifier")
+    parser.add_argument("--cascade", action="store_true",
+                        help="Train the small first-stage model (needs the full model already saved) "
+                             "and report accuracy/latency for each confidence threshold")
+    parser.add_argument("--fast-size", type=int, default=FAST_SIZE[0], help="Stage-1 input side in pixels")
+    parser.add_argument("--fast-epochs", type=int, default=FAST_EPOCHS)
+    parser.add_argument("--thresholds", default=",".join(map(str, THRESHOLDS)),
+                        help="Comma-separated confidence thresholds to evaluate")
+    parser.add_argument("--max-drop", type=float, default=0.005,
+                        help="Accuracy the cascade may lose vs the full model when picking a threshold")
+    parser.add_argument("--export-tflite", choices=["float16", "int8"],
+                        help="Don't train: export the saved model(s) to quantized TFLite and report "
+                             "top-1 agreement and p50/p99 CPU latency against Keras")
+    parser.add_argument("--calib-samples", type=int, default=200, help="Training images used for int8 calibration")
+    parser.add_argument("--head-only", action="store_true",
+                        help="Embed images once with the frozen backbone (cached under models/embeddings) "
+                             "and train only the classification head on the cached embeddings")
+    parser.add_argument("--head-epochs", type=int, default=HEAD_EPOCHS)
+    parser.add_argument("--fine-tune-epochs", type=int, default=0,
+                        help="With --head-only: fine-tune the top backbone blocks afterwards (0 = skip)")
+    parser.add_argument("--cache", default="",
+                        help="Cache decoded images: 'memory' or a directory for an on-disk cache (default: off)")
+    parser.add_argument("--seed", type=int, default=None, help="Deterministic shuffling / input order")
+    parser.add_argument("--shuffle-buffer", type=int, default=SHUFFLE_BUFFER)
+    parser.add_argument("--augment", action="store_true", help="Random flips/brightness on training batches")
+    parser.add_argument("--profile", action="store_true",
+                        help=f"Report images/s per input stage and write a TensorBoard trace to {PROFILE_DIR}")
+    args = parser.parse_args()
+
+    pipeline = dict(cache=args.cache or None, seed=args.seed,
+                    shuffle_buffer=args.shuffle_buffer, augment=args.augment)
+    if args.profile:
+        profile_input(args.cache or None, args.seed)
+
+    if args.head_only:
+        train_head_only(args.head_epochs, args.fine_tune_epochs, pipeline, args.profile)
+        return
+
+    train_ds, val_ds = load_datasets(**pipeline)
+    callbacks = fit_callbacks(train_ds, args.profile)
+
+    if args.export_tflite:
+        export_all(train_ds, val_ds, args.export_tflite, args.calib_samples)
+        return
+
+    if args.cascade:
+        train_cascade(train_ds, val_ds, (args.fast_size, args.fast_size), args.fast_epochs,
+                      [float(t) for t in args.thresholds.split(",")], args.max_drop, callbacks)
+        return
+
+    num_classes = train_ds.cardinality().numpy() and len(train_ds.class_names)
+    model, base = build_model(num_classes)
+
+    # warmup
+    model.fit(train_ds, validation_data=val_ds, epochs=EPOCHS, callbacks=callbacks)
+
+    # optional fine-tune top blocks
+    fine_tune(model, base, train_ds, val_ds, 6, callbacks)
+    save_model(model, train_ds.class_names)
 if __name__ == "__main__":
     main()
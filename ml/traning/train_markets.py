@@ -14,10 +14,12 @@ Artifacts saved to models/:
 
 Usage:
     python training/train_markets.py --horizon 7 --min-history 180
+    python training/train_markets.py --workers 8      # train groups in 8 processes
 """
 
 from __future__ import annotations
-import argparse, json
+import argparse, json, os, time, traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 import numpy as np
 import pandas as pd
@@ -53,7 +55,7 @@ def _add_lag_roll(df: pd.DataFrame, ycol="modal") -> pd.DataFrame:
             df[f"roll{win}_std"] = df[ycol].shift(1).rolling(win).std()
     return df
 
-def _train_one(group: pd.DataFrame, horizon=7, min_history=180) -> dict | None:
+def _train_one(group: pd.DataFrame, horizon=7, min_history=180, n_jobs=4) -> dict | None:
     """
     Train model for a single (crop,state) group.
     Returns metrics + path, or None if insufficient data.
@@ -87,7 +89,7 @@ def _train_one(group: pd.DataFrame, horizon=7, min_history=180) -> dict | None:
         colsample_bytree=0.9,
         reg_lambda=2.0,
         random_state=42,
-        n_jobs=4
+        n_jobs=n_jobs
     )
     model.fit(X_train, y_train)
 
@@ -104,112 +106,128 @@ def _train_one(group: pd.DataFrame, horizon=7, min_history=180) -> dict | None:
         "n_val": len(val_df),
     }
 
-def _recursive_forecast(last_hist: pd.DataFrame, model, feat_cols, horizon=7) -> pd.DataFrame:
+class RecursiveForecaster:
     """
-    Roll forward day by day using model predictions as future lags.
-    last_hist: dataframe with columns [date, modal] + time features for the latest window
-    Returns dataframe with future dates and predicted 'modal_pred'.
+    Recursive multi-step forecaster that keeps lag/rolling state in NumPy buffers.
+
+    Reproduces the original per-step pandas loop exactly:
+      * lag_k looks up the *observed* price on date (t - k); days that were
+        themselves forecast (or are missing from history) give NaN.
+      * rollW_* is computed over the last W values of the series, with
+        forecasts appended positionally after the history.
+    Many series can run in lockstep as long as they share a model; each step
+    builds one (n_series, n_features) matrix in place and calls predict once.
     """
-    df = last_hist.copy()
-    start_date = df["date"].max()
-    future_rows = []
-
-    for h in range(1, horizon + 1):
-        next_date = start_date + pd.Timedelta(days=h)
-        tmp = df.copy()
-
-        # Create row template for next_date
-        row = {"date": next_date}
-        # update simple calendar features
-        row["doy"] = next_date.timetuple().tm_yday
-        row["dow"] = next_date.weekday()
-        row["week"] = int(pd.Timestamp(next_date).isocalendar().week)
-        row["month"] = next_date.month
-
-        # compute lag values from df (which includes appended preds)
-        for lag in LAGS:
-            # lag_X means price from next_date - lag
-            lag_date = next_date - pd.Timedelta(days=lag)
-            val = df.loc[df["date"] == lag_date, "modal"].values
-            if len(val) == 0:
-                val = df.loc[df["date"] == lag_date, "modal_pred"].values
-            row[f"lag_{lag}"] = float(val[0]) if len(val) else np.nan
-
-        # rolling stats from the last known period (use modal/modal_pred)
-        hist_series = df.sort_values("date")["modal"].astype(float).copy()
-        if "modal_pred" in df.columns:
-            # If predictions exist, append them in time order to compute rolling window correctly
-            hist_series = df.sort_values("date")[["modal","modal_pred"]].fillna(method="ffill").sum(axis=1)
-
-        # To compute rolling features, we need values up to yesterday
-        # Build a small helper frame
-        tmp_vals = df.copy()
-        tmp_vals["y"] = tmp_vals["modal"].fillna(0)
-        if "modal_pred" in tmp_vals.columns:
-            tmp_vals["y"] = tmp_vals["modal"].fillna(tmp_vals["modal_pred"])
-
-        tmp_vals = tmp_vals.sort_values("date")
-        for win, agg in ROLLS:
-            series = tmp_vals["y"].values
-            if len(series) >= win:
-                if agg == "mean":
-                    row[f"roll{win}_mean"] = float(pd.Series(series).rolling(win).mean().iloc[-1])
-                else:
-                    row[f"roll{win}_std"] = float(pd.Series(series).rolling(win).std().iloc[-1])
-            else:
-                row[f"roll{win}_mean" if agg == "mean" else f"roll{win}_std"] = np.nan
-
-        # Build feature vector and predict
-        feat_row = {k: row.get(k, np.nan) for k in feat_cols}
-        x = pd.DataFrame([feat_row])[feat_cols].values
-        yhat = float(model.predict(x)[0])
-
-        row["modal_pred"] = yhat
-        future_rows.append(row)
-
-        # append to df so subsequent steps can use as lag
-        df = pd.concat([df, pd.DataFrame([{"date": next_date, "modal_pred": yhat}])], ignore_index=True)
-
-    fut = pd.DataFrame(future_rows)
-    return fut[["date", "modal_pred"]]
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--horizon", type=int, default=7, help="Days to forecast")
-    parser.add_argument("--min-history", type=int, default=180, help="Minimum days of history to train a model")
-    args = parser.parse_args()
+    def __init__(self, model, feat_cols: list[str]):
+        self.model = model
+        self.feat_cols = list(feat_cols)
+        self._col = {c: i for i, c in enumerate(self.feat_cols)}
+        self.max_lag = max(LAGS)
+        self.max_win = max(w for w, _ in ROLLS)
+
+    def _lag_table(self, dates: np.ndarray, vals: np.ndarray, start: np.datetime64) -> np.ndarray:
+        """Observed price for each of the `max_lag` days ending at `start` (first row per date)."""
+        days = (start - dates).astype("timedelta64[D]").astype(np.int64)  # 0 = start day
+        out = np.full(self.max_lag, np.nan)
+        ok = (days >= 0) & (days < self.max_lag)
+        # iterate in reverse so the first row for a date wins
+        for d, v in zip(days[ok][::-1], vals[ok][::-1]):
+            out[self.max_lag - 1 - d] = v
+        return out
+
+    def forecast_many(self, histories: list[pd.DataFrame], horizon: int = 7) -> list[pd.DataFrame]:
+        n, W = len(histories), self.max_win
+        starts = np.empty(n, dtype="datetime64[D]")
+        lag_tab = np.empty((n, self.max_lag))
+        # sliding buffer: last W observed values, then one slot per forecast step
+        buf = np.full((n, W + horizon), np.nan)
+        for i, h in enumerate(histories):
+            dates = pd.to_datetime(h["date"]).to_numpy().astype("datetime64[D]")
+            vals = h["modal"].to_numpy(dtype=np.float64)
+            starts[i] = dates.max()
+            lag_tab[i] = self._lag_table(dates, vals, starts[i])
+            tail = vals[-W:]
+            buf[i, W - len(tail):W] = tail
+
+        X = np.full((n, len(self.feat_cols)), np.nan)
+        preds = np.empty((n, horizon))
+        for step in range(1, horizon + 1):
+            day = starts + np.timedelta64(step, "D")
+            cal = pd.DatetimeIndex(day.astype("datetime64[ns]"))
+            for name, values in (
+                ("doy", cal.dayofyear), ("dow", cal.weekday),
+                ("week", cal.isocalendar().week.to_numpy()), ("month", cal.month),
+            ):
+                if name in self._col:
+                    X[:, self._col[name]] = values
+
+            for lag in LAGS:
+                c = self._col.get(f"lag_{lag}")
+                if c is None:
+                    continue
+                back = step - lag  # <= 0: inside observed history
+                X[:, c] = lag_tab[:, self.max_lag - 1 + back] if back <= 0 else np.nan
+
+            end = W + step - 1
+            for win, agg in ROLLS:
+                c = self._col.get(f"roll{win}_{agg}")
+                if c is None:
+                    continue
+                window = buf[:, end - win:end]
+                X[:, c] = window.mean(axis=1) if agg == "mean" else window.std(axis=1, ddof=1)
+
+            yhat = np.asarray(self.model.predict(X), dtype=np.float64).reshape(n)
+            preds[:, step - 1] = yhat
+            buf[:, end] = yhat
+
+        out = []
+        for i in range(n):
+            dates = starts[i] + np.arange(1, horizon + 1).astype("timedelta64[D]")
+            out.append(pd.DataFrame({"date": dates.astype("datetime64[ns]"), "modal_pred": preds[i]}))
+        return out
 
-    MODELS.mkdir(exist_ok=True, parents=True)
 
-    df = pd.read_csv(DATA / "market_prices.csv")
-    df = df.dropna(subset=["date","crop","state","modal"]).copy()
-    df["date"] = pd.to_datetime(df["date"])
-    df = df.sort_values(["crop","state","date"])
+def _recursive_forecast(last_hist: pd.DataFrame, model, feat_cols, horizon=7) -> pd.DataFrame:
+    """
+    Roll forward day by day using model predictions as future lags.
+    last_hist: dataframe with columns [date, modal] (+ time features) for the latest window
+    Returns dataframe with future dates and predicted 'modal_pred'.
+    """
+    return RecursiveForecaster(model, feat_cols).forecast_many([last_hist], horizon)[0]
 
-    # Train per (crop,state)
-    all_meta = {"models": [], "lags": LAGS, "rolls": ROLLS, "horizon": args.horizon}
-    groups = df.groupby(["crop","state"], sort=False)
+def _write_json_atomic(path: Path, obj) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(obj, indent=2))
+    os.replace(tmp, path)
 
-    print(f"Training {len(groups)} (crop,state) models...")
 
-    for (crop, state), g in groups:
+def _train_group(crop: str, state: str, g: pd.DataFrame, horizon: int, min_history: int, n_jobs: int) -> dict:
+    """
+    Train, save and preview one (crop,state) series. Runs in a worker process.
+    Never raises: failures come back as {"error": ...} so other groups keep going.
+    """
+    t0 = time.perf_counter()
+    try:
         res = _train_one(g[["date","crop","state","mandi","modal"]].copy(),
-                         horizon=args.horizon, min_history=args.min_history)
+                         horizon=horizon, min_history=min_history, n_jobs=n_jobs)
+        t_fit = time.perf_counter() - t0
         if res is None:
-            print(f"Skip {crop}-{state}: not enough history ({len(g)})")
-            continue
+            return {"crop": crop, "state": state, "skipped": len(g)}
 
-        # Save model
+        # Save model (tmp + rename so the API never unpickles a half-written file)
         model_path = MODELS / f"market_xgb_{crop}__{state}.joblib"
-        joblib.dump({"model": res["model"], "feat_cols": res["feat_cols"]}, model_path)
+        tmp_path = model_path.with_name(model_path.name + ".tmp")
+        joblib.dump({"model": res["model"], "feat_cols": res["feat_cols"]}, tmp_path)
+        os.replace(tmp_path, model_path)
 
         # Build a small last-hist frame for future recursive forecasts preview (optional)
         hist = _make_time_features(g[["date","modal"]].copy())
-        preview = _recursive_forecast(hist.tail(60), res["model"], res["feat_cols"], args.horizon)
+        preview = _recursive_forecast(hist.tail(60), res["model"], res["feat_cols"], horizon)
         preview_path = MODELS / f"market_preview_{crop}__{state}.csv"
         preview.to_csv(preview_path, index=False)
 
-        all_meta["models"].append({
+        return {
             "crop": crop,
             "state": state,
             "path": model_path.name,
@@ -217,14 +235,109 @@ def main():
             "n_val": res["n_val"],
             "mae": res["mae"],
             "mape": res["mape"],
-            "preview": preview_path.name
-        })
+            "preview": preview_path.name,
+            "timings": {
+                "fit_s": round(t_fit, 3),
+                "total_s": round(time.perf_counter() - t0, 3),
+            },
+        }
+    except Exception as e:
+        return {"crop": crop, "state": state, "error": f"{type(e).__name__}: {e}",
+                "traceback": traceback.format_exc()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--horizon", type=int, default=7, help="Days to forecast")
+    parser.add_argument("--min-history", type=int, default=180, help="Minimum days of history to train a model")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Train (crop,state) groups in this many processes (1 = sequential)")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="XGBoost threads per model (default: cpu_count // workers)")
+    parser.add_argument("--materialize-horizon", type=int, default=30,
+                        help="Precompute forecasts up to this many days after training (0 = skip)")
+    args = parser.parse_args()
 
-        print(f"[{crop}-{state}] MAE={res['mae']:.2f} MAPE={res['mape']:.3f} → {model_path.name}")
+    MODELS.mkdir(exist_ok=True, parents=True)
+
+    df = pd.read_csv(DATA / "market_prices.csv")
+    df = df.dropna(subset=["date","crop","state","modal"]).copy()
+    df["date"] = pd.to_datetime(df["date"])
+    df = df.sort_values(["crop","state","date"])
+
+    groups = df.groupby(["crop","state"], sort=False)
+    workers = max(1, args.workers)
+    # Balance threads so workers * n_jobs ~= cores (sequential mode keeps the old n_jobs=4)
+    n_jobs = args.threads or (max(1, (os.cpu_count() or 1) // workers) if workers > 1 else 4)
+
+    # Previous entries stay visible (and survive failed retrains) until replaced
+    meta_path = MODELS / "market_meta.json"
+    previous = {}
+    if meta_path.exists():
+        try:
+            previous = {(m["crop"], m["state"]): m for m in json.loads(meta_path.read_text()).get("models", [])}
+        except (ValueError, KeyError):
+            previous = {}
+    done: dict[tuple[str, str], dict] = {}
+    failed: list[dict] = []
+    all_meta = {"models": [], "lags": LAGS, "rolls": ROLLS, "horizon": args.horizon,
+                "workers": workers, "n_jobs": n_jobs, "failed": failed}
+
+    def _publish(final: bool):
+        models = dict(done) if final else {**previous, **done}
+        if final:
+            # keep the last good model for groups whose retrain failed
+            for f in failed:
+                key = (f["crop"], f["state"])
+                if key in previous:
+                    models[key] = previous[key]
+        all_meta["models"] = [models[k] for k in sorted(models)]
+        _write_json_atomic(meta_path, all_meta)
+
+    def _collect(res: dict):
+        crop, state = res["crop"], res["state"]
+        if "error" in res:
+            failed.append({"crop": crop, "state": state, "error": res["error"]})
+            print(f"[{crop}-{state}] FAILED: {res['error']}\n{res['traceback']}")
+            return
+        if "skipped" in res:
+            print(f"Skip {crop}-{state}: not enough history ({res['skipped']})")
+            return
+        done[(crop, state)] = res
+        print(f"[{crop}-{state}] MAE={res['mae']:.2f} MAPE={res['mape']:.3f} "
+              f"({res['timings']['total_s']:.1f}s) → {res['path']}")
+        _publish(final=False)
+
+    print(f"Training {len(groups)} (crop,state) models with {workers} worker(s) x {n_jobs} thread(s)...")
+    t0 = time.perf_counter()
+
+    if workers == 1:
+        for (crop, state), g in groups:
+            _collect(_train_group(crop, state, g, args.horizon, args.min_history, n_jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(_train_group, crop, state, g, args.horizon, args.min_history, n_jobs): (crop, state)
+                for (crop, state), g in groups
+            }
+            for fut in as_completed(futures):
+                try:
+                    _collect(fut.result())
+                except Exception as e:  # worker died (e.g. OOM-killed)
+                    crop, state = futures[fut]
+                    _collect({"crop": crop, "state": state, "error": f"{type(e).__name__}: {e}",
+                              "traceback": ""})
+
+    all_meta["train_seconds"] = round(time.perf_counter() - t0, 3)
 
     # Save registry/meta
-    (MODELS / "market_meta.json").write_text(json.dumps(all_meta, indent=2))
-    print("Saved market_meta.json")
+    _publish(final=True)
+    print(f"Saved market_meta.json ({len(done)} trained, {len(failed)} failed, {all_meta['train_seconds']:.1f}s)")
+
+    # Refresh the precomputed forecast store served by the APIs
+    if args.materialize_horizon > 0 and done:
+        from materialize_forecasts import materialize
+        materialize(args.materialize_horizon)
 
 if __name__ == "__main__":
     main()